@@ -1,11 +1,22 @@
+# Keep this first: the startup clock starts before the other imports so their time is counted
+import time
+STARTUP_STARTED = time.perf_counter()
+
+import os
 import tkinter as tk
-from components.task_list import TaskList
+from tkinter import messagebox
+from components.metrics import EventLoopWatchdog, MetricsLogger, METRICS_INTERVAL_SECONDS
+from components.startup import StartupTimings
 
 
 class StressManagementApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, timings=None):
         super().__init__()
 
+        # Startup phases are timed from the first import; set STARTUP_TIMINGS=1 to print them
+        self.timings = timings or StartupTimings(STARTUP_STARTED)
+        self.timings.mark("imports")
+
         # Set fixed window size and center the window on the screen
         self.title("Stress Management App")
         self.geometry("525x900+300+100")  # Fixed window size, centered on screen
@@ -14,12 +25,29 @@ class StressManagementApp(tk.Tk):
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
 
-        # Create frames for Mood Tracker and Task List
-        self.task_list_frame = TaskList(self)
+        # The task list (and tkcalendar) is only imported and built when it is first shown;
+        # its tasks start loading in the background once the window is up
+        self.task_list_frame = None
+        self.task_store = None
+        self.initial_load = None
 
         # Create the button in the center of the screen
         self.create_centered_button()
 
+        # Event loop lag and hot-path timings; snapshots go to logs/metrics.log, F12 shows them live
+        self.watchdog = EventLoopWatchdog(self.after, self.after_cancel)
+        self.watchdog.start()
+        self.metrics_logger = MetricsLogger(
+            interval=float(os.environ.get("TASK_METRICS_INTERVAL", METRICS_INTERVAL_SECONDS)))
+        self.stats_overlay = None
+        self.bind_all("<F12>", lambda event: self.toggle_stats_overlay())
+
+        # Flush pending task writes before the window closes
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Nothing else runs until the first frame has been drawn
+        self.after_idle(self.on_first_idle)
+
     def create_centered_button(self):
         # Button to switch to Task List
         self.task_button = tk.Button(self, text="Task List", command=self.show_task_list)
@@ -31,13 +59,65 @@ class StressManagementApp(tk.Tk):
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
 
+    def on_first_idle(self):
+        # The window is on screen; open the task store and read the task log on the I/O thread
+        self.timings.mark("window shown")
+        self.metrics_logger.start()
+        if os.environ.get("TASK_STATS_OVERLAY") and self.stats_overlay is None:
+            self.toggle_stats_overlay()
+        if self.task_store is None:
+            from components.background_store import BackgroundTaskStore
+            from components.task_store import create_task_store
+            self.task_store = BackgroundTaskStore(create_inner=create_task_store)
+            self.initial_load = self.task_store.load_tasks_async()
+
     def show_task_list(self):
         # Hide the button by removing it from the grid
         self.task_button.grid_remove()
 
+        if self.task_list_frame is None:
+            self.on_first_idle()
+            from components.task_list import TaskList
+            self.timings.mark("task list import")
+            self.task_list_frame = TaskList(self, store=self.task_store, initial_load=self.initial_load,
+                                            on_loaded=self.on_tasks_loaded)
+            self.initial_load = None
+            self.timings.mark("task list built")
+
         # Show the task list frame
         self.task_list_frame.grid(row=0, column=0, sticky="nsew")
 
+    def on_tasks_loaded(self):
+        self.timings.mark("tasks loaded")
+        if os.environ.get("STARTUP_TIMINGS"):
+            self.timings.report()
+
+    def toggle_stats_overlay(self):
+        # Open or close the live metrics window
+        if self.stats_overlay is not None and self.stats_overlay.winfo_exists():
+            self.stats_overlay.close()
+            self.stats_overlay = None
+            return
+        from components.stats_overlay import StatsOverlay
+        self.stats_overlay = StatsOverlay(self)
+
+    def on_close(self):
+        # Write any queued task changes to disk, then close the window
+        try:
+            if self.task_list_frame is not None:
+                self.task_list_frame.close()
+            elif self.task_store is not None:
+                self.task_store.close()
+        except Exception as error:
+            # The changes stay queued and are retried; closing anyway loses them
+            if not messagebox.askyesno("Save Failed", f"Some task changes could not be written to disk:\n{error}\n\n"
+                                                      "Close anyway and lose them?"):
+                return
+        self.watchdog.stop()
+        # Last metrics snapshot, after the final writes have been timed
+        self.metrics_logger.stop()
+        self.destroy()
+
 
 if __name__ == "__main__":
     app = StressManagementApp()
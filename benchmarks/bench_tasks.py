@@ -0,0 +1,179 @@
+"""Benchmark the task engine on synthetic task logs of 10k to 1M tasks.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tasks
+    python -m benchmarks.bench_tasks --sizes 10000 100000 --compare benchmarks/results/<old>.json
+
+Results are written as JSON (one file per commit by default) so that two runs
+can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from components.passed_archive import PassedTaskArchive
+from components.prioritization import SCORING_NUMPY, SCORING_PYTHON, TaskPrioritization, np
+from components.task import PRIORITY_LEVELS, Task, format_task, to_epoch
+from components.task_engine import TaskEngine, FILTER_BY_DUE_DATE, FILTER_BY_IMPORTANCE, FILTER_TO_DO_ORDER
+from components.task_store import JournalTaskStore
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Number of single-task adds timed per size, and the share of tasks expired at once
+ADD_COUNT = 1000
+EXPIRE_FRACTION = 0.01
+
+# One-minute To Do ticks timed per size
+TICK_COUNT = 10
+
+
+def synthetic_tasks(count, now, seed=0):
+    """Return `count` random tasks due between one minute and 90 days after `now`."""
+    rng = random.Random(seed)
+    start = to_epoch(now)
+    priorities = list(PRIORITY_LEVELS.values())
+    return [
+        Task(f"Task {index}", start + rng.randint(60, 90 * 24 * 3600), rng.choice(priorities), rng.randrange(0, 24 * 60, 5))
+        for index in range(count)
+    ]
+
+
+def write_task_log(path, tasks):
+    """Write tasks in the task log format."""
+    with open(path, "w", encoding="utf-8") as file:
+        file.writelines(f"{format_task(task)}\n" for task in tasks)
+
+
+def timed(function, *args):
+    """Run `function` once and return (seconds, result)."""
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_size(count, directory):
+    """Time every engine operation for `count` tasks and return {operation: seconds}."""
+    now = datetime(2030, 1, 1, 9, 0)
+    clock = [now]
+    tasks = synthetic_tasks(count, now)
+    results = {}
+
+    snapshot_path = os.path.join(directory, f"task_log_{count}.txt")
+    journal_path = os.path.join(directory, f"task_journal_{count}.txt")
+    passed_archive = PassedTaskArchive(os.path.join(directory, f"passed_{count}"), legacy_path=None)
+    write_task_log(snapshot_path, tasks)
+
+    store = JournalTaskStore(snapshot_path, journal_path, passed_archive, compact_threshold=10 * ADD_COUNT)
+    engine = TaskEngine(store, clock=lambda: clock[0])
+
+    results["load"], _ = timed(engine.load_tasks)
+    results["save"], _ = timed(engine.save_tasks)
+
+    # Adding is timed per task, as the add button would do it
+    new_tasks = synthetic_tasks(ADD_COUNT, now, seed=1)
+    seconds, _ = timed(lambda: [engine.add_task(task) for task in new_tasks])
+    results["add_per_task"] = seconds / ADD_COUNT
+
+    # Switching filters only picks an index; rebuilding shows the cost of one full sort
+    for name, task_filter in (("due_date", FILTER_BY_DUE_DATE), ("importance", FILTER_BY_IMPORTANCE)):
+        results[f"switch_{name}"], _ = timed(engine.ordered_tasks, task_filter)
+    results["rebuild_due_date"], _ = timed(engine.orders.by_due_date.rebuild, list(engine.orders.by_due_date.tasks))
+    results["rebuild_importance"], _ = timed(engine.orders.by_importance.rebuild, list(engine.orders.by_due_date.tasks))
+    # Index queries: a deadline range, a priority bucket within a week, and a name prefix
+    results["query_due_24h"], _ = timed(engine.query, "", now, now + timedelta(hours=24))
+    results["query_high_week"], _ = timed(engine.query, "", now, now + timedelta(days=7), "High")
+    results["query_prefix"], _ = timed(engine.query, "task 12")
+    results["rebuild_to_do"], _ = timed(engine.orders.to_do.rebuild, list(engine.orders.by_due_date.tasks), clock[0])
+    # The To Do view's timer ticks once a minute; the median and the slowest of TICK_COUNT ticks
+    ticks = []
+    for _ in range(TICK_COUNT):
+        clock[0] += timedelta(minutes=1)
+        ticks.append(timed(engine.rescore_to_do)[0])
+    results["rescore_to_do"] = statistics.median(ticks)
+    results["rescore_to_do_max"] = max(ticks)
+    results["switch_to_do"], _ = timed(engine.ordered_tasks, FILTER_TO_DO_ORDER)
+
+    # Move the clock so that about EXPIRE_FRACTION of the tasks have passed
+    deadlines = sorted(task.deadline for task in engine.orders.by_due_date.tasks)
+    cutoff = deadlines[max(int(len(deadlines) * EXPIRE_FRACTION) - 1, 0)]
+    clock[0] = max(now + timedelta(seconds=cutoff - to_epoch(now)), clock[0] + timedelta(minutes=1))
+    results["expire"], passed = timed(engine.check_passed_tasks)
+    results["expired_count"] = len(passed)
+
+    # To Do scoring of the whole list, in each available mode
+    all_tasks = list(engine.orders.by_due_date.tasks)
+    results["to_do_python"], _ = timed(TaskPrioritization(clock[0], SCORING_PYTHON).get_ordered_tasks, all_tasks)
+    if np is not None:
+        results["to_do_numpy"], _ = timed(TaskPrioritization(clock[0], SCORING_NUMPY).get_ordered_tasks, all_tasks)
+
+    engine.close()
+    return results
+
+
+def git_commit():
+    """Return the current commit hash, or "unknown" outside a git checkout."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, previous):
+    """Print the ratio current/previous for every operation both runs measured."""
+    print(f"\nCompared with {previous['commit']}:")
+    for size, operations in current["results"].items():
+        old_operations = previous["results"].get(size, {})
+        for operation, seconds in operations.items():
+            old_seconds = old_operations.get(operation)
+            if old_seconds and not operation.endswith("_count"):
+                print(f"  {size:>8} {operation:<20} {seconds / old_seconds:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "numpy": np.__version__ if np is not None else None,
+        "results": {}
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.sizes:
+            results = bench_size(count, directory)
+            report["results"][str(count)] = results
+            print(f"{count} tasks")
+            for operation, value in results.items():
+                print(f"  {operation:<20} {value if operation.endswith('_count') else f'{value * 1000:10.3f} ms'}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Load-test the task JSON API and report latency percentiles and throughput.
+
+Run from the repository root. Without --url, a server is started in this
+process on a free port, with its data in a temporary directory:
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --users 200 --concurrency 64 --requests 20000
+    python -m benchmarks.load_test --url http://127.0.0.1:8765
+
+Each client keeps one HTTP/1.1 connection open and sends a random mix of
+adds, filtered lists, To Do orders and passed-task pages for random users.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from components.task_server import TaskServer, UserCache
+
+# Share of each request kind in the mix
+REQUEST_MIX = {"add": 0.3, "list": 0.4, "todo": 0.2, "passed": 0.1}
+FILTERS = ["due_date", "importance", "to_do"]
+
+
+def percentile(sorted_values, fraction):
+    """Return the value below which `fraction` of the sorted values lie (nearest rank)."""
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def random_request(rng, users):
+    """Return (method, path, body) of one random request."""
+    user = f"user{rng.randrange(users)}"
+    kind = rng.choices(list(REQUEST_MIX), weights=list(REQUEST_MIX.values()))[0]
+    if kind == "add":
+        deadline = datetime.now() + timedelta(minutes=rng.randint(10, 90 * 24 * 60))
+        body = {"name": f"Task {rng.randrange(10 ** 6)}", "deadline": deadline.isoformat(sep=" ", timespec="minutes"),
+                "priority": rng.choice(["High", "Medium", "Low"]),
+                "time_needed": f"{rng.randrange(24):02d}:{rng.randrange(0, 60, 5):02d}"}
+        return "POST", f"/users/{user}/tasks", body
+    if kind == "list":
+        return "GET", f"/users/{user}/tasks?filter={rng.choice(FILTERS)}&limit=20", None
+    if kind == "todo":
+        return "GET", f"/users/{user}/todo?limit=20", None
+    return "GET", f"/users/{user}/passed?limit=20", None
+
+
+async def client(host, port, requests, users, seed, latencies, statuses):
+    """Send `requests` requests over one keep-alive connection, recording each latency."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            method, path, body = random_request(rng, users)
+            data = json.dumps(body).encode("utf-8") if body is not None else b""
+            start = time.perf_counter()
+            writer.write(
+                f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+            )
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(args):
+    server = None
+    directory = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port
+    else:
+        directory = tempfile.TemporaryDirectory(prefix="task-server-")
+        server = TaskServer(UserCache(directory.name, capacity=args.hot_users))
+        host, port = "127.0.0.1", await server.start("127.0.0.1", 0)
+
+    latencies = []
+    statuses = {}
+    per_client = max(args.requests // args.concurrency, 1)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(client(host, port, per_client, args.users, args.seed + number, latencies, statuses)
+                               for number in range(args.concurrency)))
+    finally:
+        elapsed = time.perf_counter() - start
+        if server is not None:
+            await server.close()
+        if directory is not None:
+            directory.cleanup()
+
+    latencies.sort()
+    print(f"{len(latencies)} requests from {args.concurrency} clients for {args.users} users in {elapsed:.2f} s")
+    print(f"  throughput  {len(latencies) / elapsed:10.1f} requests/s")
+    print(f"  p50         {percentile(latencies, 0.50) * 1000:10.2f} ms")
+    print(f"  p99         {percentile(latencies, 0.99) * 1000:10.2f} ms")
+    print(f"  mean        {statistics.fmean(latencies) * 1000:10.2f} ms")
+    print(f"  statuses    {dict(sorted(statuses.items()))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="server to test (default: start one in this process)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--hot-users", type=int, default=64, help="hot cache size of the in-process server")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+from components.metrics import METRICS
+from components.task_store import TaskStore
+
+# Quiet period before queued writes are flushed, and the longest a write may wait
+DEBOUNCE_SECONDS = 0.25
+MAX_DELAY_SECONDS = 2.0
+
+# Wait before retrying a failed write; it doubles with each failure in a row, up to the maximum
+RETRY_SECONDS = 1.0
+MAX_RETRY_SECONDS = 30.0
+
+# Queue markers for the worker thread
+_WAKE = object()
+_STOP = object()
+
+
+class BackgroundTaskStore(TaskStore):
+    """Wraps another TaskStore and performs all of its file I/O on one background thread.
+
+    Writes return immediately. They are queued, consecutive writes of the same
+    kind are merged, and the batch is written once no new write has arrived
+    for DEBOUNCE_SECONDS (at most MAX_DELAY_SECONDS after the first one). A
+    full save replaces any writes still queued. Reads run on the same thread
+    after every queued write, so they always see the latest state. The
+    `*_async` variants return a Future so the UI never waits on the disk.
+
+    A write that fails stays queued, with the writes after it, and is retried
+    after RETRY_SECONDS, backing off to MAX_RETRY_SECONDS. The first failure
+    in a row is passed to `on_write_error`, which is called on the worker
+    thread. `flush` and `close` raise the error while writes are failing.
+
+    Pass `create_inner` instead of `inner` to have the inner store created on
+    the worker thread as well, by the first job that needs it: opening a store
+    can take a while, e.g. when SqliteTaskStore imports the old text logs.
+    """
+
+    def __init__(self, inner=None, debounce=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS, on_write_error=None,
+                 create_inner=None):
+        if (inner is None) == (create_inner is None):
+            raise ValueError("Pass either an inner store or a function that creates one")
+        self.inner = inner
+        self.create_inner = create_inner
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.on_write_error = on_write_error
+
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = []  # Queued writes as [method name, list of tasks]
+        self._first_pending_at = None
+        self._flush_at = None
+        self._failures = 0  # Failed write attempts in a row
+        self._last_error = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="task-io", daemon=True)
+        self._thread.start()
+
+    # Writes: queued and coalesced
+
+    def add_tasks(self, tasks):
+        self._queue_write("add_tasks", tasks)
+
+    def remove_tasks(self, tasks):
+        self._queue_write("remove_tasks", tasks)
+
+    def archive_passed_tasks(self, tasks):
+        self._queue_write("archive_passed_tasks", tasks)
+
+    def save_tasks(self, tasks):
+        """Queue a full save; it supersedes every task write still waiting."""
+        with self._lock:
+            self._pending = [op for op in self._pending if op[0] == "archive_passed_tasks"]
+        self._queue_write("save_tasks", tasks)
+
+    def save_recurring_tasks(self, recurring_tasks):
+        """Rewrite the recurring task rules on the worker thread, in order with the other writes."""
+        self._submit_inner("save_recurring_tasks", list(recurring_tasks))
+
+    # Reads: run on the worker thread after the queued writes
+
+    def load_tasks(self):
+        return self.load_tasks_async().result()
+
+    def load_tasks_async(self):
+        """Load the tasks in the background; returns a Future of the task list."""
+        return self.submit(METRICS.timed("store.load_tasks")(self._call_inner), "load_tasks")
+
+    def load_recurring_tasks(self):
+        return self.load_recurring_tasks_async().result()
+
+    def load_recurring_tasks_async(self):
+        """Load the recurring task rules in the background; returns a Future of the list."""
+        return self._submit_inner("load_recurring_tasks")
+
+    def poll_changes(self):
+        return self.poll_changes_async().result()
+
+    def poll_changes_async(self):
+        """Check the files for changes made by other writers in the background; returns a Future of TaskChanges."""
+        return self._submit_inner("poll_changes")
+
+    def load_passed_tasks_text(self):
+        return self.load_passed_tasks_text_async().result()
+
+    def load_passed_tasks_text_async(self):
+        """Read the passed task history in the background; returns a Future of its text."""
+        return self._submit_inner("load_passed_tasks_text")
+
+    def open_passed_tasks_reader(self):
+        return self.open_passed_tasks_reader_async().result()
+
+    def open_passed_tasks_reader_async(self):
+        """Open a paged passed task reader once queued archive writes are done; returns a Future."""
+        return self._submit_inner("open_passed_tasks_reader")
+
+    def tasks_due_before(self, deadline):
+        return self._submit_inner("tasks_due_before", deadline).result()
+
+    def tasks_with_priority(self, priority):
+        return self._submit_inner("tasks_with_priority", priority).result()
+
+    # Worker control
+
+    def submit(self, function, *args):
+        """Run `function(*args)` on the worker thread after the queued writes; returns a Future."""
+        future = Future()
+        self._jobs.put((function, args, future))
+        return future
+
+    def flush(self):
+        """Block until every queued write has reached the inner store; raises the error if they failed."""
+        if not self._closed:
+            self.flush_async().result()
+
+    def flush_async(self):
+        """Queue a check that every write queued so far has been written; returns a Future that fails if not."""
+        return self.submit(self._check_written)
+
+    def close(self):
+        """Write everything still queued, stop the worker and close the inner store.
+
+        If the writes fail, their error is raised and the store stays open with
+        the writes still queued, so closing can be tried again.
+        """
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._jobs.put(_STOP)
+        self._thread.join()
+        if self.inner is not None:
+            self.inner.close()
+
+    def _submit_inner(self, method, *args):
+        """Queue a call of an inner store method on the worker thread; returns a Future."""
+        return self.submit(self._call_inner, method, *args)
+
+    def _call_inner(self, method, *args):
+        """Worker thread: call an inner store method, creating the inner store first if needed."""
+        if self.inner is None:
+            self.inner = self.create_inner()
+        return getattr(self.inner, method)(*args)
+
+    def _queue_write(self, method, tasks):
+        """Add a write to the pending batch and push back the flush deadline."""
+        tasks = list(tasks)
+        if not tasks:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._pending and self._pending[-1][0] == method:
+                self._pending[-1][1].extend(tasks)
+            else:
+                self._pending.append([method, tasks])
+            if self._first_pending_at is None:
+                self._first_pending_at = now
+            self._flush_at = min(now + self.debounce, self._first_pending_at + self.max_delay)
+        self._jobs.put(_WAKE)
+
+    def _run(self):
+        """Worker loop: run jobs in order and flush the pending writes when their deadline passes."""
+        while True:
+            with self._lock:
+                flush_at = self._flush_at
+            now = time.monotonic()
+            if flush_at is not None and flush_at <= now:
+                self._write_pending()
+                continue
+
+            try:
+                job = self._jobs.get(timeout=None if flush_at is None else flush_at - now)
+            except queue.Empty:
+                continue
+
+            if job is _WAKE:
+                continue
+            if job is _STOP:
+                self._write_pending()
+                return
+
+            # Any job may read, so it must see every write queued before it
+            self._write_pending()
+            function, args, future = job
+            try:
+                future.set_result(function(*args))
+            except Exception as error:
+                future.set_exception(error)
+
+    def _write_pending(self):
+        """Hand the pending batch to the inner store, one call per run of same-kind writes.
+
+        A failed write goes back to the front of the queue, with every write
+        after it, to be retried later.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._first_pending_at = None
+            self._flush_at = None
+
+        if pending:
+            METRICS.increment("store.flushes")
+        for index, (method, tasks) in enumerate(pending):
+            try:
+                with METRICS.timer(f"store.{method}"):
+                    self._call_inner(method, tasks)
+                METRICS.increment("store.tasks_written", len(tasks))
+            except Exception as error:
+                self._retry_later(pending[index:], error)
+                return
+        if pending:
+            with self._lock:
+                self._failures = 0
+
+    def _retry_later(self, failed, error):
+        """Queue failed writes again ahead of newer ones, and report the first failure in a row."""
+        METRICS.increment("store.write_errors")
+        now = time.monotonic()
+        with self._lock:
+            # A save queued meanwhile holds every task, so only the archive writes still matter
+            if any(op[0] == "save_tasks" for op in self._pending):
+                failed = [op for op in failed if op[0] == "archive_passed_tasks"]
+            self._pending = failed + self._pending
+            self._failures += 1
+            self._last_error = error
+            self._first_pending_at = now
+            self._flush_at = now + min(RETRY_SECONDS * 2 ** (self._failures - 1), MAX_RETRY_SECONDS)
+            first_failure = self._failures == 1
+        if not first_failure:
+            return
+        if self.on_write_error is not None:
+            self.on_write_error(error)
+        else:
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    def _check_written(self):
+        """Flush job, run after the queued writes: raise their error if they could not be written."""
+        with self._lock:
+            if self._failures:
+                raise self._last_error
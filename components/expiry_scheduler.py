@@ -0,0 +1,134 @@
+import heapq
+import itertools
+from collections import Counter
+from datetime import datetime
+
+from components.task import to_epoch_seconds
+
+# Longest single wait, so the timer recovers from clock changes and sleep
+MAX_DELAY_MS = 60 * 60 * 1000
+
+
+class ExpiryScheduler:
+    """Min-heap of task deadlines that wakes up exactly when the next task expires.
+
+    Only one timer is armed at a time, for the earliest deadline in the heap.
+    Adding a task is a heap push; removing one is recorded and the stale heap
+    entry is skipped when it reaches the top. `schedule` and `cancel` follow the
+    Tk `after`/`after_cancel` signatures, so the scheduler itself needs no GUI.
+    """
+
+    def __init__(self, schedule, cancel, on_expired, clock=datetime.now):
+        self.schedule = schedule
+        self.cancel = cancel
+        self.on_expired = on_expired
+        self.clock = clock
+
+        self._heap = []  # Entries are (deadline in epoch seconds, insertion order, task)
+        self._removed = Counter()  # Tasks removed but still present in the heap
+        self._removed_count = 0
+        self._counter = itertools.count()
+        self._timer = None
+        self._armed_deadline = None
+
+    def __len__(self):
+        return len(self._heap) - self._removed_count
+
+    def build_heap(self, tasks):
+        """Return the heap entries for `tasks`, for `reset`; safe to call from another thread."""
+        heap = [(task.deadline, next(self._counter), task) for task in tasks]
+        heapq.heapify(heap)
+        return heap
+
+    def reset(self, tasks, heap=None):
+        """Replace the scheduled tasks with `tasks`, or a heap `build_heap` made of them, and re-arm the timer."""
+        self._heap = self.build_heap(tasks) if heap is None else heap
+        self._removed.clear()
+        self._removed_count = 0
+        self.arm()
+
+    def add(self, task):
+        """Schedule a task's expiry, re-arming only if it is now the earliest deadline."""
+        heapq.heappush(self._heap, (task.deadline, next(self._counter), task))
+        self.arm()
+
+    def remove(self, task):
+        """Stop tracking a task that was deleted before its deadline."""
+        self._removed[task] += 1
+        self._removed_count += 1
+
+        # Rebuild once stale entries make up most of the heap
+        if self._removed_count > len(self._heap) // 2:
+            self._purge()
+        self.arm()
+
+    def pop_expired(self, now=None):
+        """Pop and return every task whose deadline is at or before `now`."""
+        now = to_epoch_seconds(now or self.clock())
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, task = heapq.heappop(self._heap)
+            if self._removed[task]:
+                self._forget_removed(task)
+                continue
+            expired.append(task)
+        return expired
+
+    def arm(self):
+        """Arm a single timer for the earliest live deadline, if it changed."""
+        self._drop_removed_top()
+        deadline = self._heap[0][0] if self._heap else None
+        if deadline == self._armed_deadline and self._timer is not None:
+            return
+
+        self.disarm()
+        if deadline is None:
+            return
+
+        delay = (deadline - to_epoch_seconds(self.clock())) * 1000
+        delay = int(min(max(delay, 0), MAX_DELAY_MS))
+        self._armed_deadline = deadline
+        self._timer = self.schedule(delay, self._fire)
+
+    def disarm(self):
+        """Cancel the pending timer, if any."""
+        if self._timer is not None:
+            self.cancel(self._timer)
+            self._timer = None
+        self._armed_deadline = None
+
+    def _fire(self):
+        """Timer callback: hand expired tasks to `on_expired` and re-arm."""
+        self._timer = None
+        self._armed_deadline = None
+        expired = self.pop_expired()
+        if expired:
+            self.on_expired(expired)
+        self.arm()
+
+    def _drop_removed_top(self):
+        """Discard stale entries sitting at the top of the heap."""
+        while self._heap and self._removed[self._heap[0][2]]:
+            _, _, task = heapq.heappop(self._heap)
+            self._forget_removed(task)
+
+    def _forget_removed(self, task):
+        """Account for a stale heap entry that has just been discarded."""
+        self._removed[task] -= 1
+        self._removed_count -= 1
+        if not self._removed[task]:
+            del self._removed[task]
+
+    def _purge(self):
+        """Rebuild the heap without removed entries."""
+        live = []
+        for entry in self._heap:
+            task = entry[2]
+            if self._removed[task]:
+                self._removed[task] -= 1
+            else:
+                live.append(entry)
+        self._removed.clear()
+        self._removed_count = 0
+        heapq.heapify(live)
+        self._heap = live
@@ -0,0 +1,477 @@
+import heapq
+import math
+import time
+from collections import Counter
+from datetime import datetime
+
+from components.prioritization import (
+    EPSILON, W_DEADLINE, W_PRIORITY, W_TIME_RATIO, TaskBatch, np, score_at
+)
+from components.task import to_epoch_seconds
+
+# A certificate that still holds is checked again at least this many seconds later
+MIN_STEP_SECONDS = 1.0
+
+# Refinement steps spent narrowing down when a pair of score curves meets
+CROSSING_STEPS = 8
+
+# Seconds between ticks while the To Do view is shown, as TO_DO_RESCORE_SECONDS in task_index
+TICK_SECONDS = 60
+
+# Adjacent pairs a rebuild samples to predict how many certificates one tick would process
+SAMPLE_PAIRS = 1024
+
+# Seconds spent on one certificate, until a tick has measured it
+EVENT_SECONDS = 65e-6
+
+# Certifying every pair costs several sorts and the sample is noisy, so a rebuild only certifies
+# when a tick is predicted to cost at most this share of one sort
+CERTIFY_SHARE = 1 / 2
+
+
+def time_to_reach(task, score, current_seconds):
+    """Return the epoch second, not before `current_seconds`, at which `task` scores `score`.
+
+    The score of a task only grows as its deadline nears: with u the hours left,
+    it is c - W_TIME_RATIO * u / (M + u) + W_DEADLINE / (u + EPSILON), which
+    falls strictly on u > -EPSILON. Multiplied out, score(u) = y is a quadratic
+    in u with exactly one root in that range. Returns math.inf if the task
+    never reaches `score`.
+    """
+    constant = W_PRIORITY * task.priority + W_TIME_RATIO
+    if score <= constant - W_TIME_RATIO:
+        return math.inf
+    if score <= score_at(task, current_seconds):
+        return current_seconds
+
+    k = constant - score
+    m = task.minutes / 60 + EPSILON
+    a = k - W_TIME_RATIO
+    b = k * (m + EPSILON) - W_TIME_RATIO * EPSILON + W_DEADLINE
+    c = k * m * EPSILON + W_DEADLINE * m
+    if a == 0:
+        hours_left = -c / b
+    else:
+        # The larger root is the one above -EPSILON; computed without cancellation
+        root = math.sqrt(max(b * b - 4 * a * c, 0.0))
+        q = -0.5 * (b + math.copysign(root, b))
+        roots = [q / a, c / q] if q else [-b / (2 * a)]
+        hours_left = max(roots)
+    return max(task.deadline - hours_left * 3600, current_seconds)
+
+
+def crossing_time(ahead, behind, current_seconds):
+    """Return a time, never later than the first crossing, to check again that `ahead` outscores `behind`.
+
+    Both scores only grow, so `behind` cannot catch up before it reaches the
+    score `ahead` has now. Repeating that step from the new time narrows in on
+    the crossing from below. Pairs whose curves never meet before the earlier
+    deadline get math.inf; the expiry heap removes a task at its deadline.
+    """
+    if ahead.deadline == behind.deadline and ahead.minutes == behind.minutes:
+        return math.inf  # The curves only differ by the priority constant
+    last_moment = min(ahead.deadline, behind.deadline)
+    if current_seconds >= last_moment:
+        return math.inf
+
+    moment = current_seconds
+    for _ in range(CROSSING_STEPS):
+        next_moment = time_to_reach(behind, score_at(ahead, moment), moment)
+        if next_moment >= last_moment:
+            return math.inf
+        if next_moment - moment < MIN_STEP_SECONDS:
+            return next_moment
+        moment = next_moment
+    return moment
+
+
+def crossing_times(deadlines, priority_scores, hours_needed, current_seconds):
+    """Return crossing_time for every adjacent pair of tasks given as NumPy arrays, in one pass."""
+    deadlines = deadlines.astype(np.float64)
+    constants = priority_scores * W_PRIORITY + W_TIME_RATIO
+
+    def scores(index, moment):
+        hours_left = (deadlines[index] - moment) / 3600
+        return (constants[index] - W_TIME_RATIO * hours_left / (hours_needed[index] + hours_left + EPSILON)
+                + W_DEADLINE / (hours_left + EPSILON))
+
+    def times_to_reach(index, score, moment):
+        # Vectorized time_to_reach; never is np.inf
+        k = constants[index] - score
+        m = hours_needed[index] + EPSILON
+        a = k - W_TIME_RATIO
+        b = k * (m + EPSILON) - W_TIME_RATIO * EPSILON + W_DEADLINE
+        c = k * m * EPSILON + W_DEADLINE * m
+        with np.errstate(divide="ignore", invalid="ignore"):
+            root = np.sqrt(np.maximum(b * b - 4 * a * c, 0.0))
+            q = -0.5 * (b + np.copysign(root, b))
+            hours_left = np.where(a == 0, -c / b, np.maximum(q / a, c / q))
+        reached = np.maximum(deadlines[index] - hours_left * 3600, moment)
+        reached = np.where(score <= scores(index, moment), moment, reached)
+        return np.where(score <= constants[index] - W_TIME_RATIO, np.inf, reached)
+
+    ahead = np.arange(len(deadlines) - 1)
+    behind = ahead + 1
+    last_moments = np.minimum(deadlines[ahead], deadlines[behind])
+    moments = np.full(len(ahead), float(current_seconds))
+    result = np.where(current_seconds >= last_moments, np.inf, np.nan)
+    parallel = (deadlines[ahead] == deadlines[behind]) & (hours_needed[ahead] == hours_needed[behind])
+    result[parallel] = np.inf
+
+    pending = np.flatnonzero(np.isnan(result))
+    for _ in range(CROSSING_STEPS):
+        if not len(pending):
+            break
+        moment = moments[pending]
+        next_moment = times_to_reach(behind[pending], scores(ahead[pending], moment), moment)
+        never = next_moment >= last_moments[pending]
+        converged = ~never & (next_moment - moment < MIN_STEP_SECONDS)
+        result[pending[never]] = np.inf
+        result[pending[converged]] = next_moment[converged]
+        moments[pending] = next_moment
+        pending = pending[~never & ~converged]
+    result[pending] = moments[pending]
+    return result
+
+
+def without_positions(items, positions):
+    """Return a copy of a list without the given positions, joined from the slices between them."""
+    result = []
+    start = 0
+    for position in sorted(positions):
+        result += items[start:position]
+        start = position + 1
+    result += items[start:]
+    return result
+
+
+class KineticTaskOrder:
+    """The To Do order maintained as a kinetic sorted list.
+
+    Each score depends only on the current time, so the order changes only
+    when two neighbouring score curves cross. Every adjacent pair holds a
+    certificate: a time before which the front task is known to stay ahead.
+    Certificates live in a min-heap. Advancing the clock only pops those that
+    have run out, swaps the pairs that did cross and certifies the new
+    neighbours. One tick costs about the number of rank changes, not a full
+    rescore and sort.
+
+    Every task in the order has an integer slot. A certificate belongs to the
+    slot of its front task and carries that slot's version; it is ignored once
+    the version has moved on. Slot positions are renumbered lazily, at the next
+    tick after inserts and removals.
+    """
+
+    def __init__(self, prioritization_factory):
+        # Called with a datetime, returns a TaskPrioritization for the initial scores
+        self.prioritization_factory = prioritization_factory
+
+        self.current_time = None
+        self.current_seconds = None
+        self._tasks = []
+        self._slots = []  # Slot of each task, in the same order as _tasks
+        self._positions = []  # Position of each slot in _tasks
+        self._versions = []  # Certificate version of each slot; -1 once removed
+        self._certificates = []  # (time, slot, slot version)
+        self._dirty_from = None  # Slot positions from here on are out of date
+        self._certified = True  # Whether every adjacent pair has a certificate
+        self._event_rate = 0.0  # Certificates processed per second, sampled or seen by the last tick
+        self._event_seconds = EVENT_SECONDS  # Seconds spent on one certificate by the last tick
+        self._sort_seconds = 0.0  # Seconds the last rebuild took to score and sort
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __iter__(self):
+        return iter(self._tasks)
+
+    def __getitem__(self, index):
+        return self._tasks[index]
+
+    @property
+    def tasks(self):
+        """The tasks in To Do order at `current_time` (do not modify)."""
+        return self._tasks
+
+    def rebuild(self, tasks, current_time, certify=True):
+        """Score and sort every task once for `current_time`, then certify every pair if that pays.
+
+        A sample of adjacent pairs predicts how many certificates a tick would
+        process. If that is expected to take more than CERTIFY_SHARE of the
+        time this sort did, or without `certify`, the order is only sorted, and
+        the next `advance` sorts again instead of swapping.
+        """
+        self._set_time(current_time)
+        prioritization = self.prioritization_factory(current_time)
+        self._certificates = []
+        start = time.perf_counter()
+        if prioritization.use_numpy(len(tasks)):
+            batch = TaskBatch(tasks)
+            order = batch.order(current_time)
+            self._tasks = [tasks[index] for index in order.tolist()]
+            self._sort_seconds = time.perf_counter() - start
+            columns = (batch.deadlines[order], batch.priority_scores[order], batch.time_needed[order])
+            self._event_rate = self._sample_event_rate(columns)
+            self._certified = certify and self._certification_pays(self._event_rate, share=CERTIFY_SHARE)
+            if self._certified:
+                moments = crossing_times(*columns, self.current_seconds)
+                finite = np.flatnonzero(np.isfinite(moments))
+                finite = finite[np.argsort(moments[finite], kind="stable")]
+                # A sorted list is already a valid heap
+                self._certificates = list(zip(moments[finite].tolist(), finite.tolist(), [0] * len(finite)))
+        else:
+            scores = prioritization.score_tasks(tasks)
+            order = sorted(range(len(tasks)), key=lambda index: -scores[index])
+            self._tasks = [tasks[index] for index in order]
+            self._sort_seconds = time.perf_counter() - start
+            self._event_rate = self._sample_event_rate()
+            self._certified = certify and self._certification_pays(self._event_rate, share=CERTIFY_SHARE)
+            if self._certified:
+                for position in range(len(self._tasks) - 1):
+                    moment = crossing_time(self._tasks[position], self._tasks[position + 1], self.current_seconds)
+                    if moment != math.inf:
+                        self._certificates.append((moment, position, 0))
+                heapq.heapify(self._certificates)
+
+        self._slots = list(range(len(self._tasks)))
+        self._positions = list(self._slots)
+        self._versions = [0] * len(self._tasks)
+        self._dirty_from = None
+
+    def advance(self, current_time):
+        """Bring the order up to `current_time`, swapping only the pairs whose scores crossed.
+
+        Returns the number of swaps. When the certificates due are expected to
+        take longer than one sort, or a tick already has, the order is rebuilt
+        instead and -1 is returned. Each tick measures the certificate rate
+        and cost that this prediction uses.
+        """
+        if self.current_time is None or current_time < self.current_time:
+            # Certificates only look forward in time
+            self.rebuild(list(self._tasks), current_time)
+            return -1
+        elapsed = (current_time - self.current_time).total_seconds()
+        if not self._certified or not self._certification_pays(self._event_rate, elapsed):
+            self.rebuild(list(self._tasks), current_time)
+            return -1
+        start = time.perf_counter()
+        self._set_time(current_time)
+        self._renumber()
+
+        now = self.current_seconds
+        tasks = self._tasks
+        slots = self._slots
+        positions = self._positions
+        versions = self._versions
+        certificates = self._certificates
+        events = swaps = 0
+        while certificates and certificates[0][0] <= now:
+            _, slot, version = heapq.heappop(certificates)
+            if versions[slot] != version:
+                continue
+            events += 1
+            if time.perf_counter() - start > self._sort_seconds:
+                # Busier than predicted: sort now, and sample again at the next tick
+                self.rebuild(list(tasks), current_time, certify=False)
+                return -1
+            position = positions[slot]
+            ahead, behind = tasks[position], tasks[position + 1]
+            if score_at(behind, now) <= score_at(ahead, now):
+                self._certify(slot, ahead, behind)
+                continue
+
+            behind_slot = slots[position + 1]
+            tasks[position], tasks[position + 1] = behind, ahead
+            slots[position], slots[position + 1] = behind_slot, slot
+            positions[behind_slot], positions[slot] = position, position + 1
+            swaps += 1
+            if position > 0:
+                self._certify(slots[position - 1], tasks[position - 1], behind)
+            self._certify(behind_slot, behind, ahead)
+            if position + 2 < len(tasks):
+                self._certify(slot, ahead, tasks[position + 2])
+            else:
+                versions[slot] += 1
+
+        if events:
+            self._event_seconds = (time.perf_counter() - start) / events
+        if elapsed > 0:
+            self._event_rate = events / elapsed
+
+        # Drop stale certificates once they outnumber the live ones
+        if len(certificates) > 2 * len(tasks) + 64:
+            self._certificates = [item for item in certificates if versions[item[1]] == item[2]]
+            heapq.heapify(self._certificates)
+        return swaps
+
+    def insert(self, task):
+        """Insert a task at its place for `current_time` and return that position."""
+        if self.current_time is None:
+            self._set_time(datetime.now())
+        position = self._bisect(score_at(task, self.current_seconds), right=True)
+        slot = len(self._positions)
+        self._positions.append(position)
+        self._versions.append(0)
+        self._slots.insert(position, slot)
+        self._tasks.insert(position, task)
+        self._mark_dirty(position + 1)
+
+        if position > 0:
+            self._certify(self._slots[position - 1], self._tasks[position - 1], task)
+        if position + 1 < len(self._tasks):
+            self._certify(slot, task, self._tasks[position + 1])
+        return position
+
+    def remove(self, task):
+        """Remove one occurrence of a task and return its former position, or None if absent."""
+        position = self._find(task)
+        if position is None:
+            return None
+        slot = self._slots.pop(position)
+        del self._tasks[position]
+        self._versions[slot] = -1
+        self._mark_dirty(position)
+
+        if position > 0:
+            front_slot = self._slots[position - 1]
+            if position < len(self._tasks):
+                self._certify(front_slot, self._tasks[position - 1], self._tasks[position])
+            else:
+                self._versions[front_slot] += 1
+        return position
+
+    def remove_many(self, tasks):
+        """Remove one occurrence of each task in a single copy of the order; returns how many were removed.
+
+        Tasks are found by score like in `remove`; those out of score order are
+        looked up together in one scan. Only the pairs that become neighbours
+        across a removed run are certified again.
+        """
+        found = set()
+        missing = Counter()
+        for task in tasks:
+            position = self._find_by_score(task, found)
+            if position is None:
+                missing[task] += 1
+            else:
+                found.add(position)
+        if missing:
+            for position, task in enumerate(self._tasks):
+                if missing[task] and position not in found:
+                    missing[task] -= 1
+                    found.add(position)
+        if not found:
+            return 0
+
+        removed = sorted(found)
+        slots = self._slots
+        fronts = []  # (position after the removal, slot) of each task followed by a removed run
+        for count, position in enumerate(removed):
+            self._versions[slots[position]] = -1
+            if position > 0 and (count == 0 or removed[count - 1] != position - 1):
+                fronts.append((position - 1 - count, slots[position - 1]))
+        self._tasks = without_positions(self._tasks, found)
+        self._slots = without_positions(slots, found)
+        self._mark_dirty(removed[0])
+
+        for position, slot in fronts:
+            if position + 1 < len(self._tasks):
+                self._certify(slot, self._tasks[position], self._tasks[position + 1])
+            else:
+                self._versions[slot] += 1
+        return len(removed)
+
+    def _set_time(self, current_time):
+        self.current_time = current_time
+        self.current_seconds = to_epoch_seconds(current_time)
+
+    def _certify(self, slot, ahead, behind):
+        """Replace the certificate of `slot`, whose task `ahead` now has `behind` after it."""
+        self._versions[slot] += 1
+        if not self._certified:
+            return
+        now = self.current_seconds
+        moment = crossing_time(ahead, behind, now)
+        if moment == math.inf:
+            return
+        # A certificate that still holds must move time forward
+        if moment <= now and score_at(behind, now) <= score_at(ahead, now):
+            moment = now + MIN_STEP_SECONDS
+        heapq.heappush(self._certificates, (moment, slot, self._versions[slot]))
+
+    def _sample_event_rate(self, columns=None):
+        """Estimate the certificates due per second from SAMPLE_PAIRS evenly spaced adjacent pairs.
+
+        `columns` holds the deadlines, priority scores and hours needed of the
+        tasks in order as NumPy arrays; without it the pairs are timed one by one.
+        """
+        pairs = len(self._tasks) - 1
+        if pairs < 1:
+            return 0.0
+        fronts = range(0, pairs, max(pairs // SAMPLE_PAIRS, 1))
+        if columns is not None:
+            index = np.repeat(np.array(fronts), 2)
+            index[1::2] += 1
+            moments = crossing_times(*(column[index] for column in columns), self.current_seconds)[::2]
+        else:
+            moments = [crossing_time(self._tasks[front], self._tasks[front + 1], self.current_seconds)
+                       for front in fronts]
+        end = self.current_seconds + TICK_SECONDS
+        due = sum(1 for moment in moments if moment <= end)
+        return due * pairs / len(fronts) / TICK_SECONDS
+
+    def _certification_pays(self, event_rate, elapsed=TICK_SECONDS, share=1.0):
+        """Return whether the certificates due in `elapsed` seconds cost less than `share` of one sort."""
+        return event_rate * elapsed * self._event_seconds < self._sort_seconds * share
+
+    def _bisect(self, score, right):
+        """Return where `score` belongs among the current scores, which are in descending order."""
+        now = self.current_seconds
+        tasks = self._tasks
+        low, high = 0, len(tasks)
+        while low < high:
+            middle = (low + high) // 2
+            middle_score = score_at(tasks[middle], now)
+            if middle_score > score or (right and middle_score == score):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, task):
+        """Return the position of `task`, looking among the tasks with its score first."""
+        position = self._find_by_score(task)
+        if position is not None:
+            return position
+
+        # Tasks past their deadline can sit out of score order until they expire
+        try:
+            return self._tasks.index(task)
+        except ValueError:
+            return None
+
+    def _find_by_score(self, task, skip=()):
+        """Return the position of `task` not in `skip` among the tasks with its score, or None."""
+        now = self.current_seconds
+        score = score_at(task, now)
+        tasks = self._tasks
+        position = self._bisect(score, right=False)
+        while position < len(tasks) and score_at(tasks[position], now) == score:
+            if tasks[position] == task and position not in skip:
+                return position
+            position += 1
+        return None
+
+    def _mark_dirty(self, position):
+        if self._dirty_from is None or position < self._dirty_from:
+            self._dirty_from = position
+
+    def _renumber(self):
+        """Bring slot positions up to date after inserts and removals, from the first change on."""
+        if self._dirty_from is None:
+            return
+        slots = self._slots
+        positions = self._positions
+        for position in range(self._dirty_from, len(slots)):
+            positions[slots[position]] = position
+        self._dirty_from = None
@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+# Durations kept per timer for the percentiles; older ones only count towards the totals
+TIMER_WINDOW = 512
+
+# Rolling metrics file: a snapshot every METRICS_INTERVAL_SECONDS, rotated at METRICS_MAX_BYTES
+METRICS_LOG_PATH = "logs/metrics.log"
+METRICS_INTERVAL_SECONDS = 60
+METRICS_MAX_BYTES = 1024 * 1024
+METRICS_BACKUP_COUNT = 3
+
+# Event loop watchdog: how often it checks, and how late a callback must be to count as a stall
+WATCHDOG_INTERVAL_MS = 100
+STALL_SECONDS = 0.2
+
+
+class TimerStats:
+    """Count, total and maximum of a timer, plus its most recent durations for percentiles."""
+
+    __slots__ = ("count", "total", "maximum", "recent")
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+        self.recent.append(seconds)
+
+    def summary(self):
+        """Return the statistics in milliseconds; percentiles cover the recent durations only."""
+        recent = sorted(self.recent)
+
+        def percentile(fraction):
+            return recent[min(int(fraction * len(recent)), len(recent) - 1)] if recent else 0.0
+
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(percentile(0.50) * 1000, 3),
+            "p99_ms": round(percentile(0.99) * 1000, 3),
+            "max_ms": round(self.maximum * 1000, 3)
+        }
+
+
+class Metrics:
+    """Named timers and counters, safe to update from the UI and the I/O thread at once."""
+
+    def __init__(self, window=TIMER_WINDOW):
+        self.window = window
+        self.started = time.time()
+        self._timers = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        """Add one duration to timer `name`."""
+        with self._lock:
+            stats = self._timers.get(name)
+            if stats is None:
+                stats = self._timers[name] = TimerStats(self.window)
+            stats.add(seconds)
+
+    def increment(self, name, amount=1):
+        """Add `amount` to counter `name`."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        """Time the body of a with block under `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator timing every call of a function under `name`."""
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """Return every timer summary and counter as a JSON-ready dict."""
+        with self._lock:
+            timers = {name: stats.summary() for name, stats in sorted(self._timers.items())}
+            counters = dict(sorted(self._counters.items()))
+        return {"uptime_s": round(time.time() - self.started, 1), "timers": timers, "counters": counters}
+
+    def format_lines(self):
+        """Return one short line per timer and counter, for the stats overlay."""
+        snapshot = self.snapshot()
+        lines = [f"{name:<28} {stats['count']:>7}  p50 {stats['p50_ms']:7.2f}  p99 {stats['p99_ms']:7.2f}  "
+                 f"max {stats['max_ms']:8.2f} ms" for name, stats in snapshot["timers"].items()]
+        lines.extend(f"{name:<28} {value:>7}" for name, value in snapshot["counters"].items())
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+
+# Registry shared by the whole app
+METRICS = Metrics()
+
+
+def timed(name):
+    """Decorator timing a function in the shared registry."""
+    return METRICS.timed(name)
+
+
+class EventLoopWatchdog:
+    """Measures how late `after` callbacks run, which is how long the event loop was blocked.
+
+    Every `interval_ms` it schedules a callback and records the difference
+    between when it ran and when it was due as the `tk.event_loop_lag` timer.
+    Delays above STALL_SECONDS also count as `tk.stalls`. `schedule` and
+    `cancel` follow the Tk `after`/`after_cancel` signatures.
+    """
+
+    def __init__(self, schedule, cancel, metrics=METRICS, interval_ms=WATCHDOG_INTERVAL_MS):
+        self.schedule = schedule
+        self.cancel = cancel
+        self.metrics = metrics
+        self.interval_ms = interval_ms
+        self._timer = None
+        self._due = None
+
+    def start(self):
+        if self._timer is None:
+            self._arm()
+
+    def stop(self):
+        if self._timer is not None:
+            self.cancel(self._timer)
+            self._timer = None
+
+    def _arm(self):
+        self._due = time.perf_counter() + self.interval_ms / 1000
+        self._timer = self.schedule(self.interval_ms, self._tick)
+
+    def _tick(self):
+        lag = max(time.perf_counter() - self._due, 0.0)
+        self.metrics.record("tk.event_loop_lag", lag)
+        if lag > STALL_SECONDS:
+            self.metrics.increment("tk.stalls")
+        self._arm()
+
+
+class MetricsLogger:
+    """Appends a metrics snapshot as a JSON line to a rotating file, from a background thread."""
+
+    def __init__(self, metrics=METRICS, path=METRICS_LOG_PATH, interval=METRICS_INTERVAL_SECONDS,
+                 max_bytes=METRICS_MAX_BYTES, backup_count=METRICS_BACKUP_COUNT):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._stop = threading.Event()
+        self._thread = None
+        self._handler = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backup_count,
+                                            encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="metrics-log", daemon=True)
+        self._thread.start()
+
+    def write(self):
+        """Write one snapshot now."""
+        record = {"time": datetime.now().isoformat(timespec="seconds"), **self.metrics.snapshot()}
+        self._handler.emit(logging.makeLogRecord({"msg": json.dumps(record)}))
+
+    def stop(self):
+        """Stop the thread after writing a last snapshot."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.write()
+        self._handler.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
@@ -0,0 +1,203 @@
+import mmap
+import os
+import struct
+from array import array
+from collections import OrderedDict
+
+from components.task import format_task_summary, from_epoch
+
+# Default location of the archive segments and of the single-file log they replace
+PASSED_ARCHIVE_DIR = "logs/passed"
+LEGACY_PASSED_PATH = "logs/passed_tasks_log.txt"
+
+# A segment is closed and a new one started once it reaches this size
+MAX_SEGMENT_BYTES = 1024 * 1024
+
+# Marker left in the archive directory once the legacy log has been imported
+MIGRATED_MARKER = ".migrated"
+
+# Lines fetched per page by the viewer
+PAGE_LINES = 200
+
+
+class PassedTaskArchive:
+    """Passed task history split into time-bucketed, size-rotated segments.
+
+    Each task goes into a segment named after the month of its deadline
+    (`YYYY-MM-NNN.log`). A segment is rotated once it reaches `max_segment_bytes`.
+    Next to every segment, an `.idx` file holds the byte offset of each line as
+    unsigned 64-bit integers. With it, any line can be found without scanning,
+    and the newest lines can be read without touching the rest of the history.
+    """
+
+    def __init__(self, directory=PASSED_ARCHIVE_DIR, legacy_path=LEGACY_PASSED_PATH, max_segment_bytes=MAX_SEGMENT_BYTES):
+        self.directory = directory
+        self.legacy_path = legacy_path
+        self.max_segment_bytes = max_segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._migrate_legacy_log()
+
+    def append(self, tasks):
+        """Append passed tasks to the segment of their deadline month."""
+        buckets = OrderedDict()
+        for task in tasks:
+            buckets.setdefault(from_epoch(task.deadline).strftime("%Y-%m"), []).append(format_task_summary(task))
+        for bucket, lines in buckets.items():
+            self._append_lines(bucket, lines)
+
+    def segments(self):
+        """Return the segment paths, oldest first."""
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".log"))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def iter_lines(self):
+        """Yield every archived line (without newline), oldest first."""
+        for path in self.segments():
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    yield line.rstrip("\n")
+
+    def open_reader(self):
+        """Return a reader over the archive as it is now, newest line first."""
+        return PassedTaskReader(self.segments())
+
+    def _append_lines(self, bucket, lines):
+        """Write lines to the current segment of `bucket`, rotating when it is full."""
+        path = self._current_segment(bucket)
+        with open(path, "ab") as file:
+            offset = file.tell()
+            offsets = array("Q")
+            chunks = []
+            for line in lines:
+                data = f"{line}\n".encode("utf-8")
+                offsets.append(offset)
+                chunks.append(data)
+                offset += len(data)
+            file.write(b"".join(chunks))
+
+        # The index is written after the data, so every indexed line is complete
+        with open(f"{path}.idx", "ab") as index_file:
+            offsets.tofile(index_file)
+
+    def _current_segment(self, bucket):
+        """Return the newest segment of `bucket`, or a new one if it is full."""
+        existing = sorted(name for name in os.listdir(self.directory)
+                          if name.startswith(f"{bucket}-") and name.endswith(".log"))
+        if existing:
+            path = os.path.join(self.directory, existing[-1])
+            if os.path.getsize(path) < self.max_segment_bytes:
+                return path
+            number = int(existing[-1][len(bucket) + 1:-len(".log")]) + 1
+        else:
+            number = 0
+        return os.path.join(self.directory, f"{bucket}-{number:03d}.log")
+
+    def _migrate_legacy_log(self):
+        """Copy the single-file passed task log into segments, once."""
+        marker = os.path.join(self.directory, MIGRATED_MARKER)
+        if os.path.exists(marker):
+            return
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            # Imported as the oldest bucket, keeping the original order
+            with open(self.legacy_path, "r") as file:
+                lines = [line.rstrip("\n") for line in file if line.strip()]
+            if lines:
+                self._append_lines("0000-00", lines)
+        with open(marker, "w"):
+            pass
+
+
+class PassedTaskReader:
+    """Random access to archived lines, newest first, through memory-mapped segments.
+
+    Opening only reads the size of each segment's index, so it costs the same
+    however long the history is. Lines are decoded a page at a time when asked
+    for, and recently used pages are cached.
+    """
+
+    def __init__(self, segment_paths, page_lines=PAGE_LINES, cached_pages=16):
+        self.page_lines = page_lines
+        self.cached_pages = cached_pages
+        self._pages = OrderedDict()
+
+        # Newest segment first, with the number of indexed lines in each
+        self._segments = []
+        self._total = 0
+        for path in reversed(segment_paths):
+            index_path = f"{path}.idx"
+            count = os.path.getsize(index_path) // 8 if os.path.exists(index_path) else 0
+            if count:
+                self._segments.append([path, count, None, None])
+                self._total += count
+
+    def __len__(self):
+        return self._total
+
+    def __getitem__(self, index):
+        """Return one line, or a list of lines for a slice; 0 is the newest line."""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._total)
+            return [self._line(position) for position in range(start, stop, step)]
+        if index < 0:
+            index += self._total
+        if not 0 <= index < self._total:
+            raise IndexError(index)
+        return self._line(index)
+
+    def close(self):
+        """Unmap every segment that was opened."""
+        for segment in self._segments:
+            if segment[2] is not None:
+                segment[2].close()
+                segment[3].close()
+                segment[2] = segment[3] = None
+        self._pages.clear()
+
+    def _line(self, position):
+        """Return the line at a newest-first position, loading its page if needed."""
+        page_number, offset = divmod(position, self.page_lines)
+        page = self._pages.get(page_number)
+        if page is None:
+            page = self._load_page(page_number)
+            self._pages[page_number] = page
+            if len(self._pages) > self.cached_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_number)
+        return page[offset]
+
+    def _load_page(self, page_number):
+        """Decode the lines of one page, which may span several segments."""
+        start = page_number * self.page_lines
+        stop = min(start + self.page_lines, self._total)
+        lines = []
+        segment_start = 0
+        for segment in self._segments:
+            count = segment[1]
+            segment_stop = segment_start + count
+            if segment_stop > start and segment_start < stop:
+                first = max(start, segment_start) - segment_start
+                last = min(stop, segment_stop) - segment_start
+                lines.extend(self._segment_lines(segment, first, last))
+            if segment_stop >= stop:
+                break
+            segment_start = segment_stop
+        return lines
+
+    def _segment_lines(self, segment, first, last):
+        """Return newest-first lines `first`..`last` of one segment."""
+        path, count, data, offsets = segment
+        if data is None:
+            with open(path, "rb") as file:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            with open(f"{path}.idx", "rb") as file:
+                offsets = mmap.mmap(file.fileno(), count * 8, access=mmap.ACCESS_READ)
+            segment[2], segment[3] = data, offsets
+
+        lines = []
+        # Newest-first position p is line count - 1 - p of the segment
+        for line_number in range(count - 1 - first, count - 1 - last, -1):
+            start = struct.unpack_from("=Q", offsets, line_number * 8)[0]
+            end = data.find(b"\n", start)
+            lines.append(data[start:end if end != -1 else len(data)].decode("utf-8"))
+        return lines
@@ -0,0 +1,128 @@
+from components.metrics import timed
+from components.task import to_epoch_seconds
+
+# NumPy is optional; without it the To Do order is scored in pure Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Weights adjustment based on the previous recommendation
+W_PRIORITY = 5    # Weight for priority score
+W_TIME_RATIO = 10  # Weight for time ratio
+W_DEADLINE = 100  # Weight for deadline proximity
+
+# Small constant to avoid division by zero
+EPSILON = 0.1
+
+# Scoring modes for TaskPrioritization
+SCORING_AUTO = "auto"
+SCORING_PYTHON = "python"
+SCORING_NUMPY = "numpy"
+
+# Below this many tasks the per-task Python loop is faster than building arrays
+VECTORIZE_MIN_TASKS = 256
+
+
+def score_at(task, current_seconds):
+    """Evaluate score based on priority, time needed, and proximity to due date, at `current_seconds` since EPOCH."""
+    # Calculate time difference in hours between current time and deadline
+    time_until_deadline = (task.deadline - current_seconds) / 3600
+
+    # Convert time_needed to hours
+    total_time_needed = task.minutes / 60
+
+    # Calculate urgency score using the adjusted weights
+    urgency_score = (
+        W_PRIORITY * task.priority +
+        W_TIME_RATIO * (1 - time_until_deadline / (total_time_needed + time_until_deadline + EPSILON)) +
+        W_DEADLINE / (time_until_deadline + EPSILON)
+    )
+
+    return urgency_score
+
+
+class TaskBatch:
+    """Deadlines, priorities and durations of a list of tasks held in NumPy arrays.
+
+    The arrays are built once; `scores` then evaluates the urgency formula for
+    every task in one vectorized expression, for any current time.
+    """
+
+    def __init__(self, tasks):
+        if np is None:
+            raise RuntimeError("NumPy is required for vectorized task scoring")
+        self.tasks = tasks
+        count = len(tasks)
+
+        # The numeric Task fields copy straight into arrays
+        self.deadlines = np.fromiter((task.deadline for task in tasks), dtype=np.int64, count=count)
+        self.priority_scores = np.fromiter((task.priority for task in tasks), dtype=np.float64, count=count)
+        self.time_needed = np.fromiter((task.minutes for task in tasks), dtype=np.float64, count=count) / 60
+
+    def scores(self, current_time):
+        """Return the urgency score of every task at `current_time`."""
+        # Same operations, in the same order, as score_at
+        time_until_deadline = (self.deadlines - to_epoch_seconds(current_time)) / 3600
+        return (
+            W_PRIORITY * self.priority_scores +
+            W_TIME_RATIO * (1 - time_until_deadline / (self.time_needed + time_until_deadline + EPSILON)) +
+            W_DEADLINE / (time_until_deadline + EPSILON)
+        )
+
+    def order(self, current_time, top_k=None):
+        """Return task indices by descending score, ties kept in list order, optionally only the top k."""
+        negated = -self.scores(current_time)
+        if top_k is not None and top_k < len(negated):
+            # Of the tasks tied with the k-th score, keep the first ones in the list, as the stable sort does
+            kth_score = negated[np.argpartition(negated, top_k - 1)[top_k - 1]]
+            better = np.flatnonzero(negated < kth_score)
+            tied = np.flatnonzero(negated == kth_score)[:top_k - len(better)]
+            candidates = np.concatenate((better, tied))
+            return candidates[np.lexsort((candidates, negated[candidates]))]
+        return np.argsort(negated, kind="stable")
+
+
+class TaskPrioritization:
+    """Class to evaluate the score of a task based on priority, time needed, and due date."""
+
+    def __init__(self, current_time, mode=SCORING_AUTO):
+        self.current_time = current_time
+        self.mode = mode
+
+        # Current time in the same unit as Task.deadline
+        self.current_seconds = to_epoch_seconds(current_time)
+
+    def evaluate_task_score(self, task):
+        """Evaluate score based on priority, time needed, and proximity to due date."""
+        return score_at(task, self.current_seconds)
+
+    def use_numpy(self, task_count):
+        """Return whether `task_count` tasks should be scored with the vectorized batch."""
+        if self.mode == SCORING_NUMPY:
+            if np is None:
+                raise RuntimeError("NumPy is required for the numpy scoring mode")
+            return True
+        if self.mode == SCORING_PYTHON:
+            return False
+        return np is not None and task_count >= VECTORIZE_MIN_TASKS
+
+    @timed("prioritization.score_tasks")
+    def score_tasks(self, tasks):
+        """Return the score of each task, in the same order as `tasks`."""
+        if self.use_numpy(len(tasks)):
+            return TaskBatch(tasks).scores(self.current_time).tolist()
+        return [self.evaluate_task_score(task) for task in tasks]
+
+    @timed("prioritization.get_ordered_tasks")
+    def get_ordered_tasks(self, tasks, top_k=None):
+        """Return tasks ordered by evaluated score, in descending order (higher score = higher priority)."""
+        if self.use_numpy(len(tasks)):
+            batch = TaskBatch(tasks)
+            return [tasks[index] for index in batch.order(self.current_time, top_k).tolist()]
+
+        # Evaluate score for each task
+        scored_tasks = [(task, self.evaluate_task_score(task)) for task in tasks]
+        # Sort tasks by score in descending order
+        ordered_tasks = sorted(scored_tasks, key=lambda x: x[1], reverse=True)
+        return [task for task, score in ordered_tasks][:top_k]
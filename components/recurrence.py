@@ -0,0 +1,285 @@
+import heapq
+import itertools
+import os
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from components.task import Task, format_task, parse_task
+
+# Repeat rules; "every N days" takes its N from RecurringTask.interval
+RULE_DAILY = "daily"
+RULE_WEEKLY = "weekly"
+RULE_WEEKDAYS = "weekdays"
+RULE_EVERY_N_DAYS = "every N days"
+REPEAT_RULES = [RULE_DAILY, RULE_WEEKLY, RULE_WEEKDAYS, RULE_EVERY_N_DAYS]
+
+# How far ahead occurrences are materialized; TASK_RECURRENCE_HORIZON_DAYS overrides it
+RECURRENCE_HORIZON_DAYS = 14
+
+DAY_SECONDS = 24 * 60 * 60
+SATURDAY = 5
+
+# Rule text after the task fields in the recurring task file
+REPEATS_SEPARATOR = ", Repeats: "
+EVERY_N_DAYS = re.compile(r"every (\d+) days?")
+
+
+def recurrence_horizon():
+    """Return the materialization horizon from TASK_RECURRENCE_HORIZON_DAYS, or the default."""
+    return timedelta(days=float(os.environ.get("TASK_RECURRENCE_HORIZON_DAYS", RECURRENCE_HORIZON_DAYS)))
+
+
+def _weekday(seconds):
+    """Weekday (Monday = 0) of an epoch second; EPOCH was a Thursday."""
+    return (seconds // DAY_SECONDS + 3) % 7
+
+
+class RecurringTask:
+    """A task repeated by a rule, stored once however many times it occurs.
+
+    `task` is the first occurrence; every later occurrence is a plain Task with
+    the same name, priority and time needed, and the same time of day. Like
+    Task, a RecurringTask is an immutable value usable as a dict key.
+    """
+
+    __slots__ = ("task", "rule", "interval")
+
+    def __init__(self, task, rule, interval=1):
+        if rule not in REPEAT_RULES:
+            raise ValueError(f"Unknown repeat rule: {rule}")
+        if rule != RULE_EVERY_N_DAYS:
+            interval = 1
+        elif interval < 1:
+            raise ValueError("A task cannot repeat more often than every day")
+        self.task = task
+        self.rule = rule
+        self.interval = interval
+
+    @property
+    def step_seconds(self):
+        """Seconds between occurrences; weekday rules step a day and skip weekends."""
+        if self.rule == RULE_WEEKLY:
+            return 7 * DAY_SECONDS
+        return self.interval * DAY_SECONDS
+
+    def describe(self):
+        """Return the rule as written in the recurring task file, e.g. "weekly" or "every 3 days"."""
+        if self.rule == RULE_EVERY_N_DAYS:
+            return f"every {self.interval} days"
+        return self.rule
+
+    def occurrences(self, start=None):
+        """Yield the occurrences due at or after `start` (epoch seconds), earliest first, without end.
+
+        Occurrences before `start` are skipped arithmetically, so the cost does
+        not grow with the age of the rule.
+        """
+        deadline = self.task.deadline
+        step = self.step_seconds
+        if start is not None and start > deadline:
+            deadline += -(-(start - deadline) // step) * step
+        while True:
+            if self.rule != RULE_WEEKDAYS or _weekday(deadline) < SATURDAY:
+                yield Task(self.task.name, deadline, self.task.priority, self.task.minutes)
+            deadline += step
+
+    def _fields(self):
+        return (self.task, self.rule, self.interval)
+
+    def __eq__(self, other):
+        if not isinstance(other, RecurringTask):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self):
+        return hash(self._fields())
+
+    def __repr__(self):
+        return f"RecurringTask({self.task!r}, {self.describe()})"
+
+
+def format_recurring_task(recurring):
+    """Return the recurring task file line (without newline) for a recurring task."""
+    return f"{format_task(recurring.task)}{REPEATS_SEPARATOR}{recurring.describe()}"
+
+
+def repeat_task(task, repeats):
+    """Build a RecurringTask from its first occurrence and a rule text from `describe`."""
+    repeats = repeats.strip()
+    match = EVERY_N_DAYS.fullmatch(repeats)
+    if match:
+        return RecurringTask(task, RULE_EVERY_N_DAYS, int(match.group(1)))
+    return RecurringTask(task, repeats)
+
+
+def parse_recurring_task(line):
+    """Parse a recurring task file line back into a RecurringTask."""
+    task_line, repeats = line.rsplit(REPEATS_SEPARATOR, 1)
+    return repeat_task(parse_task(task_line), repeats)
+
+
+class RecurrenceSchedule:
+    """The occurrences of recurring tasks that are currently materialized as plain Tasks.
+
+    Each rule keeps one lazy generator. Only occurrences due within `horizon`
+    of the current time are taken from it, plus always the next one, so a rule
+    repeating less often than the horizon is still shown. The next occurrence
+    of every rule waits in a min-heap; `roll_forward` pops the ones that have
+    entered the horizon, so an occurrence passing costs a few heap operations
+    however many tasks and rules there are.
+    """
+
+    def __init__(self, horizon=None):
+        self.horizon = recurrence_horizon() if horizon is None else horizon
+        self.rules = []
+
+        self._upcoming = []  # Heap of (deadline, insertion order, rule, occurrence, generator)
+        self._order = itertools.count()
+        self._materialized = Counter()  # Occurrence -> how many are in the orders
+        self._owners = defaultdict(list)  # Occurrence -> rules that produced it
+        self._live = Counter()  # Rule -> materialized occurrences not yet passed
+
+    def __len__(self):
+        return sum(self._materialized.values())
+
+    @property
+    def occurrences(self):
+        """Every materialized occurrence."""
+        return list(self._materialized.elements())
+
+    def is_occurrence(self, task):
+        return self._materialized[task] > 0
+
+    def split(self, tasks):
+        """Split tasks into (stored tasks, materialized occurrences)."""
+        if not self._materialized:
+            return list(tasks), []
+        remaining = Counter(self._materialized)
+        stored, occurrences = [], []
+        for task in tasks:
+            if remaining[task]:
+                remaining[task] -= 1
+                occurrences.append(task)
+            else:
+                stored.append(task)
+        return stored, occurrences
+
+    def set_rules(self, rules, now):
+        """Replace every rule; returns the occurrences to show for `now` (epoch seconds)."""
+        self.rules = []
+        self._upcoming = []
+        self._materialized.clear()
+        self._owners.clear()
+        self._live.clear()
+        new_occurrences = []
+        for rule in rules:
+            new_occurrences.extend(self.add_rule(rule, now))
+        return new_occurrences
+
+    def add_rule(self, rule, now):
+        """Start expanding `rule`; returns its occurrences due within the horizon (at least one)."""
+        if rule in self.rules:
+            return []
+        self.rules.append(rule)
+        generator = rule.occurrences(now + 1)
+        self._push(rule, generator)
+        return self._materialize_next(rule) + self._materialize_horizon(now)
+
+    def remove_rule(self, rule):
+        """Stop expanding `rule`; returns its occurrences that are still materialized."""
+        self.rules.remove(rule)
+        self._upcoming = [entry for entry in self._upcoming if entry[2] != rule]
+        heapq.heapify(self._upcoming)
+        removed = []
+        for occurrence, owners in list(self._owners.items()):
+            while rule in owners:
+                owners.remove(rule)
+                removed.append(occurrence)
+            if not owners:
+                del self._owners[occurrence]
+        self._materialized.subtract(removed)
+        self._materialized += Counter()  # Drop the zero counts
+        del self._live[rule]
+        return removed
+
+    def roll_forward(self, passed_occurrences, now):
+        """Forget passed occurrences and return the ones that replace them.
+
+        A rule whose last materialized occurrence passed gets its next one;
+        every rule also contributes whatever has entered the horizon since.
+        """
+        emptied = []
+        for occurrence in passed_occurrences:
+            if not self._materialized[occurrence]:
+                continue
+            self._materialized[occurrence] -= 1
+            if not self._materialized[occurrence]:
+                del self._materialized[occurrence]
+            rule = self._owners[occurrence].pop(0)
+            if not self._owners[occurrence]:
+                del self._owners[occurrence]
+            self._live[rule] -= 1
+            if not self._live[rule]:
+                emptied.append(rule)
+
+        new_occurrences = []
+        for rule in emptied:
+            new_occurrences.extend(self._materialize_next(rule))
+        new_occurrences.extend(self._materialize_horizon(now))
+        return new_occurrences
+
+    def _push(self, rule, generator):
+        occurrence = next(generator)
+        heapq.heappush(self._upcoming, (occurrence.deadline, next(self._order), rule, occurrence, generator))
+
+    def _take(self, index):
+        """Materialize the upcoming entry at `index` of the heap and queue its rule's next occurrence."""
+        if index == 0:
+            _, _, rule, occurrence, generator = heapq.heappop(self._upcoming)
+        else:
+            _, _, rule, occurrence, generator = self._upcoming.pop(index)
+            heapq.heapify(self._upcoming)
+        self._materialized[occurrence] += 1
+        self._owners[occurrence].append(rule)
+        self._live[rule] += 1
+        self._push(rule, generator)
+        return occurrence
+
+    def _materialize_next(self, rule):
+        """Materialize the next occurrence of `rule` if it has none showing."""
+        if self._live[rule]:
+            return []
+        for index, entry in enumerate(self._upcoming):
+            if entry[2] == rule:
+                return [self._take(index)]
+        return []
+
+    def _materialize_horizon(self, now):
+        """Materialize every upcoming occurrence due within the horizon of `now`."""
+        end = now + self.horizon.total_seconds()
+        new_occurrences = []
+        while self._upcoming and self._upcoming[0][0] <= end:
+            new_occurrences.append(self._take(0))
+        return new_occurrences
+
+
+def read_recurring_tasks(path, on_unreadable=None):
+    """Return the recurring tasks stored in `path`, or an empty list if it does not exist.
+
+    Lines that cannot be parsed are skipped, and passed with the error to
+    `on_unreadable` if given.
+    """
+    if not os.path.exists(path):
+        return []
+    recurring_tasks = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                recurring_tasks.append(parse_recurring_task(line.rstrip("\n")))
+            except (ValueError, KeyError) as error:
+                if on_unreadable is not None:
+                    on_unreadable(line, error)
+    return recurring_tasks
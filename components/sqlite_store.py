@@ -0,0 +1,298 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from components.passed_archive import PASSED_ARCHIVE_DIR, LEGACY_PASSED_PATH, MIGRATED_MARKER
+from components.recurrence import repeat_task
+from components.task import PRIORITY_LEVELS, Task, format_task_summary, parse_task, to_epoch
+from components.task_store import TaskStore, JournalTaskStore, TASK_LOG_PATH, TASK_JOURNAL_PATH
+
+# Default location of the task database
+TASK_DB_PATH = "logs/tasks.db"
+
+# Stored in PRAGMA user_version; version 1 kept deadlines, priorities and times needed as text
+SCHEMA_VERSION = 2
+
+# Tasks are stored like Task holds them: deadline in seconds since EPOCH,
+# priority as its PRIORITY_LEVELS value and the time needed in minutes
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    deadline INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    minutes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_deadline ON tasks (deadline);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority, deadline);
+CREATE TABLE IF NOT EXISTS passed_tasks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    deadline INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    minutes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recurring_tasks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    deadline INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    minutes INTEGER NOT NULL,
+    repeats TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Tables holding tasks, and the extra columns each has after the task fields
+TASK_TABLES = {"tasks": (), "passed_tasks": (), "recurring_tasks": ("repeats",)}
+
+
+def _to_row(task):
+    """Convert a Task to a database row."""
+    return (task.name, task.deadline, task.priority, task.minutes)
+
+
+def _from_text_row(row):
+    """Convert a row of the version 1 schema, with ISO deadlines and priority names, to a Task."""
+    return Task.create(row[0], datetime.fromisoformat(row[1]), row[2], row[3])
+
+
+def _text_passed_lines(passed_archive=None):
+    """Yield the lines of the text passed task history, without creating or migrating an archive.
+
+    Without `passed_archive`, the segments in PASSED_ARCHIVE_DIR are read if
+    it exists, after the legacy single-file log if that was never migrated.
+    """
+    if passed_archive is not None:
+        yield from passed_archive.iter_lines()
+        return
+    paths = []
+    if not os.path.exists(os.path.join(PASSED_ARCHIVE_DIR, MIGRATED_MARKER)) and os.path.exists(LEGACY_PASSED_PATH):
+        paths.append(LEGACY_PASSED_PATH)
+    if os.path.isdir(PASSED_ARCHIVE_DIR):
+        paths.extend(os.path.join(PASSED_ARCHIVE_DIR, name)
+                     for name in sorted(os.listdir(PASSED_ARCHIVE_DIR)) if name.endswith(".log"))
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield line.rstrip("\n")
+
+
+class SqliteTaskStore(TaskStore):
+    """Task store backed by an indexed SQLite database.
+
+    Deadlines and priorities are indexed, so range and priority queries do not
+    need every task in memory. The text logs are imported the first time the
+    database is opened.
+    """
+
+    def __init__(self, db_path=TASK_DB_PATH, task_log_path=TASK_LOG_PATH,
+                 journal_path=TASK_JOURNAL_PATH, passed_archive=None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._upgrade_schema()
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._import_text_logs(task_log_path, journal_path, passed_archive)
+
+    def load_tasks(self):
+        """Return every stored task."""
+        return self._query("SELECT name, deadline, priority, minutes FROM tasks ORDER BY id")
+
+    def save_tasks(self, tasks):
+        """Replace the stored tasks with `tasks` in a single transaction."""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM tasks")
+            self.connection.executemany(
+                "INSERT INTO tasks (name, deadline, priority, minutes) VALUES (?, ?, ?, ?)",
+                map(_to_row, tasks)
+            )
+
+    def add_tasks(self, tasks):
+        """Insert tasks in a single transaction."""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO tasks (name, deadline, priority, minutes) VALUES (?, ?, ?, ?)",
+                map(_to_row, tasks)
+            )
+
+    def remove_tasks(self, tasks):
+        """Delete one stored row per task in a single transaction."""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM tasks WHERE id = (SELECT id FROM tasks WHERE name = ? AND deadline = ? "
+                "AND priority = ? AND minutes = ? LIMIT 1)",
+                map(_to_row, tasks)
+            )
+
+    def load_recurring_tasks(self):
+        """Return every recurring task rule, in the order they were added."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT name, deadline, priority, minutes, repeats FROM recurring_tasks ORDER BY id"
+            ).fetchall()
+        return [repeat_task(Task(*row[:4]), row[4]) for row in rows]
+
+    def save_recurring_tasks(self, recurring_tasks):
+        """Replace the recurring task rules in a single transaction."""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM recurring_tasks")
+            self.connection.executemany(
+                "INSERT INTO recurring_tasks (name, deadline, priority, minutes, repeats) VALUES (?, ?, ?, ?, ?)",
+                [_to_row(recurring.task) + (recurring.describe(),) for recurring in recurring_tasks]
+            )
+
+    def archive_passed_tasks(self, tasks):
+        """Insert passed tasks into the passed task table."""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO passed_tasks (name, deadline, priority, minutes) VALUES (?, ?, ?, ?)",
+                map(_to_row, tasks)
+            )
+
+    def load_passed_tasks_text(self):
+        """Return the passed tasks formatted like the passed task log, or None if there are none."""
+        tasks = self._query("SELECT name, deadline, priority, minutes FROM passed_tasks ORDER BY id")
+        if not tasks:
+            return None
+        return "".join(f"{format_task_summary(task)}\n" for task in tasks)
+
+    def open_passed_tasks_reader(self):
+        """Return a paged reader over the passed task table, newest first."""
+        return SqlitePassedTaskReader(self)
+
+    def tasks_due_before(self, deadline):
+        """Return the tasks due before `deadline` using the deadline index."""
+        return self._query(
+            "SELECT name, deadline, priority, minutes FROM tasks WHERE deadline < ? ORDER BY deadline",
+            (to_epoch(deadline),)
+        )
+
+    def tasks_with_priority(self, priority):
+        """Return the tasks with the given priority using the priority index."""
+        return self._query(
+            "SELECT name, deadline, priority, minutes FROM tasks WHERE priority = ? ORDER BY deadline",
+            (PRIORITY_LEVELS[priority],)
+        )
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self.connection.close()
+
+    def _query(self, sql, parameters=()):
+        """Run a SELECT of the task columns and build a Task from each row, without parsing."""
+        with self._lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+        return [Task(*row) for row in rows]
+
+    def _upgrade_schema(self):
+        """Convert a version 1 database, which stored the task fields as text, to integer columns."""
+        with self._lock:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(tasks)")]
+            tables = {row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if version >= SCHEMA_VERSION or "time_needed" not in columns:
+            return
+
+        with self._lock, self.connection:
+            # DDL does not open a transaction by itself; the conversion must be all or nothing
+            self.connection.execute("BEGIN")
+            converted = {}
+            for table, extra in TASK_TABLES.items():
+                if table not in tables:
+                    continue
+                extra_columns = "".join(f", {column}" for column in extra)
+                rows = self.connection.execute(
+                    f"SELECT name, deadline, priority, time_needed{extra_columns} FROM {table} ORDER BY id"
+                ).fetchall()
+                converted[table] = (extra_columns, [_to_row(_from_text_row(row)) + tuple(row[4:]) for row in rows])
+                self.connection.execute(f"DROP TABLE {table}")
+            # One statement at a time, since executescript would commit first
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    self.connection.execute(statement)
+            for table, (extra_columns, rows) in converted.items():
+                placeholders = ", ".join("?" * (4 + extra_columns.count(",")))
+                self.connection.executemany(
+                    f"INSERT INTO {table} (name, deadline, priority, minutes{extra_columns}) VALUES ({placeholders})", rows
+                )
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _import_text_logs(self, task_log_path, journal_path, passed_archive):
+        """Copy the existing text logs into the database, once."""
+        with self._lock:
+            imported = self.connection.execute("SELECT value FROM meta WHERE key = 'text_logs_imported'").fetchone()
+        if imported:
+            return
+
+        # The journal store already knows how to replay snapshot plus journal
+        text_store = JournalTaskStore(task_log_path, journal_path)
+        tasks = text_store.load_tasks()
+        recurring_tasks = text_store.load_recurring_tasks()
+        text_store.close()
+
+        passed_tasks = []
+        for line in _text_passed_lines(passed_archive):
+            try:
+                passed_tasks.append(parse_task(line))
+            except (ValueError, KeyError):
+                continue
+
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO tasks (name, deadline, priority, minutes) VALUES (?, ?, ?, ?)",
+                map(_to_row, tasks)
+            )
+            self.connection.executemany(
+                "INSERT INTO passed_tasks (name, deadline, priority, minutes) VALUES (?, ?, ?, ?)",
+                map(_to_row, passed_tasks)
+            )
+            self.connection.executemany(
+                "INSERT INTO recurring_tasks (name, deadline, priority, minutes, repeats) VALUES (?, ?, ?, ?, ?)",
+                [_to_row(recurring.task) + (recurring.describe(),) for recurring in recurring_tasks]
+            )
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('text_logs_imported', '1')")
+
+
+class SqlitePassedTaskReader:
+    """Newest-first sequence of passed task lines, fetched from SQLite a page at a time."""
+
+    def __init__(self, store, page_lines=200):
+        self.store = store
+        self.page_lines = page_lines
+        self._page_number = None
+        self._page = []
+        with store._lock:
+            self._last_id = store.connection.execute("SELECT COALESCE(MAX(id), 0) FROM passed_tasks").fetchone()[0]
+            self._total = store.connection.execute("SELECT COUNT(*) FROM passed_tasks").fetchone()[0]
+
+    def __len__(self):
+        return self._total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._total)
+            return [self[position] for position in range(start, stop, step)]
+        if not 0 <= index < self._total:
+            raise IndexError(index)
+        page_number, offset = divmod(index, self.page_lines)
+        if page_number != self._page_number:
+            tasks = self.store._query(
+                "SELECT name, deadline, priority, minutes FROM passed_tasks WHERE id <= ? "
+                "ORDER BY id DESC LIMIT ? OFFSET ?",
+                (self._last_id, self.page_lines, page_number * self.page_lines)
+            )
+            self._page = [format_task_summary(task) for task in tasks]
+            self._page_number = page_number
+        return self._page[offset]
+
+    def close(self):
+        self._page = []
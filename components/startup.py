@@ -0,0 +1,37 @@
+import sys
+import time
+
+
+class StartupTimings:
+    """Records how long each startup phase took, measured from `started`.
+
+    `mark` is called as each phase finishes; `report` prints every phase with
+    the time since the previous one and since startup began.
+    """
+
+    def __init__(self, started=None, stream=None):
+        self.started = time.perf_counter() if started is None else started
+        self.stream = stream or sys.stderr
+        self.phases = []  # (phase name, seconds since started)
+
+    def mark(self, phase):
+        """Record that `phase` has just finished; each phase is only recorded once."""
+        if any(name == phase for name, _ in self.phases):
+            return
+        self.phases.append((phase, time.perf_counter() - self.started))
+
+    def elapsed(self, phase):
+        """Return the seconds from startup to the end of `phase`, or None if it has not happened."""
+        for name, seconds in self.phases:
+            if name == phase:
+                return seconds
+        return None
+
+    def report(self):
+        """Print one line per phase to the stream."""
+        previous = 0.0
+        print("Startup timings:", file=self.stream)
+        for name, seconds in self.phases:
+            print(f"  {name:<20} +{(seconds - previous) * 1000:8.1f} ms  {seconds * 1000:8.1f} ms",
+                  file=self.stream)
+            previous = seconds
@@ -0,0 +1,35 @@
+import tkinter as tk
+
+from components.metrics import METRICS
+
+# How often the overlay redraws its figures
+OVERLAY_REFRESH_MS = 1000
+
+
+class StatsOverlay(tk.Toplevel):
+    """Small always-on-top window showing the live timers and counters of a Metrics registry."""
+
+    def __init__(self, master, metrics=METRICS, refresh_ms=OVERLAY_REFRESH_MS):
+        super().__init__(master)
+        self.metrics = metrics
+        self.refresh_ms = refresh_ms
+        self._timer = None
+
+        self.title("Performance")
+        self.attributes("-topmost", True)
+        self.label = tk.Label(self, font=("Courier", 9), justify="left", anchor="nw", bg="black", fg="#7CFC00",
+                              padx=6, pady=4)
+        self.label.pack(fill="both", expand=True)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def refresh(self):
+        """Redraw the figures and schedule the next redraw."""
+        self.label.config(text="\n".join(self.metrics.format_lines()) or "No measurements yet")
+        self._timer = self.after(self.refresh_ms, self.refresh)
+
+    def close(self):
+        if self._timer is not None:
+            self.after_cancel(self._timer)
+            self._timer = None
+        self.destroy()
@@ -0,0 +1,136 @@
+import re
+from datetime import datetime, timedelta
+
+# Naive datetimes are converted to whole seconds since this point, without any timezone shift
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+# Priority levels; the level doubles as the priority score of the To Do algorithm
+PRIORITY_LEVELS = {"High": 3, "Medium": 2, "Low": 1}
+PRIORITY_NAMES = {level: name for name, level in PRIORITY_LEVELS.items()}
+
+# Formats accepted for the deadline field, most complete first
+DEADLINE_FORMATS = [
+    "%m/%d/%y %H:%M:%S",  # Format with date, hour, minute, and second
+    "%m/%d/%y %H:%M",     # Format with date, hour, and minute
+    "%m/%d/%y"            # Format with only date
+]
+
+# Line breaks and other control characters, which would split a task log line
+CONTROL_CHARACTERS = re.compile(r"[\x00-\x1f\x7f-\x9f\u2028\u2029]")
+
+
+def to_epoch(moment):
+    """Convert a naive datetime to whole seconds since EPOCH."""
+    return (moment - EPOCH) // ONE_SECOND
+
+
+def to_epoch_seconds(moment):
+    """Convert a naive datetime to fractional seconds since EPOCH."""
+    return (moment - EPOCH).total_seconds()
+
+
+def from_epoch(seconds):
+    """Convert seconds since EPOCH back to a naive datetime."""
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def check_task_name(name):
+    """Return `name` without surrounding whitespace; raises ValueError if it is empty or holds control characters."""
+    name = name.strip()
+    if not name:
+        raise ValueError("Task name cannot be empty")
+    if CONTROL_CHARACTERS.search(name):
+        raise ValueError("Task name cannot contain line breaks or other control characters")
+    return name
+
+
+def parse_time_needed(time_needed):
+    """Convert an "HH:MM" time needed string to minutes."""
+    hours, minutes = map(int, time_needed.split(":"))
+    return hours * 60 + minutes
+
+
+class Task:
+    """A task with its deadline, priority and duration stored as plain integers.
+
+    `deadline` is in seconds since EPOCH, `priority` is a PRIORITY_LEVELS value
+    and `minutes` is the time needed. Tasks are treated as immutable values:
+    equal fields mean equal tasks, and they can be used as dict keys.
+    """
+
+    __slots__ = ("name", "deadline", "priority", "minutes")
+
+    def __init__(self, name, deadline, priority, minutes):
+        self.name = name
+        self.deadline = deadline
+        self.priority = priority
+        self.minutes = minutes
+
+    @classmethod
+    def create(cls, name, deadline, priority, time_needed):
+        """Build a task from a deadline datetime, a priority name and an "HH:MM" string."""
+        return cls(name, to_epoch(deadline), PRIORITY_LEVELS[priority], parse_time_needed(time_needed))
+
+    @property
+    def deadline_datetime(self):
+        return from_epoch(self.deadline)
+
+    @property
+    def priority_name(self):
+        return PRIORITY_NAMES[self.priority]
+
+    @property
+    def time_needed(self):
+        """The time needed formatted as HH:MM."""
+        return f"{self.minutes // 60:02d}:{self.minutes % 60:02d}"
+
+    def _fields(self):
+        return (self.name, self.deadline, self.priority, self.minutes)
+
+    def __eq__(self, other):
+        if not isinstance(other, Task):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self):
+        return hash(self._fields())
+
+    def __repr__(self):
+        return f"Task({self.name!r}, {self.deadline_datetime:%m/%d/%y %H:%M:%S}, {self.priority_name}, {self.time_needed})"
+
+
+def _one_line(name):
+    """Return a task name with any control characters replaced by spaces, so it cannot split a line."""
+    return name if name.isprintable() else CONTROL_CHARACTERS.sub(" ", name)
+
+
+def format_task(task):
+    """Return the task log line (without newline) for a task."""
+    return f"{_one_line(task.name)} - Deadline: {task.deadline_datetime.strftime('%m/%d/%y %H:%M:%S')}, Priority: {task.priority_name}, Time Needed: {task.time_needed}"
+
+
+def format_task_summary(task):
+    """Return the line shown in the task list and the passed task log, with minute precision."""
+    return f"{_one_line(task.name)} - Deadline: {task.deadline_datetime.strftime('%m/%d/%y %H:%M')}, Priority: {task.priority_name}, Time Needed: {task.time_needed}"
+
+
+def parse_task(line):
+    """Parse a task log line back into a Task."""
+    # Split from the right so that task names containing the separator still parse
+    task_name, rest = line.rsplit(" - Deadline: ", 1)
+    deadline_str, priority_and_time = rest.split(", Priority: ")
+    priority, time_needed = priority_and_time.split(", Time Needed: ")
+
+    # Try each format in the list until one succeeds
+    deadline_str = deadline_str.strip()
+    for date_format in DEADLINE_FORMATS:
+        try:
+            deadline_date = datetime.strptime(deadline_str, date_format)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"Unable to parse date: {deadline_str}")
+
+    return Task.create(task_name, deadline_date, priority.strip(), time_needed.strip())
@@ -0,0 +1,313 @@
+from collections import Counter
+from datetime import datetime
+
+from components.expiry_scheduler import ExpiryScheduler
+from components.metrics import METRICS, timed
+from components.prioritization import SCORING_AUTO, TaskPrioritization
+from components.recurrence import RecurrenceSchedule
+from components.task import PRIORITY_LEVELS, to_epoch
+from components.task_index import TaskOrders
+from components.task_store import create_task_store
+
+# Orders the task list can be shown in
+FILTER_BY_DUE_DATE = 0
+FILTER_BY_IMPORTANCE = 1
+FILTER_TO_DO_ORDER = 2
+
+# Share of the list changed by another writer above which one rebuild beats inserting each change
+MERGE_REBUILD_FRACTION = 1 / 8
+
+
+class InvalidTaskError(ValueError):
+    """Raised when a task cannot be added; `title` and the message are meant for a warning dialog."""
+
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+
+
+def validate_deadline(deadline, current_time=None):
+    """Raise InvalidTaskError unless `deadline` (a datetime) is still in the future."""
+    current_datetime = current_time or datetime.now()
+
+    # Check if the selected date is today
+    if deadline.date() == current_datetime.date():
+        # Check if the selected time (hour and minute) has already passed for today
+        if deadline.time() <= current_datetime.time():
+            raise InvalidTaskError("Invalid Time", "The selected time has already passed. Please choose a future time.")
+
+    # Check if the selected deadline date and time is in the past
+    if deadline < current_datetime:
+        raise InvalidTaskError("Invalid Deadline", "The selected deadline has already passed. Please choose a future date and time.")
+
+
+def _no_timer(delay, callback):
+    """Stand-in for `after` when the engine runs without an event loop."""
+    return None
+
+
+class TaskEngine:
+    """Everything the task list does apart from drawing it.
+
+    The engine owns the task store, the three sorted orders, To Do scoring and
+    the expiry heap. It imports nothing from tkinter. TaskList passes its
+    `after`/`after_cancel` so that expiry runs on the Tk event loop. Without
+    them, expired tasks are only processed when `refresh_tasks` is called.
+    """
+
+    def __init__(self, store=None, scoring_mode=SCORING_AUTO, schedule=None, cancel=None,
+                 on_expired=None, clock=datetime.now, horizon=None):
+        self.scoring_mode = scoring_mode
+        self.clock = clock
+        self.on_expired = on_expired
+
+        # Storage backend for tasks (journaled text log by default, or SQLite)
+        self.store = store or create_task_store()
+
+        # Tasks kept in all three display orders at once, updated incrementally
+        self.orders = TaskOrders(lambda current_time: TaskPrioritization(current_time, self.scoring_mode))
+
+        # Min-heap of deadlines that fires exactly when the next task expires
+        self.expiry = ExpiryScheduler(schedule or _no_timer, cancel or (lambda timer: None),
+                                      self._handle_expired, clock=clock)
+
+        # Recurring tasks: only their occurrences within `horizon` are in the orders and the heap
+        self.recurring = RecurrenceSchedule(horizon)
+        self._recurring_loaded = False
+
+    def __len__(self):
+        return len(self.orders)
+
+    @timed("engine.load_tasks")
+    def load_tasks(self):
+        """Load tasks and recurring tasks from the task store and rebuild every order."""
+        self.apply_loaded_tasks(self.store.load_tasks())
+        self.apply_recurring_tasks(self.store.load_recurring_tasks())
+
+    @timed("engine.apply_loaded_tasks")
+    def apply_loaded_tasks(self, tasks):
+        """Rebuild every order from tasks read from the store."""
+        self.install_loaded_tasks(self.prepare_loaded_tasks(tasks))
+
+    @timed("engine.prepare_loaded_tasks")
+    def prepare_loaded_tasks(self, tasks):
+        """Sort tasks read from the store into new orders and an expiry heap, leaving the engine as it is.
+
+        Nothing the engine is using is touched, so TaskList runs this on the
+        I/O thread and then passes the result to `install_loaded_tasks`.
+        """
+        tasks = list(tasks)
+        orders = TaskOrders(self.orders.prioritization_factory)
+        orders.rebuild(tasks, self.clock())
+        return tasks, orders, self.expiry.build_heap(orders.by_due_date.tasks)
+
+    @timed("engine.install_loaded_tasks")
+    def install_loaded_tasks(self, prepared):
+        """Swap in the orders and expiry heap from `prepare_loaded_tasks`.
+
+        Tasks added while the store was still being read are kept, as are the
+        recurring occurrences shown; the count comparison avoids duplicating
+        any that the read already included.
+        """
+        tasks, orders, heap = prepared
+        shown_meanwhile = self._added_meanwhile(tasks) + self.recurring.occurrences
+        if len(shown_meanwhile) > len(tasks) * MERGE_REBUILD_FRACTION:
+            tasks = tasks + shown_meanwhile
+            orders.rebuild(tasks, self.clock())
+            heap = None
+        else:
+            for task in shown_meanwhile:
+                orders.add(task)
+        self.orders = orders
+        self.expiry.reset(orders.by_due_date.tasks, heap)
+        if heap is not None:
+            for task in shown_meanwhile:
+                self.expiry.add(task)
+
+    def apply_recurring_tasks(self, recurring_tasks):
+        """Install the recurring task rules read from the store and show their occurrences.
+
+        Rules added while the store was still being read the first time are
+        kept, and only then written back, so an early add never overwrites the
+        stored rules. Later calls replace the rules.
+        """
+        recurring_tasks = list(recurring_tasks)
+        added_meanwhile = [] if self._recurring_loaded else \
+            [recurring for recurring in self.recurring.rules if recurring not in recurring_tasks]
+        self._remove_occurrences(self.recurring.occurrences)
+        self._add_occurrences(self.recurring.set_rules(recurring_tasks + added_meanwhile, to_epoch(self.clock())))
+        self._recurring_loaded = True
+        if added_meanwhile:
+            self.store.save_recurring_tasks(self.recurring.rules)
+
+    def poll_store_changes(self):
+        """Merge the changes other app instances or scripts made to the store; returns whether there were any."""
+        return self.apply_store_changes(self.store.poll_changes())
+
+    @timed("engine.apply_store_changes")
+    def apply_store_changes(self, changes):
+        """Merge TaskChanges from the store into every order and the expiry heap.
+
+        Only the changed tasks are inserted and removed, unless they are more
+        than MERGE_REBUILD_FRACTION of the list; then every order is rebuilt once.
+        """
+        if not changes:
+            return False
+        if len(changes.added) + len(changes.removed) > len(self) * MERGE_REBUILD_FRACTION:
+            remaining = Counter(self.orders.by_due_date.tasks)
+            remaining.subtract(changes.removed)
+            tasks = list((+remaining).elements()) + changes.added
+            self.orders.rebuild(tasks, self.clock())
+            self.expiry.reset(tasks)
+        else:
+            for task in self.orders.remove_many(changes.removed):
+                self.expiry.remove(task)
+            for task in changes.added:
+                self.orders.add(task)
+                self.expiry.add(task)
+        if changes.recurring_tasks is not None:
+            self.apply_recurring_tasks(changes.recurring_tasks)
+        METRICS.increment("engine.tasks_merged", len(changes.added) + len(changes.removed))
+        return True
+
+    def stored_tasks(self):
+        """Return the tasks that are kept in the store, i.e. every task but recurring occurrences."""
+        if not len(self.recurring):
+            return self.orders.by_due_date.tasks
+        return self.recurring.split(self.orders.by_due_date.tasks)[0]
+
+    @timed("engine.save_tasks")
+    def save_tasks(self):
+        """Write the full task list to the task store."""
+        self.store.save_tasks(self.stored_tasks())
+
+    @timed("engine.add_task")
+    def add_task(self, task):
+        """Add a task to every order, the expiry heap and the store."""
+        self.orders.add(task)
+        self.expiry.add(task)
+        self.store.add_task(task)
+
+    @timed("engine.add_tasks")
+    def add_tasks(self, tasks):
+        """Add many tasks at once: one rebuild of every order, one heapify and one store write."""
+        tasks = list(tasks)
+        if not tasks:
+            return
+        # The current order is already sorted, so the sort mostly merges the new run into it
+        all_tasks = list(self.orders.by_due_date.tasks) + tasks
+        self.orders.rebuild(all_tasks, self.clock())
+        self.expiry.reset(all_tasks)
+        self.store.add_tasks(tasks)
+
+    def add_recurring_task(self, recurring):
+        """Store a recurring task rule once and show its occurrences within the horizon."""
+        occurrences = self.recurring.add_rule(recurring, to_epoch(self.clock()))
+        if not occurrences:
+            return
+        self._add_occurrences(occurrences)
+        if self._recurring_loaded:
+            self.store.save_recurring_tasks(self.recurring.rules)
+
+    def remove_recurring_task(self, recurring):
+        """Delete a recurring task rule together with its occurrences still shown."""
+        self._remove_occurrences(self.recurring.remove_rule(recurring))
+        if self._recurring_loaded:
+            self.store.save_recurring_tasks(self.recurring.rules)
+
+    @timed("engine.ordered_tasks")
+    def ordered_tasks(self, task_filter):
+        """Return the tasks in the order of `task_filter`, rescoring the To Do order only if stale."""
+        if task_filter == FILTER_BY_IMPORTANCE:
+            return self.orders.by_importance.tasks
+        if task_filter == FILTER_TO_DO_ORDER:
+            current_time = self.clock()
+            if self.orders.to_do_is_stale(current_time):
+                self.orders.rescore_to_do(current_time)
+            return self.orders.to_do.tasks
+        return self.orders.by_due_date.tasks
+
+    @timed("engine.rescore_to_do")
+    def rescore_to_do(self):
+        """Move the To Do order forward to the current time; the To Do view calls this every minute."""
+        return self.orders.rescore_to_do(self.clock())
+
+    @timed("engine.query")
+    def query(self, name_prefix="", due_from=None, due_to=None, priority=None):
+        """Return the tasks whose name starts with `name_prefix`, due in [due_from, due_to) and of `priority`.
+
+        The bounds are datetimes and `priority` a priority name; any of them may
+        be left out. Every lookup is a binary search on one of the sorted
+        orders, see TaskOrders.query.
+        """
+        return self.orders.query(
+            name_prefix,
+            None if due_from is None else to_epoch(due_from),
+            None if due_to is None else to_epoch(due_to),
+            None if priority is None else PRIORITY_LEVELS[priority]
+        )
+
+    @timed("engine.refresh_tasks")
+    def refresh_tasks(self, passed_tasks=None):
+        """Move passed tasks to the passed task history and return them."""
+        # Without an explicit list, take whatever the expiry heap says is due now
+        if passed_tasks is None:
+            passed_tasks = self.expiry.pop_expired()
+        if not passed_tasks:
+            # Nothing passed, but recurring occurrences may have entered the horizon since
+            self._add_occurrences(self.recurring.roll_forward([], to_epoch(self.clock())))
+            return []
+
+        # Drop the passed tasks from every order; the remaining tasks stay sorted
+        self.orders.remove_many(passed_tasks)
+        METRICS.increment("engine.tasks_expired", len(passed_tasks))
+
+        # Remove passed tasks from the store and record them in the passed task history;
+        # recurring occurrences were never stored
+        stored_tasks, occurrences = self.recurring.split(passed_tasks)
+        self.store.remove_tasks(stored_tasks)
+        self.store.archive_passed_tasks(passed_tasks)
+
+        # The next occurrences of the recurring tasks roll forward into the horizon
+        self._add_occurrences(self.recurring.roll_forward(occurrences, to_epoch(self.clock())))
+        return passed_tasks
+
+    def check_passed_tasks(self):
+        """Move tasks that have already passed and arm the timer for the next deadline."""
+        passed_tasks = self.refresh_tasks()
+        self.expiry.arm()
+        return passed_tasks
+
+    def close(self):
+        """Stop the expiry timer and close the store."""
+        self.expiry.disarm()
+        self.store.close()
+
+    def _added_meanwhile(self, tasks):
+        """Return the stored tasks in the orders that `tasks`, just read from the store, does not include."""
+        stored = self.stored_tasks()
+        if not stored:
+            return []
+        meanwhile = Counter(stored)
+        for task in tasks:
+            if meanwhile[task]:
+                meanwhile[task] -= 1
+        return list((+meanwhile).elements())
+
+    def _add_occurrences(self, occurrences):
+        """Insert recurring occurrences into every order and the expiry heap."""
+        for occurrence in occurrences:
+            self.orders.add(occurrence)
+            self.expiry.add(occurrence)
+
+    def _remove_occurrences(self, occurrences):
+        """Take recurring occurrences out of every order and the expiry heap."""
+        self.orders.remove_many(occurrences)
+        for occurrence in occurrences:
+            self.expiry.remove(occurrence)
+
+    def _handle_expired(self, passed_tasks):
+        """Expiry timer callback: move the passed tasks, then notify the owner."""
+        self.refresh_tasks(passed_tasks)
+        if self.on_expired is not None:
+            self.on_expired(passed_tasks)
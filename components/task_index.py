@@ -0,0 +1,266 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from components.kinetic_order import KineticTaskOrder, without_positions
+
+# How long a To Do order stays valid before it is rescored
+TO_DO_RESCORE_SECONDS = 60
+
+# From this many tasks on, a removal copies each order once instead of deleting task by task
+BULK_REMOVE_COUNT = 4
+
+
+def due_date_key(task):
+    """Sort key for the due date order."""
+    return task.deadline
+
+
+def importance_key(task):
+    """Sort key for the importance order (High first); equal priorities fall back to the due date."""
+    return (-task.priority, task.deadline)
+
+
+def name_key(task):
+    """Sort key for the name index; case-insensitive, so prefix searches ignore case."""
+    return task.name.casefold()
+
+
+def priority_name_key(task):
+    """Sort key for the name index bucketed by priority, so a prefix within one priority is one range."""
+    return (-task.priority, task.name.casefold())
+
+
+# Sorts after every character a name can continue with, closing a prefix range
+PREFIX_END = "\U0010ffff"
+
+
+class TaskRange:
+    """A read-only view of positions `start`..`stop` of a task list, without copying it.
+
+    The view is only valid until the list it was taken from next changes.
+    """
+
+    __slots__ = ("_tasks", "_start", "_stop")
+
+    def __init__(self, tasks, start, stop):
+        self._tasks = tasks
+        self._start = start
+        self._stop = max(start, stop)
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __iter__(self):
+        tasks = self._tasks
+        for index in range(self._start, self._stop):
+            yield tasks[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return self._tasks[self._start + start:self._start + stop:step]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._tasks[self._start + index]
+
+
+class SortedTaskIndex:
+    """Tasks kept sorted by a key, updated with bisect instead of re-sorting.
+
+    Keys and tasks live in two parallel lists, so finding the position for an
+    insert or removal is a binary search. Tasks with equal keys stay in the
+    order they were inserted.
+    """
+
+    def __init__(self, key, tasks=()):
+        self.key = key
+        self._keys = []
+        self._tasks = []
+        self.rebuild(tasks)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __iter__(self):
+        return iter(self._tasks)
+
+    def __getitem__(self, index):
+        return self._tasks[index]
+
+    @property
+    def tasks(self):
+        """The tasks in sorted order (do not modify)."""
+        return self._tasks
+
+    def rebuild(self, tasks, keys=None):
+        """Replace the contents with `tasks`, sorted once; `keys` may be precomputed."""
+        if keys is None:
+            keys = [self.key(task) for task in tasks]
+        pairs = sorted(zip(keys, range(len(keys))), key=lambda pair: pair[0])
+        self._keys = [key for key, _ in pairs]
+        self._tasks = [tasks[index] for _, index in pairs]
+
+    def insert(self, task, key=None):
+        """Insert a task at its sorted position and return that position."""
+        key = self.key(task) if key is None else key
+        index = bisect_right(self._keys, key)
+        self._keys.insert(index, key)
+        self._tasks.insert(index, task)
+        return index
+
+    def key_range(self, low, high):
+        """Return a TaskRange of the tasks with low <= key < high, found with two binary searches."""
+        return TaskRange(self._tasks, bisect_left(self._keys, low), bisect_left(self._keys, high))
+
+    def remove(self, task, key=None):
+        """Remove one occurrence of a task and return its former position, or None if absent."""
+        index = self._find(task, key)
+        if index is not None:
+            del self._keys[index]
+            del self._tasks[index]
+        return index
+
+    def remove_many(self, tasks):
+        """Remove one occurrence of each task in a single copy of the lists; returns the tasks removed.
+
+        Each task is found with a binary search, then the lists are rebuilt
+        from the slices between the removed positions. Deleting one by one
+        would move the rest of both lists once per task.
+        """
+        found = set()
+        removed = []
+        for task in tasks:
+            index = self._find(task, skip=found)
+            if index is not None:
+                found.add(index)
+                removed.append(task)
+        if found:
+            self._keys = without_positions(self._keys, found)
+            self._tasks = without_positions(self._tasks, found)
+        return removed
+
+    def _find(self, task, key=None, skip=()):
+        """Return the position of one occurrence of a task not in `skip`, or None if absent."""
+        key = self.key(task) if key is None else key
+        index = bisect_left(self._keys, key)
+        while index < len(self._keys) and self._keys[index] == key:
+            if self._tasks[index] == task and index not in skip:
+                return index
+            index += 1
+        return None
+
+
+class TaskOrders:
+    """The three TaskList orders (due date, importance and To Do) kept sorted side by side."""
+
+    def __init__(self, prioritization_factory):
+        # Called with the current time, returns a TaskPrioritization used for the initial To Do scores
+        self.prioritization_factory = prioritization_factory
+
+        self.by_due_date = SortedTaskIndex(due_date_key)
+        self.by_importance = SortedTaskIndex(importance_key)
+        self.to_do = KineticTaskOrder(prioritization_factory)
+
+        # Only used for queries; not display orders
+        self.by_name = SortedTaskIndex(name_key)
+        self.by_priority_name = SortedTaskIndex(priority_name_key)
+
+    def __len__(self):
+        return len(self.by_due_date)
+
+    @property
+    def to_do_time(self):
+        """Time the To Do order is correct for."""
+        return self.to_do.current_time
+
+    def rebuild(self, tasks, current_time=None):
+        """Rebuild every order from scratch, with one sort each."""
+        self.by_due_date.rebuild(tasks)
+        self.by_importance.rebuild(tasks)
+        self.by_name.rebuild(tasks)
+        self.by_priority_name.rebuild(tasks)
+        self.to_do.rebuild(self.by_due_date.tasks, current_time or datetime.now())
+
+    def add(self, task):
+        """Insert a task into every order."""
+        self.by_due_date.insert(task)
+        self.by_importance.insert(task)
+        self.by_name.insert(task)
+        self.by_priority_name.insert(task)
+        self.to_do.insert(task)
+
+    def remove(self, task):
+        """Remove a task from every order; returns False if it was not there."""
+        if self.by_due_date.remove(task) is None:
+            return False
+        self.by_importance.remove(task)
+        self.by_name.remove(task)
+        self.by_priority_name.remove(task)
+        self.to_do.remove(task)
+        return True
+
+    def remove_many(self, tasks):
+        """Remove several tasks from every order; returns the ones that were there.
+
+        From BULK_REMOVE_COUNT tasks on, every order is copied once without
+        them instead of being shifted once per task.
+        """
+        if len(tasks) < BULK_REMOVE_COUNT:
+            return [task for task in tasks if self.remove(task)]
+        removed = self.by_due_date.remove_many(tasks)
+        if removed:
+            self.by_importance.remove_many(removed)
+            self.by_name.remove_many(removed)
+            self.by_priority_name.remove_many(removed)
+            self.to_do.remove_many(removed)
+        return removed
+
+    def query(self, name_prefix="", due_from=None, due_to=None, priority=None):
+        """Return the tasks matching every given condition.
+
+        `due_from`/`due_to` bound the deadline in epoch seconds (from inclusive,
+        to exclusive), `priority` is a priority level and `name_prefix` matches
+        the start of the name, ignoring case. Each condition maps to one range
+        of an index: the due date order, the priority's bucket of the
+        importance order (sorted by deadline within it) or of the name index,
+        or the name index itself. With a single range, that range is returned
+        as is, in the order of its index. Otherwise the narrowest range is
+        filtered by the remaining conditions.
+        """
+        low = -2 ** 63 if due_from is None else due_from
+        high = 2 ** 63 if due_to is None else due_to
+        dated = due_from is not None or due_to is not None
+        prefix = name_prefix.casefold()
+        ranges = []
+        if prefix:
+            if priority is None:
+                ranges.append(self.by_name.key_range(prefix, prefix + PREFIX_END))
+            else:
+                ranges.append(self.by_priority_name.key_range((-priority, prefix), (-priority, prefix + PREFIX_END)))
+        if priority is not None and (dated or not prefix):
+            ranges.append(self.by_importance.key_range((-priority, low), (-priority, high)))
+        elif dated:
+            ranges.append(self.by_due_date.key_range(low, high))
+        if not ranges:
+            return self.by_due_date.tasks
+        if len(ranges) == 1:
+            return ranges[0]
+
+        # Every range already applies the priority; only the name or the deadline is left to check
+        smallest = min(ranges, key=len)
+        if smallest is ranges[0]:
+            return [task for task in smallest if low <= task.deadline < high]
+        return [task for task in smallest if task.name.casefold().startswith(prefix)]
+
+    def to_do_is_stale(self, current_time=None):
+        """Return whether the To Do order is older than TO_DO_RESCORE_SECONDS."""
+        if self.to_do_time is None:
+            return True
+        current_time = current_time or datetime.now()
+        return (current_time - self.to_do_time).total_seconds() >= TO_DO_RESCORE_SECONDS
+
+    def rescore_to_do(self, current_time=None):
+        """Move the To Do order forward to `current_time`, swapping only the tasks whose scores crossed."""
+        return self.to_do.advance(current_time or datetime.now())
@@ -0,0 +1,422 @@
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from components.task import (
+    DEADLINE_FORMATS, PRIORITY_LEVELS, PRIORITY_NAMES, Task, check_task_name, from_epoch, parse_time_needed, to_epoch
+)
+from components.task_engine import InvalidTaskError, validate_deadline
+
+# Supported file formats, by name and by file extension
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+FORMAT_ICS = "ics"
+FORMAT_EXTENSIONS = {".csv": FORMAT_CSV, ".jsonl": FORMAT_JSONL, ".ndjson": FORMAT_JSONL, ".ics": FORMAT_ICS}
+
+# Columns of the CSV format (and keys of the JSONL format)
+FIELDS = ["name", "deadline", "priority", "time_needed"]
+
+# Records handed to each parse step, and the most rejected rows kept for the report
+CHUNK_RECORDS = 10_000
+MAX_REPORTED_ERRORS = 100
+
+# iCalendar PRIORITY values: 1-4 is high, 5 medium and 6-9 low; 0 means undefined
+ICS_PRIORITIES = {"High": 1, "Medium": 5, "Low": 9}
+ICS_COMPONENTS = ("VTODO", "VEVENT")
+ICS_LINE_OCTETS = 75
+
+
+class ImportReport:
+    """Outcome of an import: how many records were read and why rejected ones were skipped."""
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []  # (record number, reason) of the first MAX_REPORTED_ERRORS rejected records
+
+    def add_errors(self, errors):
+        self.rejected += len(errors)
+        self.errors.extend(errors[:MAX_REPORTED_ERRORS - len(self.errors)])
+
+    def __str__(self):
+        lines = [f"Imported {self.imported} tasks, skipped {self.rejected}."]
+        lines.extend(f"Record {number}: {reason}" for number, reason in self.errors[:10])
+        if self.rejected > 10:
+            lines.append("...")
+        return "\n".join(lines)
+
+
+def detect_format(path):
+    """Return the file format implied by the extension of `path`."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Unsupported file type: {extension or path}")
+    return FORMAT_EXTENSIONS[extension]
+
+
+# Parsing
+
+def parse_deadline(value):
+    """Parse a deadline in ISO 8601 or one of the task log DEADLINE_FORMATS as a naive local datetime.
+
+    ISO times with a UTC offset are converted to local time, like UTC times in iCalendar files.
+    """
+    value = value.strip()
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    else:
+        return moment.astimezone().replace(tzinfo=None) if moment.tzinfo is not None else moment
+    for fmt in DEADLINE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized deadline: {value!r}")
+
+
+def parse_priority(value):
+    """Parse a priority name (any case) or level (1-3); empty means Medium."""
+    value = str(value).strip()
+    if not value:
+        return PRIORITY_LEVELS["Medium"]
+    if value.isdigit() and int(value) in PRIORITY_NAMES:
+        return int(value)
+    name = value.capitalize()
+    if name not in PRIORITY_LEVELS:
+        raise ValueError(f"Unknown priority: {value!r}")
+    return PRIORITY_LEVELS[name]
+
+
+def parse_minutes(record):
+    """Return the time needed of a CSV/JSONL record, given as "HH:MM" or as whole minutes."""
+    if record.get("minutes") not in (None, ""):
+        minutes = int(record["minutes"])
+    else:
+        time_needed = str(record.get("time_needed") or "0").strip()
+        minutes = parse_time_needed(time_needed) if ":" in time_needed else int(time_needed)
+    if minutes < 0:
+        raise ValueError("Time needed cannot be negative")
+    return minutes
+
+
+def record_to_task(record):
+    """Return (name, deadline, priority level, minutes) of a CSV row or JSONL object (a dict of FIELDS)."""
+    name = check_task_name(str(record.get("name") or ""))
+    if not record.get("deadline"):
+        raise ValueError("Missing deadline")
+    deadline = parse_deadline(str(record["deadline"]))
+    return name, deadline, parse_priority(record.get("priority", "")), parse_minutes(record)
+
+
+def ics_unescape(text):
+    """Undo iCalendar TEXT escaping."""
+    result = []
+    characters = iter(text)
+    for character in characters:
+        if character == "\\":
+            following = next(characters, "")
+            result.append("\n" if following in "nN" else following)
+        else:
+            result.append(character)
+    return "".join(result)
+
+
+def parse_ics_datetime(value, parameters):
+    """Parse an iCalendar DATE or DATE-TIME as a naive local datetime; UTC times are converted."""
+    if "VALUE=DATE" in parameters or len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d")
+    if value.endswith("Z"):
+        moment = datetime.strptime(value[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+        return moment.astimezone().replace(tzinfo=None)
+    # Floating or TZID times are taken as local time
+    return datetime.strptime(value, "%Y%m%dT%H%M%S")
+
+
+def parse_ics_duration(value):
+    """Parse an iCalendar DURATION such as PT1H30M or P1DT2H into a timedelta."""
+    sign = -1 if value.startswith("-") else 1
+    value = value.lstrip("+-")
+    if not value.startswith("P"):
+        raise ValueError(f"Bad duration: {value!r}")
+    number = ""
+    total = timedelta()
+    units = {"W": timedelta(weeks=1), "D": timedelta(days=1), "H": timedelta(hours=1),
+             "M": timedelta(minutes=1), "S": timedelta(seconds=1)}
+    for character in value[1:]:
+        if character.isdigit():
+            number += character
+        elif character in units:
+            total += int(number or 0) * units[character]
+            number = ""
+        elif character != "T":
+            raise ValueError(f"Bad duration: {value!r}")
+    return sign * total
+
+
+def ics_component_to_task(component):
+    """Return (name, deadline, priority level, minutes) of one VTODO or VEVENT.
+
+    The deadline is DUE for a VTODO and DTEND for a VEVENT (either may come
+    from DTSTART plus DURATION). The time needed is the span from DTSTART to
+    the deadline, if there is a start.
+    """
+    name = check_task_name(ics_unescape(component.get("SUMMARY", ("", ""))[1]))
+
+    def moment(key):
+        if key not in component:
+            return None
+        parameters, value = component[key]
+        return parse_ics_datetime(value, parameters)
+
+    start = moment("DTSTART")
+    deadline = moment("DUE" if component["component"] == "VTODO" else "DTEND")
+    if deadline is None and start is not None:
+        duration = parse_ics_duration(component["DURATION"][1]) if "DURATION" in component else timedelta()
+        deadline = start + duration
+    if deadline is None:
+        raise ValueError("Missing deadline")
+    minutes = max(int((deadline - start).total_seconds() // 60), 0) if start is not None else 0
+
+    level = int(component.get("PRIORITY", ("", "0"))[1] or 0)
+    priority = "Medium" if level in (0, 5) else "High" if level < 5 else "Low"
+    return name, deadline, PRIORITY_LEVELS[priority], minutes
+
+
+def iter_csv_records(file):
+    """Yield each CSV row as a dict; the header row names the columns."""
+    yield from csv.DictReader(file)
+
+
+def iter_jsonl_records(file):
+    """Yield the non-blank lines of a JSONL file; they are decoded when converted."""
+    for line in file:
+        if line.strip():
+            yield line
+
+
+def iter_ics_lines(file):
+    """Yield iCalendar content lines with folded continuation lines joined."""
+    pending = None
+    for line in file:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            if pending is not None:
+                pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending:
+        yield pending
+
+
+def iter_ics_records(file):
+    """Yield the properties of each VTODO and VEVENT as {name: (parameters, value)}."""
+    component = None
+    depth = 0
+    for line in iter_ics_lines(file):
+        if line.startswith("BEGIN:"):
+            kind = line[len("BEGIN:"):].strip().upper()
+            if component is None and kind in ICS_COMPONENTS:
+                component = {"component": kind}
+            elif component is not None:
+                depth += 1  # Nested VALARM and the like are skipped
+            continue
+        if line.startswith("END:"):
+            if component is not None:
+                if depth:
+                    depth -= 1
+                else:
+                    yield component
+                    component = None
+            continue
+        if component is None or depth or ":" not in line:
+            continue
+        head, value = line.split(":", 1)
+        name, _, parameters = head.partition(";")
+        component.setdefault(name.upper(), (parameters.upper(), value))
+
+
+RECORD_READERS = {FORMAT_CSV: iter_csv_records, FORMAT_JSONL: iter_jsonl_records, FORMAT_ICS: iter_ics_records}
+
+
+def convert_records(fmt, records, first_number, current_time):
+    """Turn a chunk of raw records into validated tasks.
+
+    Returns (tasks, errors), errors being (record number, reason) pairs. Runs
+    in a worker process when the import uses a process pool, so it only takes
+    and returns picklable values.
+    """
+    tasks = []
+    errors = []
+    for number, record in enumerate(records, first_number):
+        try:
+            if fmt == FORMAT_ICS:
+                name, deadline, priority, minutes = ics_component_to_task(record)
+            else:
+                if fmt == FORMAT_JSONL:
+                    record = json.loads(record)
+                    if not isinstance(record, dict):
+                        raise ValueError("Expected a JSON object")
+                name, deadline, priority, minutes = record_to_task(record)
+            # Same rule as adding a task by hand: the deadline must still be ahead
+            validate_deadline(deadline, current_time)
+        except InvalidTaskError as error:
+            errors.append((number, str(error)))
+            continue
+        except (ValueError, KeyError, TypeError) as error:
+            errors.append((number, str(error) or error.__class__.__name__))
+            continue
+        tasks.append(Task(name, to_epoch(deadline), priority, minutes))
+    return tasks, errors
+
+
+def iter_task_chunks(file, fmt, current_time=None, workers=None, chunk_records=CHUNK_RECORDS):
+    """Yield (tasks, errors) for each chunk of records in an open file.
+
+    Records are read lazily and converted a chunk at a time, so only a few
+    chunks are in memory at once. With `workers`, chunks are converted in a
+    process pool, with at most two chunks per worker in flight.
+    """
+    current_time = current_time or datetime.now()
+    records = RECORD_READERS[fmt](file)
+
+    def chunks():
+        number = 1
+        while True:
+            chunk = list(islice(records, chunk_records))
+            if not chunk:
+                return
+            yield chunk, number
+            number += len(chunk)
+
+    if not workers or workers <= 1:
+        for chunk, number in chunks():
+            yield convert_records(fmt, chunk, number, current_time)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for chunk, number in chunks():
+            in_flight.append(pool.submit(convert_records, fmt, chunk, number, current_time))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def read_tasks(path, fmt=None, current_time=None, workers=None):
+    """Read and validate every task of a file; returns (tasks, ImportReport)."""
+    fmt = fmt or detect_format(path)
+    report = ImportReport()
+    tasks = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        for chunk_tasks, errors in iter_task_chunks(file, fmt, current_time, workers):
+            tasks.extend(chunk_tasks)
+            report.add_errors(errors)
+    report.imported = len(tasks)
+    return tasks, report
+
+
+def import_tasks(engine, path, fmt=None, workers=None):
+    """Import a task file into a TaskEngine with one sort and one store write; returns the ImportReport."""
+    tasks, report = read_tasks(path, fmt, engine.clock(), workers)
+    engine.add_tasks(tasks)
+    return report
+
+
+# Writing
+
+class _EchoWriter:
+    """File-like target for csv.writer whose writerow then returns the formatted row."""
+
+    def write(self, text):
+        return text
+
+
+def iter_csv_lines(tasks):
+    """Yield a CSV header and one row per task."""
+    writer = csv.writer(_EchoWriter())
+    yield writer.writerow(FIELDS)
+    for task in tasks:
+        yield writer.writerow([task.name, from_epoch(task.deadline).isoformat(sep=" "),
+                               task.priority_name, task.time_needed])
+
+
+def task_to_record(task):
+    """Return a task as a dict of FIELDS, the inverse of record_to_task."""
+    return {"name": task.name, "deadline": from_epoch(task.deadline).isoformat(sep=" "),
+            "priority": task.priority_name, "time_needed": task.time_needed}
+
+
+def iter_jsonl_lines(tasks):
+    """Yield one JSON object per task."""
+    for task in tasks:
+        yield json.dumps(task_to_record(task)) + "\n"
+
+
+def ics_escape(text):
+    """Escape text for an iCalendar TEXT value."""
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def ics_fold(line):
+    """Fold a content line at ICS_LINE_OCTETS octets, as RFC 5545 requires."""
+    data = line.encode("utf-8")
+    if len(data) <= ICS_LINE_OCTETS:
+        return line + "\r\n"
+    parts = []
+    limit = ICS_LINE_OCTETS
+    while data:
+        cut = min(limit, len(data))
+        # Never split inside a multi-byte character
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+        limit = ICS_LINE_OCTETS - 1
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def iter_ics_lines_out(tasks):
+    """Yield a VCALENDAR with one VTODO per task; DTSTART is the deadline minus the time needed."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Stress Management App//Task List//EN\r\n"
+    for number, task in enumerate(tasks):
+        deadline = from_epoch(task.deadline)
+        yield (
+            "BEGIN:VTODO\r\n"
+            f"UID:{task.deadline}-{number}@stress-management-app\r\n"
+            f"DTSTAMP:{stamp}\r\n"
+            + ics_fold(f"SUMMARY:{ics_escape(task.name)}") +
+            f"DTSTART:{(deadline - timedelta(minutes=task.minutes)):%Y%m%dT%H%M%S}\r\n"
+            f"DUE:{deadline:%Y%m%dT%H%M%S}\r\n"
+            f"PRIORITY:{ICS_PRIORITIES[task.priority_name]}\r\n"
+            "END:VTODO\r\n"
+        )
+    yield "END:VCALENDAR\r\n"
+
+
+LINE_WRITERS = {FORMAT_CSV: iter_csv_lines, FORMAT_JSONL: iter_jsonl_lines, FORMAT_ICS: iter_ics_lines_out}
+
+
+def export_tasks(tasks, path, fmt=None):
+    """Write tasks to a file, streaming one task at a time; returns the number written."""
+    fmt = fmt or detect_format(path)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for task in tasks:
+            count += 1
+            yield task
+
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.writelines(LINE_WRITERS[fmt](counted()))
+    return count
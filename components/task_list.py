@@ -1,70 +1,85 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 from tkcalendar import Calendar
 from datetime import datetime, timedelta
 import os
-
-class TaskPrioritization:
-    """Class to evaluate the score of a task based on priority, time needed, and due date."""
-
-    def __init__(self, current_time):
-        self.current_time = current_time
-
-    def evaluate_task_score(self, task):
-        """Evaluate score based on priority, time needed, and proximity to due date."""
-        task_name, deadline, priority, time_needed = task
-
-        # Calculate time difference in hours between current time and deadline
-        time_until_deadline = (deadline - self.current_time).total_seconds() / 3600
-
-        # Convert time_needed to hours
-        time_needed_hours, time_needed_minutes = map(int, time_needed.split(":"))
-        total_time_needed = time_needed_hours + (time_needed_minutes / 60)
-
-        # Priority scoring (mapping to numeric values)
-        priority_score = {"High": 3, "Medium": 2, "Low": 1}[priority]
-
-        # Weights adjustment based on the previous recommendation
-        w1 = 5   # Weight for priority score
-        w2 = 10  # Weight for time ratio
-        w3 = 100  # Weight for deadline proximity
-
-        # Small constant to avoid division by zero
-        epsilon = 0.1
-
-        # Calculate urgency score using the adjusted weights
-        urgency_score = (
-            w1 * priority_score +
-            w2 * (1 - time_until_deadline / (total_time_needed + time_until_deadline + epsilon)) +
-            w3 / (time_until_deadline + epsilon)
-        )
-
-        return urgency_score
-
-    def get_ordered_tasks(self, tasks):
-        """Return tasks ordered by evaluated score, in descending order (higher score = higher priority)."""
-        # Evaluate score for each task
-        scored_tasks = [(task, self.evaluate_task_score(task)) for task in tasks]
-        # Sort tasks by score in descending order
-        ordered_tasks = sorted(scored_tasks, key=lambda x: x[1], reverse=True)
-        return [task for task, score in ordered_tasks]
-
+import queue
+import traceback
+from components.background_store import BackgroundTaskStore
+from components.metrics import timed
+from components.prioritization import SCORING_AUTO
+from components.recurrence import REPEAT_RULES, RULE_EVERY_N_DAYS, RecurringTask
+from components.task import CONTROL_CHARACTERS, PRIORITY_LEVELS, Task, to_epoch
+from components.task_engine import (
+    TaskEngine, InvalidTaskError, validate_deadline,
+    FILTER_BY_DUE_DATE, FILTER_BY_IMPORTANCE, FILTER_TO_DO_ORDER
+)
+from components.task_index import TO_DO_RESCORE_SECONDS
+from components.task_io import export_tasks, read_tasks
+from components.task_listbox import VirtualTaskListbox
+from components.task_store import create_task_store
+
+# Choices of the search deadline filter, and how far ahead each one looks
+ANY_DEADLINE = "Any deadline"
+SEARCH_WINDOWS = {
+    ANY_DEADLINE: None,
+    "Due in 24 hours": timedelta(hours=24),
+    "Due in 7 days": timedelta(days=7),
+    "Due in 30 days": timedelta(days=30)
+}
+ANY_PRIORITY = "Any priority"
+
+# Repeat choice for a task that happens once
+NO_REPEAT = "Does not repeat"
+
+# How often the task files are checked for changes made by other app instances or scripts
+STORE_POLL_MS = 2000
+
+# How often the To Do order is redrawn while shown; its scores change as deadlines near
+TO_DO_REFRESH_MS = TO_DO_RESCORE_SECONDS * 1000
+
+# File types offered by the import and export dialogs
+TASK_FILE_TYPES = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("iCalendar", "*.ics"), ("All files", "*.*")]
 
 class TaskList(tk.Frame):
-    def __init__(self, master):
+    def __init__(self, master, store=None, initial_load=None, on_loaded=None):
         super().__init__(master)
 
+        # A load already started by the caller (a Future of the task list), and
+        # a callback run once the tasks have been installed
+        self._initial_load = initial_load
+        self.on_loaded = on_loaded
+        self._poll_timer = None
+        self._to_do_timer = None
+        self._closed = False
+
         # Define colors for the UI elements
         self.bg_color = "light gray"
         self.text_color = "black"
 
-        # Initialize tasks list and other instance variables
-        self.tasks = []
+        # GUI-free task engine; expiry runs on the Tk event loop through after(),
+        # and all file I/O runs on a background thread
+        if store is None:
+            store = BackgroundTaskStore(create_inner=create_task_store)
+        elif not isinstance(store, BackgroundTaskStore):
+            store = BackgroundTaskStore(store)
+
+        # Failed writes are retried by the store; they are reported from the worker thread through
+        # this queue and shown on the next store check
+        self._write_errors = queue.SimpleQueue()
+        store.on_write_error = self._write_errors.put
+        self.engine = TaskEngine(
+            store,
+            scoring_mode=os.environ.get("TASK_SCORING", SCORING_AUTO),  # "auto", "python" or "numpy"
+            schedule=self.after,
+            cancel=self.after_cancel,
+            on_expired=lambda passed_tasks: self.apply_current_filter()
+        )
 
         # Define filter constants for clarity
-        self.FILTER_BY_DUE_DATE = 0
-        self.FILTER_BY_IMPORTANCE = 1
-        self.FILTER_TO_DO_ORDER = 2
+        self.FILTER_BY_DUE_DATE = FILTER_BY_DUE_DATE
+        self.FILTER_BY_IMPORTANCE = FILTER_BY_IMPORTANCE
+        self.FILTER_TO_DO_ORDER = FILTER_TO_DO_ORDER
 
         # Set the initial filter
         self.current_filter = self.FILTER_BY_DUE_DATE  # Default filter set to "sort by due date"
@@ -169,62 +184,184 @@ class TaskList(tk.Frame):
         self.priority_dropdown = tk.OptionMenu(self.scrollable_frame, self.priority_var, "Low", "Medium", "High")
         self.priority_dropdown.grid(row=9, column=0, padx=10, pady=5, sticky="ew")
 
+        # Repeat rule; a repeating task is stored once and its next occurrences are shown
+        repeat_frame = tk.Frame(self.scrollable_frame, bg=self.bg_color)
+        repeat_frame.grid(row=10, column=0, padx=10, pady=5, sticky="ew")
+        repeat_frame.grid_columnconfigure(1, weight=1)
+
+        repeat_label = tk.Label(repeat_frame, text="Repeat:", font=("Helvetica", 12), bg=self.bg_color, fg=self.text_color)
+        repeat_label.grid(row=0, column=0, padx=2, pady=5, sticky="w")
+
+        self.repeat_var = tk.StringVar(self)
+        self.repeat_var.set(NO_REPEAT)
+        self.repeat_dropdown = tk.OptionMenu(repeat_frame, self.repeat_var, NO_REPEAT, *REPEAT_RULES)
+        self.repeat_dropdown.grid(row=0, column=1, padx=2, pady=5, sticky="ew")
+
+        # Only used by "every N days"
+        self.repeat_days_var = tk.StringVar(self)
+        self.repeat_days_var.set("2")
+        self.repeat_days_spinbox = tk.Spinbox(repeat_frame, from_=1, to=365, width=4, textvariable=self.repeat_days_var,
+                                              bg=self.bg_color, fg=self.text_color)
+        self.repeat_days_spinbox.grid(row=0, column=2, padx=2, pady=5, sticky="e")
+
         # Add Task Button (Expands horizontally)
         add_button = tk.Button(self.scrollable_frame, text="Add Task", command=self.add_task, bg="#4CAF50", fg="black", font=("Helvetica", 12))
-        add_button.grid(row=10, column=0, padx=10, pady=10, sticky="ew")
+        add_button.grid(row=11, column=0, padx=10, pady=10, sticky="ew")
+
+        # Search box and quick filters; the list shows matching tasks as you type
+        search_frame = tk.Frame(self.scrollable_frame, bg=self.bg_color)
+        search_frame.grid(row=12, column=0, padx=10, pady=5, sticky="ew")
+        search_frame.grid_columnconfigure(1, weight=1)
+
+        search_label = tk.Label(search_frame, text="Search:", font=("Helvetica", 12), bg=self.bg_color, fg=self.text_color)
+        search_label.grid(row=0, column=0, padx=2, pady=5, sticky="w")
+
+        self.search_var = tk.StringVar(self)
+        self.search_var.trace_add("write", lambda *args: self.update_task_listbox())
+        self.search_entry = tk.Entry(search_frame, textvariable=self.search_var, bg=self.bg_color, fg=self.text_color)
+        self.search_entry.grid(row=0, column=1, padx=2, pady=5, sticky="ew")
+
+        self.search_due_var = tk.StringVar(self)
+        self.search_due_var.set(ANY_DEADLINE)
+        self.search_due_dropdown = tk.OptionMenu(search_frame, self.search_due_var, *SEARCH_WINDOWS,
+                                                 command=lambda value: self.update_task_listbox())
+        self.search_due_dropdown.grid(row=0, column=2, padx=2, pady=5, sticky="ew")
 
-        # Task List Box (Expands horizontally)
-        self.task_listbox = tk.Listbox(self.scrollable_frame, height=10, bg=self.bg_color, fg=self.text_color)
-        self.task_listbox.grid(row=11, column=0, padx=10, pady=10, sticky="ew")
+        self.search_priority_var = tk.StringVar(self)
+        self.search_priority_var.set(ANY_PRIORITY)
+        self.search_priority_dropdown = tk.OptionMenu(search_frame, self.search_priority_var, ANY_PRIORITY, "High", "Medium", "Low",
+                                                      command=lambda value: self.update_task_listbox())
+        self.search_priority_dropdown.grid(row=0, column=3, padx=2, pady=5, sticky="ew")
+
+        # Task List Box, rendering only the visible rows (Expands horizontally)
+        self.task_listbox = VirtualTaskListbox(self.scrollable_frame, height=10, bg=self.bg_color, fg=self.text_color)
+        self.task_listbox.grid(row=13, column=0, padx=10, pady=10, sticky="ew")
 
         # Sort by due date button (Expands horizontally)
         sort_due_button = tk.Button(self.scrollable_frame, text="Sort by Due Date", command=self.sort_by_due_date, bg="#2196F3", fg="black", font=("Helvetica", 12))
-        sort_due_button.grid(row=12, column=0, padx=10, pady=10, sticky="ew")
+        sort_due_button.grid(row=14, column=0, padx=10, pady=10, sticky="ew")
 
         # Sort by importance button (Expands horizontally)
         sort_importance_button = tk.Button(self.scrollable_frame, text="Sort by Importance", command=self.sort_by_importance, bg="#FF5722", fg="black", font=("Helvetica", 12))
-        sort_importance_button.grid(row=13, column=0, padx=10, pady=10, sticky="ew")
+        sort_importance_button.grid(row=15, column=0, padx=10, pady=10, sticky="ew")
 
         # Replace Refresh Tasks Button with "To Do" Button (Expands horizontally)
         to_do_button = tk.Button(self.scrollable_frame, text="To Do", command=self.show_to_do_order, bg="#FFDD57", fg="black", font=("Helvetica", 12))
-        to_do_button.grid(row=14, column=0, padx=10, pady=10, sticky="ew")
+        to_do_button.grid(row=16, column=0, padx=10, pady=10, sticky="ew")
 
         # New button to view passed tasks
         view_passed_tasks_button = tk.Button(self.scrollable_frame, text="View Passed Tasks", command=self.view_passed_tasks, bg="#FF0000", fg="white", font=("Helvetica", 12))
-        view_passed_tasks_button.grid(row=15, column=0, padx=10, pady=10, sticky="ew")
+        view_passed_tasks_button.grid(row=17, column=0, padx=10, pady=10, sticky="ew")
+
+        # Bulk import and export of tasks (CSV, JSONL or iCalendar)
+        transfer_frame = tk.Frame(self.scrollable_frame, bg=self.bg_color)
+        transfer_frame.grid(row=18, column=0, padx=10, pady=10, sticky="ew")
+        transfer_frame.grid_columnconfigure(0, weight=1)
+        transfer_frame.grid_columnconfigure(1, weight=1)
+
+        import_button = tk.Button(transfer_frame, text="Import Tasks", command=self.import_tasks, bg="#9C27B0", fg="white", font=("Helvetica", 12))
+        import_button.grid(row=0, column=0, padx=2, sticky="ew")
+
+        export_button = tk.Button(transfer_frame, text="Export Tasks", command=self.export_tasks, bg="#9C27B0", fg="white", font=("Helvetica", 12))
+        export_button.grid(row=0, column=1, padx=2, sticky="ew")
 
-        # Load existing tasks from file
+        # Load existing tasks from file in the background; expiry starts once they arrive
         self.load_tasks()
 
-        # Start the observer function to check passed tasks periodically
-        self.check_passed_tasks()
+    @property
+    def tasks(self):
+        """Tasks in the order of the current filter."""
+        return self.engine.ordered_tasks(self.current_filter)
 
     def show_to_do_order(self):
-        """Sort tasks based on the evaluation algorithm and display in the listbox."""
-        prioritization = TaskPrioritization(datetime.now())
-        ordered_tasks = prioritization.get_ordered_tasks(self.tasks)
-        self.tasks = ordered_tasks  # Update the main task list to reflect the new order
+        """Show tasks in the order of the evaluation algorithm, rescoring only if the scores are stale."""
         self.current_filter = self.FILTER_TO_DO_ORDER  # Set the current filter to "To Do"
         self.update_task_listbox()
 
     def view_passed_tasks(self):
-        """Open a new window to view passed tasks."""
+        """Open a new window to view passed tasks, newest first, loaded page by page."""
         # Create a larger window for displaying passed tasks
         passed_tasks_window = tk.Toplevel(self)
         passed_tasks_window.title("Passed Tasks")
         passed_tasks_window.geometry("600x400")  # Increase size to 600x400 for better readability
+        passed_tasks_window.grid_rowconfigure(0, weight=1)
+        passed_tasks_window.grid_columnconfigure(0, weight=1)
 
-        # Create a text box to display passed tasks
-        passed_tasks_text = tk.Text(passed_tasks_window, wrap="word", bg="light gray", fg="black", font=("Helvetica", 12))
-        passed_tasks_text.pack(expand=True, fill="both")
+        # Only the visible rows are read from the archive as the user scrolls
+        passed_tasks_list = VirtualTaskListbox(
+            passed_tasks_window, height=20, format_row=str,
+            bg="light gray", fg="black", font=("Helvetica", 12)
+        )
+        passed_tasks_list.grid(row=0, column=0, sticky="nsew")
+        passed_tasks_list.set_tasks(["Loading passed tasks..."])
+
+        # Open the archive reader in the background, after any queued archive writes
+        self._when_done(
+            self.engine.store.open_passed_tasks_reader_async(),
+            lambda reader: self._show_passed_tasks(passed_tasks_window, passed_tasks_list, reader),
+            on_error=lambda error: self._on_passed_tasks_error(passed_tasks_window, passed_tasks_list, error)
+        )
 
-        # Load and display passed tasks from the file
-        if os.path.exists("logs/passed_tasks_log.txt"):
-            with open("logs/passed_tasks_log.txt", "r") as file:
-                passed_tasks = file.read()
-                passed_tasks_text.insert("1.0", passed_tasks)
+    def _show_passed_tasks(self, passed_tasks_window, passed_tasks_list, reader):
+        """Show the passed task reader in its window and release it when the window closes."""
+        if not passed_tasks_window.winfo_exists():
+            if hasattr(reader, "close"):
+                reader.close()
+            return
+        passed_tasks_list.set_tasks(reader if len(reader) else ["No passed tasks found."])
+        if hasattr(reader, "close"):
+            passed_tasks_list.bind("<Destroy>", lambda event: reader.close())
+
+    def _on_passed_tasks_error(self, passed_tasks_window, passed_tasks_list, error):
+        """Replace the loading message with the reason the passed tasks could not be read."""
+        if passed_tasks_window.winfo_exists():
+            passed_tasks_list.set_tasks([f"Could not read the passed tasks: {error}"])
+        self._show_background_error(error)
+
+    def _when_done(self, future, callback, interval=20, on_error=None):
+        """Call `callback` with the result of a background Future on the Tk main thread.
+
+        If the Future failed, `on_error` gets the exception instead; without
+        one, the error is shown in a message box.
+        """
+        if not future.done():
+            self.after(interval, self._when_done, future, callback, interval, on_error)
+        elif future.exception() is not None:
+            (on_error or self._show_background_error)(future.exception())
         else:
-            passed_tasks_text.insert("1.0", "No passed tasks found.")
+            callback(future.result())
+
+    def _show_background_error(self, error):
+        """Default `_when_done` error handler: report a failed background task to the user."""
+        traceback.print_exception(type(error), error, error.__traceback__)
+        messagebox.showerror("Error", str(error) or error.__class__.__name__)
+
+    def import_tasks(self):
+        """Ask for a task file and add all of its tasks; the file is read on the background thread."""
+        path = filedialog.askopenfilename(title="Import Tasks", filetypes=TASK_FILE_TYPES)
+        if not path:
+            return
+        # Large files can be parsed across a process pool, e.g. TASK_IMPORT_WORKERS=4
+        workers = int(os.environ.get("TASK_IMPORT_WORKERS", "0")) or None
+        future = self.engine.store.submit(read_tasks, path, None, datetime.now(), workers)
+        self._when_done(future, self._on_tasks_imported,
+                        on_error=lambda error: messagebox.showwarning("Import Failed", str(error)))
+
+    def _on_tasks_imported(self, result):
+        """Add the imported tasks with one sort and one store write, then report what was skipped."""
+        tasks, report = result
+        self.engine.add_tasks(tasks)
+        self.apply_current_filter()
+        messagebox.showinfo("Import Tasks", str(report))
+
+    def export_tasks(self):
+        """Ask for a file name and write the tasks, in the order shown, on the background thread."""
+        path = filedialog.asksaveasfilename(title="Export Tasks", defaultextension=".csv", filetypes=TASK_FILE_TYPES)
+        if not path:
+            return
+        future = self.engine.store.submit(export_tasks, list(self.tasks), path)
+        self._when_done(future, lambda count: messagebox.showinfo("Export Tasks", f"Exported {count} tasks."),
+                        on_error=lambda error: messagebox.showwarning("Export Failed", str(error)))
 
     def _on_mousewheel(self, event):
         """Handle mouse scroll for the canvas."""
@@ -251,6 +388,9 @@ class TaskList(tk.Frame):
         if task_name == "":
             messagebox.showwarning("Input Error", "Task name cannot be empty.")
             return
+        if CONTROL_CHARACTERS.search(task_name):
+            messagebox.showwarning("Input Error", "Task name cannot contain line breaks.")
+            return
 
         # Convert the selected deadline and time to a datetime object
         try:
@@ -260,142 +400,184 @@ class TaskList(tk.Frame):
             messagebox.showwarning("Invalid Time", "Please enter a valid time.")
             return
 
-        # Format the time needed as HH:MM
+        # Convert the time needed to minutes
         try:
             time_needed_hours = int(time_needed_hours)
             time_needed_minutes = int(time_needed_minutes)
             if time_needed_hours < 0 or time_needed_minutes < 0:
                 raise ValueError
-            time_needed_formatted = f"{time_needed_hours:02d}:{time_needed_minutes:02d}"
+            minutes_needed = time_needed_hours * 60 + time_needed_minutes
         except ValueError:
             messagebox.showwarning("Invalid Time Needed", "Please enter a valid amount of time needed.")
             return
 
-        current_datetime = datetime.now()
+        # Check that the selected deadline date and time is still in the future
+        try:
+            validate_deadline(deadline_date)
+        except InvalidTaskError as error:
+            messagebox.showwarning(error.title, str(error))
+            return
 
-        # Check if the selected date is today
-        if deadline_date.date() == current_datetime.date():
-            # Check if the selected time (hour and minute) has already passed for today
-            if deadline_date.time() <= current_datetime.time():
-                messagebox.showwarning("Invalid Time", "The selected time has already passed. Please choose a future time.")
+        # Every N days needs a whole number of days
+        repeat = self.repeat_var.get()
+        interval = 1
+        if repeat == RULE_EVERY_N_DAYS:
+            try:
+                interval = int(self.repeat_days_var.get())
+                if interval < 1:
+                    raise ValueError
+            except ValueError:
+                messagebox.showwarning("Invalid Repeat", "Please enter how many days apart the task repeats.")
                 return
 
-        # Check if the selected deadline date and time is in the past
-        if deadline_date < current_datetime:
-            messagebox.showwarning("Invalid Deadline", "The selected deadline has already passed. Please choose a future date and time.")
-            return
-
-        # Add task to internal list as a tuple if the deadline is valid
-        task_info = (task_name, deadline_date, priority, time_needed_formatted)
-        self.tasks.append(task_info)
+        # Add the task to the engine (orders, expiry heap and store) if the deadline is valid
+        task_info = Task(task_name, to_epoch(deadline_date), PRIORITY_LEVELS[priority], minutes_needed)
+        if repeat == NO_REPEAT:
+            self.engine.add_task(task_info)
+        else:
+            # The deadline is the first occurrence; later ones roll forward as earlier ones pass
+            self.engine.add_recurring_task(RecurringTask(task_info, repeat, interval))
 
-        # Update the task listbox based on the current filter (sort by due date)
+        # Show the due date order, which already contains the new task
         self.sort_by_due_date()
 
-        # Save tasks to file
-        self.save_tasks()
-
         # Clear the task entry fields
         self.task_entry.delete(0, tk.END)
 
+    @timed("task_list.save_tasks")
     def save_tasks(self):
-        """Write tasks to a text file."""
-        with open("logs/task_log.txt", "w") as file:
-            for task in self.tasks:
-                task_string = f"{task[0]} - Deadline: {task[1].strftime('%m/%d/%y %H:%M:%S')}, Priority: {task[2]}, Time Needed: {task[3]}"
-                file.write(f"{task_string}\n")
+        """Write the full task list to the task store."""
+        self.engine.save_tasks()
 
     def load_tasks(self):
-        """Load tasks from the text file."""
-        self.tasks.clear()  # Clear the current task list
+        """Load tasks from the task store without blocking the UI."""
+        # The first load may already be running, started before this frame was built
+        future, self._initial_load = self._initial_load, None
+        self._when_done(future or self.engine.store.load_tasks_async(), self._prepare_loaded_tasks,
+                        on_error=self._on_load_error)
+
+    def _prepare_loaded_tasks(self, tasks):
+        """Sort the loaded tasks into every order on the I/O thread too, so the UI keeps responding."""
+        self._when_done(self.engine.store.submit(self.engine.prepare_loaded_tasks, tasks), self._on_tasks_loaded,
+                        on_error=self._on_load_error)
+
+    def _on_load_error(self, error):
+        """Report a task log that could not be read, and offer to read it again."""
+        traceback.print_exception(type(error), error, error.__traceback__)
+        if messagebox.askretrycancel("Load Failed", f"The task list could not be loaded:\n{error}"):
+            self.load_tasks()
+
+    @timed("task_list.load_tasks")
+    def _on_tasks_loaded(self, prepared):
+        """Swap in the orders built in the background, then start watching for passed tasks."""
+        self.engine.install_loaded_tasks(prepared)
+
+        # Update the task listbox after loading tasks
+        self.sort_by_due_date()
 
-        try:
-            with open("logs/task_log.txt", "r") as file:
-                tasks = file.readlines()
-                for task in tasks:
-                    task_name, rest = task.split(" - Deadline: ")
-                    deadline_str, priority_and_time = rest.split(", Priority: ")
-                    priority, time_needed = priority_and_time.split(", Time Needed: ")
-
-                    # Try to parse deadline with the most complete format first
-                    deadline_str = deadline_str.strip()
-                    parsed_successfully = False
-
-                    # List of possible formats
-                    formats = [
-                        "%m/%d/%y %H:%M:%S",  # Format with date, hour, minute, and second
-                        "%m/%d/%y %H:%M",     # Format with date, hour, and minute
-                        "%m/%d/%y"            # Format with only date
-                    ]
-
-                    # Try each format in the list until one succeeds
-                    for date_format in formats:
-                        try:
-                            deadline_date = datetime.strptime(deadline_str, date_format)
-                            parsed_successfully = True
-                            break
-                        except ValueError:
-                            continue
-
-                    # If no format matches, raise an error
-                    if not parsed_successfully:
-                        raise ValueError(f"Unable to parse date: {deadline_str}")
-
-                    # Append the task as a tuple, using the formatted "Time Needed" field
-                    self.tasks.append((task_name, deadline_date, priority.strip(), time_needed.strip()))
-
-                # Update the task listbox after loading tasks
-                self.sort_by_due_date()
-        except FileNotFoundError:
-            pass
+        # Recurring task rules are read next, on the same I/O thread
+        self._when_done(self.engine.store.load_recurring_tasks_async(), self._on_recurring_tasks_loaded)
+
+        # Start the observer function to check passed tasks
+        self.check_passed_tasks()
+
+        # Keep the To Do order current while it is shown
+        self._to_do_timer = self.after(TO_DO_REFRESH_MS, self.refresh_to_do_order)
+
+        # Pick up edits made by other app instances from now on
+        self._poll_timer = self.after(STORE_POLL_MS, self.poll_store_changes)
+
+        if self.on_loaded is not None:
+            self.on_loaded()
+
+    def _on_recurring_tasks_loaded(self, recurring_tasks):
+        """Show the occurrences of the recurring tasks that fall within the horizon."""
+        self.engine.apply_recurring_tasks(recurring_tasks)
+        self.apply_current_filter()
+
+    def poll_store_changes(self):
+        """Check the task files for changes made elsewhere in the background, then merge them."""
+        self._poll_timer = None
+        self._report_write_errors()
+        self._when_done(self.engine.store.poll_changes_async(), self._on_store_changes,
+                        on_error=self._on_store_poll_error)
 
+    def _on_store_changes(self, changes):
+        """Merge changed tasks into the orders, redraw if anything changed and schedule the next check."""
+        if self._closed:
+            return
+        if self.engine.apply_store_changes(changes):
+            self.apply_current_filter()
+        self._poll_timer = self.after(STORE_POLL_MS, self.poll_store_changes)
+
+    def _on_store_poll_error(self, error):
+        """Report a failed check (such as an unreadable line added by hand) and keep checking."""
+        traceback.print_exception(type(error), error, error.__traceback__)
+        if not self._closed:
+            self._poll_timer = self.after(STORE_POLL_MS, self.poll_store_changes)
+
+    def _report_write_errors(self):
+        """Tell the user about task writes that failed since the last check; the store keeps retrying them."""
+        error = None
+        while not self._write_errors.empty():
+            error = self._write_errors.get()
+        if error is not None:
+            messagebox.showerror("Save Failed", f"Task changes could not be written to disk and will be retried:\n{error}")
+
+    def close(self):
+        """Write everything still queued to disk, then stop the timers and close the store.
+
+        If the writes fail, their error is raised and the task list keeps running.
+        """
+        self.engine.store.flush()
+        self._closed = True
+        if self._poll_timer is not None:
+            self.after_cancel(self._poll_timer)
+            self._poll_timer = None
+        if self._to_do_timer is not None:
+            self.after_cancel(self._to_do_timer)
+            self._to_do_timer = None
+        self.engine.close()
+
+    @timed("task_list.update_task_listbox")
     def update_task_listbox(self):
         """Update the task listbox to display tasks."""
-        # Clear the listbox
-        self.task_listbox.delete(0, tk.END)
-
-        # Display the tasks in the listbox
-        for task in self.tasks:
-            task_string = f"{task[0]} - Deadline: {task[1].strftime('%m/%d/%y %H:%M')}, Priority: {task[2]}, Time Needed: {task[3]}"
-            self.task_listbox.insert(tk.END, task_string)
+        # Only the visible rows are formatted, and only changed rows are redrawn
+        self.task_listbox.set_tasks(self.search_results() if self.is_searching() else self.tasks)
+
+    def is_searching(self):
+        """Return whether any search field is set."""
+        return bool(self.search_var.get().strip()) or self.search_due_var.get() != ANY_DEADLINE \
+            or self.search_priority_var.get() != ANY_PRIORITY
+
+    def search_results(self):
+        """Return the tasks matching the search fields, answered from the engine's indexes."""
+        window = SEARCH_WINDOWS[self.search_due_var.get()]
+        priority = self.search_priority_var.get()
+        now = datetime.now()
+        return self.engine.query(
+            name_prefix=self.search_var.get().strip(),
+            due_from=None if window is None else now,
+            due_to=None if window is None else now + window,
+            priority=None if priority == ANY_PRIORITY else priority
+        )
 
     def sort_by_due_date(self):
-        """Sort tasks by deadline."""
-        self.tasks.sort(key=lambda task: task[1])
+        """Show tasks by deadline."""
         self.current_filter = self.FILTER_BY_DUE_DATE  # Set the current filter to "sort by due date"
         self.update_task_listbox()
 
     def sort_by_importance(self):
-        """Sort tasks by importance."""
-        priority_map = {"High": 1, "Medium": 2, "Low": 3}
-        self.tasks.sort(key=lambda task: priority_map[task[2]])
+        """Show tasks by importance."""
         self.current_filter = self.FILTER_BY_IMPORTANCE  # Set the current filter to "sort by importance"
         self.update_task_listbox()
 
-    def refresh_tasks(self):
+    @timed("task_list.refresh_tasks")
+    def refresh_tasks(self, passed_tasks=None):
         """Move passed tasks to a separate file and remove them from the main list."""
-        current_datetime = datetime.now()  # Get the current date and time
-        remaining_tasks = []
-        passed_tasks = []
-
-        for task in self.tasks:
-            # If the task deadline has passed (date and time), consider it as passed
-            if task[1] < current_datetime:
-                passed_tasks.append(task)
-            else:
-                remaining_tasks.append(task)
-
-        # Update the remaining tasks in the main list
-        self.tasks = remaining_tasks
-
-        # Save passed tasks to the new file
-        with open("logs/passed_tasks_log.txt", "a") as file:
-            for task in passed_tasks:
-                task_string = f"{task[0]} - Deadline: {task[1].strftime('%m/%d/%y %H:%M')}, Priority: {task[2]}, Time Needed: {task[3]}"
-                file.write(f"{task_string}\n")
-
-        # Reapply the current filter after refreshing tasks
-        self.apply_current_filter()
+        if self.engine.refresh_tasks(passed_tasks):
+            # Show the current order again (the To Do order is rescored only if stale)
+            self.apply_current_filter()
 
     def apply_current_filter(self):
         """Apply the currently active filter to the tasks."""
@@ -405,8 +587,15 @@ class TaskList(tk.Frame):
             self.sort_by_importance()
         elif self.current_filter == self.FILTER_TO_DO_ORDER:  # Show 'To Do' order
             self.show_to_do_order()
-            
+
     def check_passed_tasks(self):
-        """Periodically check for passed tasks and move them to the passed task log."""
-        self.refresh_tasks()
-        self.after(60000, self.check_passed_tasks)  # Check every 60 seconds
+        """Move tasks that have already passed and arm the timer for the next deadline."""
+        if self.engine.check_passed_tasks():
+            self.apply_current_filter()
+
+    def refresh_to_do_order(self):
+        """Rescore and redraw the To Do order every minute while it is shown, as its urgency grows with time."""
+        if self.current_filter == self.FILTER_TO_DO_ORDER:
+            self.engine.rescore_to_do()
+            self.update_task_listbox()
+        self._to_do_timer = self.after(TO_DO_REFRESH_MS, self.refresh_to_do_order)
@@ -0,0 +1,111 @@
+import tkinter as tk
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from components.metrics import METRICS
+from components.task import format_task_summary
+
+# Extra rows rendered above and below the visible window, so small scrolls need no new rows
+OVERSCAN_ROWS = 5
+
+
+@lru_cache(maxsize=4096)
+def format_task_row(task):
+    """Return the listbox text for a task; tasks are immutable, so each is formatted once."""
+    return format_task_summary(task)
+
+
+class VirtualTaskListbox(tk.Frame):
+    """Listbox that only renders the rows around the visible window.
+
+    The full task sequence is never copied into the widget. Only the visible
+    rows plus an overscan margin are formatted and inserted. When the tasks or
+    the scroll position change, the new window is diffed against the rows
+    already shown, and only the inserts and deletes that differ are applied.
+    """
+
+    def __init__(self, master, height=10, overscan=OVERSCAN_ROWS, format_row=format_task_row, **listbox_options):
+        super().__init__(master, bg=listbox_options.get("bg"))
+        self.height = height
+        self.overscan = overscan
+        self.format_row = format_row
+
+        self.tasks = []
+        self.top = 0  # Index of the first visible task
+        self._rendered = []  # Row strings currently in the listbox
+        self._rendered_start = 0  # Index of the task in the first listbox row
+
+        self.listbox = tk.Listbox(self, height=height, **listbox_options)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.listbox.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        # Scroll the list itself rather than the surrounding canvas
+        self.listbox.bind("<MouseWheel>", self._on_mousewheel)
+        self.listbox.bind("<Button-4>", lambda event: self._scroll_by(-1))
+        self.listbox.bind("<Button-5>", lambda event: self._scroll_by(1))
+
+    def set_tasks(self, tasks):
+        """Show `tasks` (any sequence supporting len and slicing), keeping the scroll position."""
+        self.tasks = tasks
+        self.top = self._clamp(self.top)
+        self.render()
+
+    def render(self):
+        """Bring the listbox rows in line with the current window, applying only the differences."""
+        start = max(self.top - self.overscan, 0)
+        end = min(self.top + self.height + self.overscan, len(self.tasks))
+        rows = [self.format_row(task) for task in self.tasks[start:end]]
+
+        # Apply the diff from the back so earlier listbox indices stay valid
+        opcodes = SequenceMatcher(None, self._rendered, rows, autojunk=False).get_opcodes()
+        for tag, old_start, old_end, new_start, new_end in reversed(opcodes):
+            if tag == "equal":
+                continue
+            if tag in ("replace", "delete"):
+                self.listbox.delete(old_start, old_end - 1)
+            if tag in ("replace", "insert"):
+                self.listbox.insert(old_start, *rows[new_start:new_end])
+                METRICS.increment("listbox.rows_inserted", new_end - new_start)
+
+        self._rendered = rows
+        self._rendered_start = start
+        self.listbox.yview(self.top - start)
+        self._update_scrollbar()
+
+    def _clamp(self, top):
+        """Keep the first visible row within the list."""
+        return max(0, min(top, len(self.tasks) - self.height))
+
+    def _scroll_to(self, top):
+        """Move the window so that task `top` is the first visible row."""
+        top = self._clamp(top)
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    def _scroll_by(self, rows):
+        self._scroll_to(self.top + rows)
+        return "break"
+
+    def _on_mousewheel(self, event):
+        """Scroll three rows per wheel notch."""
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        """Handle the scrollbar's moveto and scroll commands."""
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.tasks)))
+        elif action == "scroll":
+            step = self.height if unit == "pages" else 1
+            self._scroll_by(int(amount) * step)
+
+    def _update_scrollbar(self):
+        """Size the scrollbar thumb to the visible share of all tasks."""
+        count = len(self.tasks)
+        if count <= self.height:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.top / count, (self.top + self.height) / count)
@@ -0,0 +1,414 @@
+"""Serve per-user task lists as a JSON API over HTTP on localhost.
+
+Run from the repository root:
+
+    python -m components.task_server --port 8765
+
+Endpoints (USER is 1-64 letters, digits, "-" or "_"):
+
+    POST /users/USER/tasks      add a task: {"name", "deadline", "priority", "time_needed"},
+                                optionally "repeats": daily|weekly|weekdays|every N days
+    GET  /users/USER/tasks      list tasks; ?filter=due_date|importance|to_do, ?prefix=,
+                                ?due_from=, ?due_to=, ?priority=, ?offset=, ?limit=
+    GET  /users/USER/todo       the To Do order; ?offset=, ?limit=
+    GET  /users/USER/passed     passed task history, newest first; ?offset=, ?limit=
+    GET  /health                server status
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import traceback
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from components.background_store import BackgroundTaskStore
+from components.passed_archive import PassedTaskArchive
+from components.recurrence import repeat_task
+from components.task import PRIORITY_LEVELS, Task, to_epoch
+from components.task_engine import (
+    TaskEngine, InvalidTaskError, validate_deadline,
+    FILTER_BY_DUE_DATE, FILTER_BY_IMPORTANCE, FILTER_TO_DO_ORDER
+)
+from components.task_io import parse_deadline, record_to_task, task_to_record
+from components.task_store import JournalTaskStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+USERS_DIR = "logs/users"
+
+# Users are spread over this many shard directories, and this many are kept loaded
+DEFAULT_SHARDS = 16
+DEFAULT_HOT_USERS = 64
+
+# Page size when a request gives no limit, and the largest one allowed
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+MAX_BODY_BYTES = 1024 * 1024
+USER_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+FILTERS = {"due_date": FILTER_BY_DUE_DATE, "importance": FILTER_BY_IMPORTANCE, "to_do": FILTER_TO_DO_ORDER}
+
+# Writes of one user wait at most this long to be grouped with writes of concurrent requests
+WRITE_DEBOUNCE_SECONDS = 0.002
+
+# A loaded user's files are checked for changes made by other processes at most this often
+STORE_POLL_SECONDS = 2.0
+
+
+class HttpError(Exception):
+    """An error answered with `status` and a JSON body holding `message`."""
+
+    def __init__(self, status, message, title=None):
+        super().__init__(message)
+        self.status = status
+        self.title = title
+
+
+class UserSession:
+    """A loaded user: a task engine over the user's own store, with expiry run on each request."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.closed = False  # Set once the session has been evicted
+        self.polled_at = asyncio.get_running_loop().time()  # Last check for changes made by other processes
+
+    @property
+    def store(self):
+        return self.engine.store
+
+
+class UserCache:
+    """Per-user task stores in shard directories, with the most recently used users kept loaded.
+
+    User USER lives in `root/NN/USER/`, NN being a stable hash of the name
+    modulo `shards`, so no directory holds too many users. At most `capacity`
+    users are loaded; the least recently used one is flushed and closed when
+    another one has to be loaded, and loading it again waits for that close.
+    Every user's store is a BackgroundTaskStore:
+    writes made while a flush is running are merged into the next one, which
+    batches concurrent writes to the same user.
+    """
+
+    def __init__(self, root=USERS_DIR, shards=DEFAULT_SHARDS, capacity=DEFAULT_HOT_USERS):
+        self.root = root
+        self.shards = shards
+        self.capacity = capacity
+        self._sessions = OrderedDict()
+        self._loading = {}  # User name to the Future of a session being loaded
+        self._closing = {}  # User name to the Future of an evicted session being closed
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def user_directory(self, user):
+        shard = int.from_bytes(hashlib.blake2b(user.encode("utf-8"), digest_size=4).digest(), "big") % self.shards
+        return os.path.join(self.root, f"{shard:02d}", user)
+
+    async def get(self, user):
+        """Return the session of `user`, loading it (and evicting another) if needed."""
+        session = self._sessions.get(user)
+        if session is not None:
+            self._sessions.move_to_end(user)
+            self.hits += 1
+            return session
+
+        # Concurrent requests for a user that is being loaded share one load
+        loading = self._loading.get(user)
+        if loading is None:
+            self.misses += 1
+            loading = asyncio.ensure_future(self._load(user))
+            self._loading[user] = loading
+            try:
+                session = await loading
+            finally:
+                del self._loading[user]
+            self._sessions[user] = session
+            await self._evict()
+            return session
+        return await asyncio.shield(loading)
+
+    async def close(self):
+        """Flush and close every loaded user."""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            session.closed = True
+            try:
+                await asyncio.to_thread(session.engine.close)
+            except Exception as error:
+                # Report it and go on, so that every other user is still closed
+                traceback.print_exception(type(error), error, error.__traceback__)
+        if self._closing:
+            await asyncio.wait(list(self._closing.values()))
+
+    async def _load(self, user):
+        # An evicted session of this user must finish its writes before the files are read again
+        closing = self._closing.get(user)
+        if closing is not None:
+            await asyncio.wait([closing])
+        directory = self.user_directory(user)
+        await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+        store = BackgroundTaskStore(
+            JournalTaskStore(
+                os.path.join(directory, "task_log.txt"),
+                os.path.join(directory, "task_journal.txt"),
+                PassedTaskArchive(os.path.join(directory, "passed"), legacy_path=None)
+            ),
+            debounce=WRITE_DEBOUNCE_SECONDS
+        )
+        engine = TaskEngine(store)
+        engine.apply_loaded_tasks(await asyncio.wrap_future(store.load_tasks_async()))
+        engine.apply_recurring_tasks(await asyncio.wrap_future(store.load_recurring_tasks_async()))
+        return UserSession(engine)
+
+    async def _evict(self):
+        while len(self._sessions) > self.capacity:
+            user, session = self._sessions.popitem(last=False)
+            session.closed = True
+            # Closing the store first completes every write and read already queued
+            closing = asyncio.ensure_future(asyncio.to_thread(session.engine.close))
+            self._closing[user] = closing
+            try:
+                await closing
+            except Exception as error:
+                # The store stays open and keeps retrying its writes; a reload picks them up by polling
+                traceback.print_exception(type(error), error, error.__traceback__)
+            finally:
+                if self._closing.get(user) is closing:
+                    del self._closing[user]
+
+
+def _page(sequence, query):
+    """Return the requested slice of `sequence` and the paging fields of the response."""
+    offset = _int_parameter(query, "offset", 0)
+    limit = min(_int_parameter(query, "limit", DEFAULT_LIMIT), MAX_LIMIT)
+    return sequence[offset:offset + limit], {"offset": offset, "limit": limit, "total": len(sequence)}
+
+
+def _int_parameter(query, name, default):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+    if value < 0:
+        raise HttpError(400, f"{name} cannot be negative")
+    return value
+
+
+def _deadline_parameter(query, name):
+    if name not in query:
+        return None
+    try:
+        return parse_deadline(query[name][0])
+    except ValueError as error:
+        raise HttpError(400, str(error))
+
+
+class TaskServer:
+    """asyncio HTTP/1.1 server answering the JSON API in the module docstring."""
+
+    def __init__(self, cache=None, clock=datetime.now):
+        self.cache = UserCache() if cache is None else cache
+        self.clock = clock
+        self.requests = 0
+        self._server = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.cache.close()
+
+    async def _handle_connection(self, reader, writer):
+        """Serve requests on one connection until the client closes it or asks to."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, body = 413, {"error": "Request body too large"}
+                    keep_alive = False
+                else:
+                    payload = await reader.readexactly(length) if length else b""
+                    status, body = await self._respond(method, target, payload)
+                    keep_alive = headers.get("connection", "").lower() != "close" and version.strip() == "HTTP/1.1"
+
+                data = json.dumps(body).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target, payload):
+        """Route one request; returns (status, JSON-ready body)."""
+        self.requests += 1
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        try:
+            if parts == ["health"] and method == "GET":
+                return 200, {"status": "ok", "requests": self.requests, "loaded_users": len(self.cache),
+                             "cache_hits": self.cache.hits, "cache_misses": self.cache.misses}
+            if len(parts) != 3 or parts[0] != "users" or parts[2] not in ("tasks", "todo", "passed"):
+                raise HttpError(404, "Not found")
+            user, resource = parts[1], parts[2]
+            if not USER_NAME.fullmatch(user):
+                raise HttpError(400, "Invalid user name")
+            allowed = ("GET", "POST") if resource == "tasks" else ("GET",)
+            if method not in allowed:
+                raise HttpError(405, "Method not allowed")
+
+            session = await self._session(user)
+
+            # The engine is only touched between awaits, so requests never interleave inside it.
+            # There is no event loop timer per user; tasks that passed are moved on access.
+            session.engine.check_passed_tasks()
+            if method == "POST":
+                return await self._add_task(session, payload)
+            if resource == "tasks":
+                return self._list_tasks(session, query)
+            if resource == "todo":
+                tasks, page = _page(session.engine.ordered_tasks(FILTER_TO_DO_ORDER), query)
+                return 200, {"tasks": [task_to_record(task) for task in tasks], **page}
+            return await self._passed_tasks(session, query)
+        except HttpError as error:
+            body = {"error": str(error)}
+            if error.title:
+                body["title"] = error.title
+            return error.status, body
+        except Exception as error:
+            # A store that cannot be read or written, or a bug: answer instead of dropping the connection
+            traceback.print_exception(type(error), error, error.__traceback__)
+            return 500, {"error": "Internal server error"}
+
+    async def _session(self, user):
+        """Return the loaded session of `user`, with what other processes changed in its files merged in."""
+        while True:
+            session = await self.cache.get(user)
+            now = asyncio.get_running_loop().time()
+            if now - session.polled_at >= STORE_POLL_SECONDS:
+                session.polled_at = now
+                changes = await asyncio.wrap_future(session.store.poll_changes_async())
+                if not session.closed:
+                    session.engine.apply_store_changes(changes)
+            # The session may have been evicted while the request waited
+            if not session.closed:
+                return session
+
+    async def _add_task(self, session, payload):
+        try:
+            record = json.loads(payload or b"{}")
+            if not isinstance(record, dict):
+                raise ValueError("Expected a JSON object")
+            name, deadline, priority, minutes = record_to_task(record)
+            task = Task(name, to_epoch(deadline), priority, minutes)
+            repeats = record.get("repeats")
+            recurring = repeat_task(task, repeats) if repeats else None
+        except (ValueError, TypeError, AttributeError) as error:
+            raise HttpError(400, str(error))
+        try:
+            validate_deadline(deadline, self.clock())
+        except InvalidTaskError as error:
+            raise HttpError(422, str(error), error.title)
+
+        # A recurring task is stored once; its occurrences within the horizon join the list
+        if recurring is None:
+            session.engine.add_task(task)
+        else:
+            session.engine.add_recurring_task(recurring)
+        # Answer once the write is on disk; concurrent adds for this user share the flush.
+        # A failed write stays queued for a retry, and the error is answered with a 500.
+        await asyncio.wrap_future(session.store.flush_async())
+        body = {"task": task_to_record(task), "total": len(session.engine)}
+        if recurring is not None:
+            body["repeats"] = recurring.describe()
+        return 201, body
+
+    def _list_tasks(self, session, query):
+        engine = session.engine
+        task_filter = query.get("filter", ["due_date"])[0]
+        if task_filter not in FILTERS:
+            raise HttpError(400, f"filter must be one of {', '.join(FILTERS)}")
+        priority = query.get("priority", [None])[0]
+        if priority is not None and priority.capitalize() not in PRIORITY_LEVELS:
+            raise HttpError(400, "priority must be High, Medium or Low")
+        prefix = query.get("prefix", [""])[0]
+        due_from = _deadline_parameter(query, "due_from")
+        due_to = _deadline_parameter(query, "due_to")
+
+        if prefix or priority or due_from or due_to:
+            tasks = engine.query(prefix, due_from, due_to, priority and priority.capitalize())
+        else:
+            tasks = engine.ordered_tasks(FILTERS[task_filter])
+        tasks, page = _page(tasks, query)
+        return 200, {"tasks": [task_to_record(task) for task in tasks], **page}
+
+    async def _passed_tasks(self, session, query):
+        reader = await asyncio.wrap_future(session.store.open_passed_tasks_reader_async())
+        try:
+            lines, page = _page(reader, query)
+        finally:
+            if hasattr(reader, "close"):
+                reader.close()
+        return 200, {"passed": lines, **page}
+
+
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+
+async def serve(host, port, cache):
+    server = TaskServer(cache)
+    port = await server.start(host, port)
+    print(f"Serving tasks on http://{host}:{port}/ (data in {cache.root})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--data-dir", default=USERS_DIR, help="directory holding the per-user shards")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS)
+    parser.add_argument("--hot-users", type=int, default=DEFAULT_HOT_USERS, help="users kept loaded in memory")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, UserCache(args.data_dir, args.shards, args.hot_users)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
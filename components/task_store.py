@@ -0,0 +1,617 @@
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+from components.file_lock import FileLock
+from components.metrics import METRICS
+from components.passed_archive import PassedTaskArchive
+from components.recurrence import format_recurring_task, read_recurring_tasks
+from components.task import PRIORITY_LEVELS, format_task, parse_task, to_epoch
+
+# Default locations of the task snapshot and its journal
+TASK_LOG_PATH = "logs/task_log.txt"
+TASK_JOURNAL_PATH = "logs/task_journal.txt"
+
+# Recurring task rules, kept next to the snapshot
+RECURRING_TASKS_FILE = "recurring_tasks.txt"
+
+# Header written as the first line of a snapshot, recording the last journal record it contains
+SNAPSHOT_HEADER = re.compile(r"# snapshot seq=(\d+)")
+
+# Journal record operations
+OP_ADD = "+"
+OP_REMOVE = "-"
+
+# Journal records formatted and written per write call
+APPEND_CHUNK_RECORDS = 10_000
+
+# Unreadable lines kept for the report; every one is counted
+MAX_REPORTED_LINES = 100
+
+
+def _file_signature(path):
+    """Return (device, inode, size, mtime) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def create_task_store(kind=None):
+    """Create the task store named by `kind` or the TASK_STORE environment variable."""
+    kind = kind or os.environ.get("TASK_STORE", "journal")
+    if kind == "journal":
+        return JournalTaskStore()
+    if kind == "sqlite":
+        from components.sqlite_store import SqliteTaskStore
+        return SqliteTaskStore()
+    raise ValueError(f"Unknown task store: {kind}")
+
+
+class TaskChanges:
+    """Changes another writer made to a store since they were last reported."""
+
+    def __init__(self, added=(), removed=(), recurring_tasks=None):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.recurring_tasks = recurring_tasks  # The new recurring task rules, or None if unchanged
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.recurring_tasks is not None)
+
+
+class TaskStore:
+    """Interface of the storage behind TaskList's load, save and refresh."""
+
+    def load_tasks(self):
+        """Return every stored task."""
+        raise NotImplementedError
+
+    def save_tasks(self, tasks):
+        """Replace the stored tasks with `tasks`."""
+        raise NotImplementedError
+
+    def add_task(self, task):
+        """Persist a single new task."""
+        self.add_tasks([task])
+
+    def add_tasks(self, tasks):
+        """Persist several new tasks in one batch."""
+        raise NotImplementedError
+
+    def remove_tasks(self, tasks):
+        """Remove several tasks (deleted or expired) in one batch."""
+        raise NotImplementedError
+
+    def archive_passed_tasks(self, tasks):
+        """Record tasks whose deadline has passed in the passed task history."""
+        raise NotImplementedError
+
+    def load_passed_tasks_text(self):
+        """Return the passed task history as text, or None if there is none."""
+        raise NotImplementedError
+
+    def open_passed_tasks_reader(self):
+        """Return a sequence of passed task lines, newest first, for paged viewing."""
+        text = self.load_passed_tasks_text()
+        return list(reversed(text.splitlines())) if text else []
+
+    def load_recurring_tasks(self):
+        """Return every stored recurring task rule."""
+        return []
+
+    def save_recurring_tasks(self, recurring_tasks):
+        """Replace the stored recurring task rules with `recurring_tasks`."""
+        raise NotImplementedError
+
+    def poll_changes(self):
+        """Return the TaskChanges other app instances or scripts made since the last load or poll."""
+        return TaskChanges()
+
+    def tasks_due_before(self, deadline):
+        """Return the tasks due before `deadline`, earliest first."""
+        deadline = to_epoch(deadline)
+        return sorted((task for task in self.load_tasks() if task.deadline < deadline), key=lambda task: task.deadline)
+
+    def tasks_with_priority(self, priority):
+        """Return the tasks with the given priority, earliest deadline first."""
+        level = PRIORITY_LEVELS[priority]
+        return sorted((task for task in self.load_tasks() if task.priority == level), key=lambda task: task.deadline)
+
+    def close(self):
+        """Flush pending work and release any open files."""
+
+
+class JournalTaskStore(TaskStore):
+    """Append-only task store made of a snapshot file plus a journal of changes.
+
+    Every add or remove appends one small record to the journal, so the cost of a
+    change does not depend on how many tasks exist. Once the journal grows past
+    `compact_threshold` records, a background thread folds it into a new snapshot
+    (written to a temp file and atomically renamed) and trims the journal.
+    Recurring task rules are few and rewritten whole, in their own file.
+
+    Several app instances, or scripts, may share the files. Every write holds
+    an exclusive lock on `<snapshot>.lock` and first catches up on the records
+    other writers appended, so sequence numbers stay unique and no change is
+    overwritten. `poll_changes` reports what the others changed: a grown journal
+    is read from the last known offset, and a replaced or edited snapshot is
+    compared line by line with the lines already known, so only lines never
+    seen before are parsed.
+    """
+
+    def __init__(self, snapshot_path=TASK_LOG_PATH, journal_path=TASK_JOURNAL_PATH,
+                 passed_archive=None, compact_threshold=1000, recurring_path=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.recurring_path = recurring_path or os.path.join(os.path.dirname(snapshot_path), RECURRING_TASKS_FILE)
+        self._passed_archive = passed_archive
+        self.compact_threshold = compact_threshold
+
+        # Sequence number of the last record written or read, and records since the last compaction
+        self.seq = 0
+        self.journal_records = 0
+
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(f"{snapshot_path}.lock")
+        self._journal_file = None
+        self._compaction_thread = None
+
+        # The stored tasks as last read or written: line -> count, and line -> its Task
+        self._line_counts = {}
+        self._line_tasks = {}
+
+        # The files as last read or written, and how far the journal has been read
+        self._snapshot_signature = None
+        self._journal_identity = None
+        self._journal_offset = 0
+        self._recurring_signature = None
+
+        # Task -> net count other writers added (> 0) or removed (< 0), not yet reported
+        self._pending = Counter()
+        # Tasks another writer removed before this store did, so it also archived them
+        self._removed_elsewhere = Counter()
+
+        # Lines skipped since the last load because they could not be parsed, and (line, reason) of the first ones
+        self.unreadable_count = 0
+        self.unreadable_lines = []
+
+    def load_tasks(self):
+        """Replay the snapshot and then the journal, returning the list of tasks.
+
+        Lines that cannot be parsed, for instance left by a crash or an edit by
+        hand, are skipped; they are counted in `unreadable_count` and reported
+        on stderr.
+        """
+        with self._lock, self._file_lock:
+            self.unreadable_count = 0
+            self.unreadable_lines = []
+            lines, snapshot_seq = self._read_snapshot()
+            last_seq, records, position = self._replay_journal(lines, snapshot_seq)
+            self.seq = max(snapshot_seq, last_seq)
+            self.journal_records = records
+            self._set_state(lines, report=False)
+            self._remember_files(position)
+            self._pending.clear()
+
+            tasks = []
+            for line, count in self._line_counts.items():
+                tasks.extend([self._line_tasks[line]] * count)
+        if self.unreadable_count:
+            print(f"Skipped {self.unreadable_count} unreadable lines in {self.snapshot_path} and {self.journal_path}:",
+                  *(f"  {line!r}: {reason}" for line, reason in self.unreadable_lines[:10]), sep="\n", file=sys.stderr)
+        return tasks
+
+    def add_tasks(self, tasks):
+        """Journal the addition of tasks in one write."""
+        if tasks:
+            self._append([(OP_ADD, task) for task in tasks])
+
+    def remove_tasks(self, tasks):
+        """Journal the removal of tasks in one write."""
+        if tasks:
+            self._append([(OP_REMOVE, task) for task in tasks])
+
+    def poll_changes(self):
+        """Return the TaskChanges other writers made since the last load or poll.
+
+        Only file sizes and times are checked until something has changed.
+        """
+        if not self._pending and not self._files_changed():
+            return TaskChanges()
+        with self._lock, self._file_lock:
+            self._catch_up()
+            added, removed = [], []
+            for task, count in self._pending.items():
+                if count > 0:
+                    added.extend([task] * count)
+                elif count < 0:
+                    removed.extend([task] * -count)
+            self._pending.clear()
+
+            recurring_tasks = None
+            signature = _file_signature(self.recurring_path)
+            if signature != self._recurring_signature:
+                self._recurring_signature = signature
+                recurring_tasks = read_recurring_tasks(self.recurring_path, self._skip_unreadable)
+        return TaskChanges(added, removed, recurring_tasks)
+
+    @property
+    def passed_archive(self):
+        """Segmented passed task archive, created on first use."""
+        if self._passed_archive is None:
+            self._passed_archive = PassedTaskArchive()
+        return self._passed_archive
+
+    def archive_passed_tasks(self, tasks):
+        """Append passed tasks to the passed task archive, except those another writer already moved there."""
+        with self._lock, self._file_lock:
+            if self._removed_elsewhere:
+                kept = []
+                for task in tasks:
+                    if self._removed_elsewhere[task]:
+                        self._removed_elsewhere[task] -= 1
+                        if not self._removed_elsewhere[task]:
+                            del self._removed_elsewhere[task]
+                    else:
+                        kept.append(task)
+                tasks = kept
+            if tasks:
+                self.passed_archive.append(tasks)
+
+    def load_passed_tasks_text(self):
+        """Return the whole passed task archive as text, or None if it is empty."""
+        text = "".join(f"{line}\n" for line in self.passed_archive.iter_lines())
+        return text or None
+
+    def open_passed_tasks_reader(self):
+        """Return a memory-mapped reader over the archive, newest line first."""
+        return self.passed_archive.open_reader()
+
+    def load_recurring_tasks(self):
+        """Read the recurring task file."""
+        with self._file_lock:
+            self._recurring_signature = _file_signature(self.recurring_path)
+            return read_recurring_tasks(self.recurring_path, self._skip_unreadable)
+
+    def save_recurring_tasks(self, recurring_tasks):
+        """Rewrite the recurring task file through a temp file and atomic rename."""
+        with self._file_lock:
+            self._atomic_write(self.recurring_path, [f"{format_recurring_task(recurring)}\n" for recurring in recurring_tasks])
+            self._recurring_signature = _file_signature(self.recurring_path)
+
+    def save_tasks(self, tasks):
+        """Replace the snapshot with the given tasks and empty the journal.
+
+        Changes other writers made that have not been reported yet are applied
+        on top of `tasks`, so a save never discards them.
+        """
+        self.wait_for_compaction()
+        with self._lock, self._file_lock:
+            self._catch_up()
+            if any(self._pending.values()):
+                merged = Counter(tasks)
+                merged.update(self._pending)
+                tasks = list((+merged).elements())
+            self._line_counts, self._line_tasks = {}, {}
+            self._write_snapshot_file(self._tracked_lines(tasks), self.seq)
+            self._close_journal()
+            self._atomic_write(self.journal_path, [])
+            self.journal_records = 0
+            self._remember_files(0)
+
+    def compact(self, background=True):
+        """Fold the journal into a new snapshot, on a background thread by default."""
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        if background:
+            self._compaction_thread = threading.Thread(target=self._compact, daemon=True)
+            self._compaction_thread.start()
+        else:
+            self._compact()
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished."""
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+            self._compaction_thread = None
+
+    def close(self):
+        """Finish any compaction and close the journal file."""
+        self.wait_for_compaction()
+        with self._lock:
+            self._close_journal()
+
+    def _append(self, records):
+        """Write journal records with fresh sequence numbers and trigger compaction when needed."""
+        with self._lock, self._file_lock:
+            self._catch_up()
+            if self._journal_file is None:
+                self._journal_file = open(self.journal_path, "a", encoding="utf-8")
+            # Written in slices, so a bulk import never formats the whole batch at once
+            written = 0
+            for start in range(0, len(records), APPEND_CHUNK_RECORDS):
+                chunks = []
+                for op, task in records[start:start + APPEND_CHUNK_RECORDS]:
+                    line = format_task(task)
+                    if op == OP_REMOVE and not self._line_counts.get(line):
+                        self._note_removed_elsewhere(task)
+                        continue
+                    self._track(line, task, 1 if op == OP_ADD else -1)
+                    self.seq += 1
+                    chunks.append(f"{self.seq} {op} {line}\n")
+                self._journal_file.write("".join(chunks))
+                written += len(chunks)
+            self._journal_file.flush()
+            stat = os.fstat(self._journal_file.fileno())
+            self._journal_identity = (stat.st_dev, stat.st_ino)
+            self._journal_offset = stat.st_size
+            self.journal_records += written
+            needs_compaction = self.journal_records >= self.compact_threshold
+
+        if needs_compaction:
+            self.compact()
+
+    def _compact(self):
+        """Rewrite the snapshot from snapshot plus journal, then drop the folded records."""
+        with self._lock, self._file_lock:
+            # Remember how far the journal reaches now; later appends stay in the journal
+            self._catch_up()
+            if self._journal_file is not None:
+                self._journal_file.flush()
+            journal_size = self._journal_offset
+            compacted_seq = self.seq
+            snapshot_signature = self._snapshot_signature
+            journal_identity = self._journal_identity
+
+        # The expensive part runs without the locks so appends, here or in other instances, are never blocked by it
+        lines, snapshot_seq = self._read_snapshot()
+        self._replay_journal(lines, snapshot_seq, max_seq=compacted_seq, end=journal_size, report=False)
+        temp_path = self._write_temp(self.snapshot_path, self._snapshot_chunks(self._expand(lines), compacted_seq))
+
+        with self._lock, self._file_lock:
+            # Another writer saved or compacted meanwhile, so its files are newer than this snapshot
+            if _file_signature(self.snapshot_path) != snapshot_signature or self._current_journal_identity() != journal_identity:
+                os.remove(temp_path)
+                return
+            os.replace(temp_path, self.snapshot_path)
+
+            # Keep only the records appended while the snapshot was being written
+            self._close_journal()
+            remaining = []
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "rb") as file:
+                    file.seek(journal_size)
+                    remaining = [record.decode("utf-8") for record in file]
+            self._atomic_write(self.journal_path, remaining)
+            self.journal_records = len(remaining)
+            self._remember_files(self._journal_offset - journal_size)
+
+    def _files_changed(self):
+        """Return whether the snapshot, journal or recurring task file differ from when last seen."""
+        journal = _file_signature(self.journal_path)
+        return (_file_signature(self.snapshot_path) != self._snapshot_signature
+                or (journal[:2] if journal else None) != self._journal_identity
+                or (journal[2] if journal else 0) != self._journal_offset
+                or _file_signature(self.recurring_path) != self._recurring_signature)
+
+    def _catch_up(self):
+        """Bring the known tasks up to date with the files, queueing what other writers changed.
+
+        Runs with both locks held, before every write and in poll_changes.
+        """
+        journal = _file_signature(self.journal_path)
+        journal_identity = journal[:2] if journal else None
+        replaced = self._journal_identity is not None and journal_identity != self._journal_identity
+        if _file_signature(self.snapshot_path) != self._snapshot_signature or replaced \
+                or (journal is not None and journal[2] < self._journal_offset):
+            # Saved, compacted or edited elsewhere: compare every line, but parse only new ones
+            self._close_journal()
+            lines, snapshot_seq = self._read_snapshot()
+            last_seq, self.journal_records, position = self._replay_journal(lines, snapshot_seq)
+            self.seq = max(self.seq, snapshot_seq, last_seq)
+            self._set_state(lines)
+            self._remember_files(position)
+        elif journal is not None and journal[2] > self._journal_offset:
+            self._journal_identity = journal_identity
+            self._read_journal_tail()
+
+    def _read_journal_tail(self):
+        """Apply the journal records other writers appended after the last known offset."""
+        with open(self.journal_path, "rb") as file:
+            file.seek(self._journal_offset)
+            for raw_record in file:
+                # A record still being written has no newline yet
+                if not raw_record.endswith(b"\n"):
+                    break
+                self._journal_offset += len(raw_record)
+                try:
+                    seq_str, op, line = raw_record.decode("utf-8").rstrip("\n").split(" ", 2)
+                    seq = int(seq_str)
+                    task = self._line_tasks.get(line) or parse_task(line)
+                except (ValueError, KeyError) as error:
+                    self._skip_unreadable(raw_record.decode("utf-8", "replace").rstrip("\n"), error)
+                    continue
+                if seq <= self.seq:
+                    continue
+                self.seq = seq
+                self.journal_records += 1
+                if op == OP_ADD:
+                    self._track(line, task, 1)
+                    self._pending[task] += 1
+                elif op == OP_REMOVE and self._line_counts.get(line):
+                    self._track(line, task, -1)
+                    self._pending[task] -= 1
+
+    def _set_state(self, lines, report=True):
+        """Make a {line: count} map the known tasks; with `report`, queue how it differs from before.
+
+        Lines that cannot be parsed are skipped and recorded as unreadable.
+        """
+        counts = {}
+        tasks = {}
+        for line, count in lines.items():
+            task = self._line_tasks.get(line)
+            if task is None:
+                try:
+                    task = parse_task(line)
+                except (ValueError, KeyError) as error:
+                    self._skip_unreadable(line, error)
+                    continue
+            counts[line] = count
+            tasks[line] = task
+
+        if report:
+            for line, count in counts.items():
+                change = count - self._line_counts.get(line, 0)
+                if change:
+                    self._pending[tasks[line]] += change
+            for line, count in self._line_counts.items():
+                if line not in counts:
+                    self._pending[self._line_tasks[line]] -= count
+        self._line_counts = counts
+        self._line_tasks = tasks
+
+    def _track(self, line, task, change):
+        """Add `change` to the known count of a task line."""
+        count = self._line_counts.get(line, 0) + change
+        if count > 0:
+            self._line_counts[line] = count
+            self._line_tasks[line] = task
+        else:
+            self._line_counts.pop(line, None)
+            self._line_tasks.pop(line, None)
+
+    def _tracked_lines(self, tasks):
+        """Yield the line of each task, recording it as known."""
+        for task in tasks:
+            line = format_task(task)
+            self._track(line, task, 1)
+            yield line
+
+    def _skip_unreadable(self, line, error):
+        """Count a line that cannot be parsed, keeping it for the report if there is room."""
+        self.unreadable_count += 1
+        METRICS.increment("store.unreadable_lines")
+        if len(self.unreadable_lines) < MAX_REPORTED_LINES:
+            self.unreadable_lines.append((line, str(error)))
+
+    def _note_removed_elsewhere(self, task):
+        """Record that a task this store was asked to remove had already been removed by another writer."""
+        # The caller has dropped it itself, so the pending removal needs no report
+        if self._pending[task] < 0:
+            self._pending[task] += 1
+        self._removed_elsewhere[task] += 1
+
+    def _remember_files(self, journal_offset):
+        """Record the current snapshot and journal as seen, with the journal read up to `journal_offset`."""
+        self._snapshot_signature = _file_signature(self.snapshot_path)
+        self._journal_identity = self._current_journal_identity()
+        self._journal_offset = journal_offset
+
+    def _current_journal_identity(self):
+        journal = _file_signature(self.journal_path)
+        return journal[:2] if journal else None
+
+    def _read_snapshot(self):
+        """Read the snapshot into an ordered {line: count} map and return it with its sequence number."""
+        lines = {}
+        snapshot_seq = 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    line = line.rstrip("\n")
+                    header = SNAPSHOT_HEADER.fullmatch(line)
+                    if header:
+                        snapshot_seq = int(header.group(1))
+                    elif line:
+                        lines[line] = lines.get(line, 0) + 1
+        except FileNotFoundError:
+            pass
+        return lines, snapshot_seq
+
+    def _replay_journal(self, lines, snapshot_seq, max_seq=None, end=None, report=True):
+        """Apply journal records newer than the snapshot to the {line: count} map.
+
+        Returns the last sequence number applied, the number of records applied
+        and the byte position after the last complete record read. Records
+        without a sequence number and operation are skipped and, with
+        `report`, recorded as unreadable.
+        """
+        last_seq = 0
+        records = 0
+        position = 0
+        try:
+            # Read bytes so positions line up with the file size used by compaction
+            with open(self.journal_path, "rb") as file:
+                for raw_record in file:
+                    if end is not None and position + len(raw_record) > end:
+                        break
+                    # A record cut short by a crash has no newline; it is ignored
+                    if not raw_record.endswith(b"\n"):
+                        break
+                    position += len(raw_record)
+                    try:
+                        seq_str, op, line = raw_record.decode("utf-8").rstrip("\n").split(" ", 2)
+                        seq = int(seq_str)
+                        if op not in (OP_ADD, OP_REMOVE):
+                            raise ValueError(f"Unknown journal operation: {op!r}")
+                    except ValueError as error:
+                        if report:
+                            self._skip_unreadable(raw_record.decode("utf-8", "replace").rstrip("\n"), error)
+                        continue
+                    if seq <= snapshot_seq or (max_seq is not None and seq > max_seq):
+                        continue
+                    if op == OP_ADD:
+                        lines[line] = lines.get(line, 0) + 1
+                    elif op == OP_REMOVE and line in lines:
+                        lines[line] -= 1
+                        if lines[line] == 0:
+                            del lines[line]
+                    last_seq = seq
+                    records += 1
+        except FileNotFoundError:
+            pass
+        return last_seq, records, position
+
+    def _expand(self, lines):
+        """Yield each line of a {line: count} map as many times as it occurs."""
+        for line, count in lines.items():
+            for _ in range(count):
+                yield line
+
+    def _snapshot_chunks(self, lines, seq):
+        """Return the snapshot file contents: its header, then one line per task."""
+        return [f"# snapshot seq={seq}\n"] + [f"{line}\n" for line in lines]
+
+    def _write_snapshot_file(self, lines, seq):
+        """Write a snapshot with its header through a temp file and atomic rename."""
+        self._atomic_write(self.snapshot_path, self._snapshot_chunks(lines, seq))
+
+    def _atomic_write(self, path, chunks):
+        """Write chunks to a temp file next to `path` and rename it into place."""
+        os.replace(self._write_temp(path, chunks), path)
+
+    def _write_temp(self, path, chunks):
+        """Write chunks to a new, uniquely named temp file next to `path` and return its path."""
+        directory, name = os.path.split(path)
+        descriptor, temp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory or ".")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                file.writelines(chunks)
+                file.flush()
+                os.fsync(file.fileno())
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path
+
+    def _close_journal(self):
+        """Close the open journal handle, if any."""
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
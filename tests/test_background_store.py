@@ -0,0 +1,146 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from components import background_store
+from components.background_store import BackgroundTaskStore
+from components.passed_archive import PassedTaskArchive
+from components.task import PRIORITY_LEVELS, Task, to_epoch
+from components.task_store import JournalTaskStore, TaskStore
+
+DEADLINE = to_epoch(datetime(2030, 1, 2, 9, 0))
+
+
+def make_task(number):
+    return Task(f"Task {number}", DEADLINE + number * 60, PRIORITY_LEVELS["Medium"], number % 120)
+
+
+@pytest.fixture
+def new_store(tmp_path):
+    """Return a function creating a JournalTaskStore on the same files each time."""
+    def new_store():
+        return JournalTaskStore(str(tmp_path / "task_log.txt"), str(tmp_path / "task_journal.txt"),
+                                PassedTaskArchive(str(tmp_path / "passed"), legacy_path=None))
+    return new_store
+
+
+def test_inner_store_is_created_on_the_worker_thread(new_store):
+    created_on = []
+
+    def create_inner():
+        created_on.append(threading.current_thread().name)
+        return new_store()
+
+    store = BackgroundTaskStore(create_inner=create_inner, debounce=0)
+    assert created_on == []
+    store.add_tasks([make_task(1)])
+    assert store.load_tasks_async().result() == [make_task(1)]
+    store.close()
+
+    assert created_on == ["task-io"]
+
+
+class RecordingStore(TaskStore):
+    """In-memory store recording each write call; `failures` makes that many writes raise OSError first."""
+
+    def __init__(self, failures=0):
+        self.tasks = []
+        self.calls = []
+        self.failures = failures
+        self.closed = False
+
+    def _write(self, method, tasks):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.calls.append((method, len(tasks)))
+
+    def load_tasks(self):
+        return list(self.tasks)
+
+    def add_tasks(self, tasks):
+        self._write("add_tasks", tasks)
+        self.tasks.extend(tasks)
+
+    def remove_tasks(self, tasks):
+        self._write("remove_tasks", tasks)
+        for task in tasks:
+            self.tasks.remove(task)
+
+    def save_tasks(self, tasks):
+        self._write("save_tasks", tasks)
+        self.tasks = list(tasks)
+
+    def archive_passed_tasks(self, tasks):
+        self._write("archive_passed_tasks", tasks)
+
+    def close(self):
+        self.closed = True
+
+
+def test_consecutive_writes_of_one_kind_are_merged():
+    inner = RecordingStore()
+    store = BackgroundTaskStore(inner, debounce=10)
+    tasks = [make_task(number) for number in range(6)]
+    for task in tasks[:4]:
+        store.add_task(task)
+    store.remove_tasks(tasks[:2])
+    store.add_tasks(tasks[4:])
+    store.flush()
+
+    assert inner.calls == [("add_tasks", 4), ("remove_tasks", 2), ("add_tasks", 2)]
+    assert inner.tasks == tasks[2:]
+    store.close()
+
+
+def test_a_full_save_replaces_the_queued_writes():
+    inner = RecordingStore()
+    store = BackgroundTaskStore(inner, debounce=10)
+    store.add_tasks([make_task(1)])
+    store.archive_passed_tasks([make_task(2)])
+    store.save_tasks([make_task(3)])
+    store.close()
+
+    assert inner.calls == [("archive_passed_tasks", 1), ("save_tasks", 1)]
+    assert inner.tasks == [make_task(3)]
+    assert inner.closed
+
+
+def test_failed_writes_are_retried_in_order(monkeypatch):
+    monkeypatch.setattr(background_store, "RETRY_SECONDS", 0.01)
+    inner = RecordingStore(failures=2)
+    errors = []
+    store = BackgroundTaskStore(inner, debounce=0, on_write_error=errors.append)
+    store.add_tasks([make_task(1)])
+    store.remove_tasks([make_task(1)])
+    store.add_tasks([make_task(2)])
+
+    deadline = time.monotonic() + 5
+    while len(inner.calls) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    store.close()
+
+    assert inner.calls == [("add_tasks", 1), ("remove_tasks", 1), ("add_tasks", 1)]
+    assert inner.tasks == [make_task(2)]
+    assert len(errors) == 1  # Only the first failure in a row is reported
+
+
+def test_flush_and_close_raise_while_writes_fail(monkeypatch):
+    monkeypatch.setattr(background_store, "RETRY_SECONDS", 60)
+    inner = RecordingStore(failures=10)
+    store = BackgroundTaskStore(inner, debounce=0)
+    store.add_tasks([make_task(1)])
+
+    with pytest.raises(OSError):
+        store.flush()
+    with pytest.raises(OSError):
+        store.close()
+    assert not inner.closed  # Still open, with the write queued
+
+    # Each flush tries the queued writes again, without waiting for the retry delay
+    inner.failures = 0
+    store.close()
+    assert inner.tasks == [make_task(1)]
+    assert inner.closed
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from components.expiry_scheduler import MAX_DELAY_MS, ExpiryScheduler
+from components.task import PRIORITY_LEVELS, Task, to_epoch
+
+NOW = datetime(2030, 1, 1, 9, 0)
+
+
+class FakeTimers:
+    """Records `after`-style timers instead of running them."""
+
+    def __init__(self):
+        self.timers = {}
+        self._next_id = 0
+
+    def schedule(self, delay, callback):
+        self._next_id += 1
+        self.timers[self._next_id] = (delay, callback)
+        return self._next_id
+
+    def cancel(self, timer):
+        del self.timers[timer]
+
+    def only_delay(self):
+        (delay, _), = self.timers.values()
+        return delay
+
+    def fire(self):
+        (timer, (_, callback)), = self.timers.items()
+        del self.timers[timer]
+        callback()
+
+
+def task_due_in(minutes, name="Task"):
+    return Task(f"{name} {minutes}", to_epoch(NOW + timedelta(minutes=minutes)), PRIORITY_LEVELS["Medium"], 10)
+
+
+def new_scheduler(clock):
+    timers = FakeTimers()
+    expired = []
+    scheduler = ExpiryScheduler(timers.schedule, timers.cancel, expired.extend, clock=lambda: clock[0])
+    return scheduler, timers, expired
+
+
+def test_one_timer_for_the_earliest_deadline():
+    clock = [NOW]
+    scheduler, timers, expired = new_scheduler(clock)
+    scheduler.reset([task_due_in(30), task_due_in(10)])
+    assert timers.only_delay() == 10 * 60 * 1000
+
+    scheduler.add(task_due_in(5))
+    assert timers.only_delay() == 5 * 60 * 1000
+    scheduler.add(task_due_in(20))
+    assert timers.only_delay() == 5 * 60 * 1000
+
+
+def test_fire_hands_over_the_expired_tasks_and_rearms():
+    clock = [NOW]
+    scheduler, timers, expired = new_scheduler(clock)
+    scheduler.reset([task_due_in(10), task_due_in(10, "Other"), task_due_in(30)])
+
+    clock[0] = NOW + timedelta(minutes=10)
+    timers.fire()
+    assert sorted(expired, key=str) == sorted([task_due_in(10), task_due_in(10, "Other")], key=str)
+    assert timers.only_delay() == 20 * 60 * 1000
+    assert len(scheduler) == 1
+
+
+def test_removed_tasks_do_not_expire():
+    clock = [NOW]
+    scheduler, timers, expired = new_scheduler(clock)
+    tasks = [task_due_in(minutes) for minutes in range(1, 11)]
+    scheduler.reset(tasks)
+    for task in tasks[:6]:
+        scheduler.remove(task)  # Past half the heap, it is rebuilt without them
+    assert len(scheduler) == 4
+    assert timers.only_delay() == 7 * 60 * 1000
+
+    assert scheduler.pop_expired(NOW + timedelta(minutes=60)) == tasks[6:]
+
+
+def test_far_deadlines_wait_at_most_the_maximum_delay():
+    clock = [NOW]
+    scheduler, timers, expired = new_scheduler(clock)
+    scheduler.add(task_due_in(60 * 24 * 30))
+    assert timers.only_delay() == MAX_DELAY_MS
+
+    scheduler.disarm()
+    assert timers.timers == {}
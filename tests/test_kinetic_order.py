@@ -0,0 +1,80 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from components.kinetic_order import KineticTaskOrder, crossing_time
+from components.prioritization import SCORING_NUMPY, SCORING_PYTHON, TaskPrioritization, np, score_at
+from components.task import PRIORITY_LEVELS, Task, to_epoch, to_epoch_seconds
+
+NOW = datetime(2030, 1, 1, 9, 0)
+SCORING_MODES = [SCORING_PYTHON] + ([SCORING_NUMPY] if np is not None else [])
+
+
+def random_tasks(rng, count, start):
+    """Tasks due between one minute and three days after `start`, so many scores cross within hours."""
+    start = to_epoch(start)
+    return [Task(f"Task {rng.randrange(10 ** 6)}", start + rng.randint(60, 3 * 24 * 3600),
+                 rng.choice(list(PRIORITY_LEVELS.values())), rng.randrange(0, 8 * 60, 5))
+            for _ in range(count)]
+
+
+def assert_in_to_do_order(order):
+    """Every task still ahead of its deadline scores at least as much as the one after it."""
+    now = to_epoch_seconds(order.current_time)
+    scores = [score_at(task, now) for task in order.tasks if task.deadline > now]
+    assert all(ahead >= behind - 1e-9 for ahead, behind in zip(scores, scores[1:]))
+
+
+@pytest.mark.parametrize("certified", [True, False])
+@pytest.mark.parametrize("mode", SCORING_MODES)
+def test_order_matches_a_full_sort_as_time_passes(monkeypatch, certified, mode):
+    # Whether certificates pay depends on timings; both ways must give the same order
+    monkeypatch.setattr(KineticTaskOrder, "_certification_pays", lambda self, *args, **kwargs: certified)
+    rng = random.Random(1)
+    order = KineticTaskOrder(lambda current_time: TaskPrioritization(current_time, mode))
+    tasks = random_tasks(rng, 400, NOW)
+    order.rebuild(tasks, NOW)
+    assert_in_to_do_order(order)
+
+    current_time = NOW
+    for step in range(30):
+        current_time += timedelta(minutes=rng.choice([1, 1, 5, 60]))
+        order.advance(current_time)
+        assert_in_to_do_order(order)
+
+        added = random_tasks(rng, 5, current_time)
+        for task in added:
+            order.insert(task)
+        tasks += added
+        removed = rng.sample(list(order.tasks), 8)
+        assert order.remove_many(removed) == len(removed)
+        for task in removed:
+            tasks.remove(task)
+
+        assert_in_to_do_order(order)
+        assert sorted(order.tasks, key=repr) == sorted(tasks, key=repr)
+
+
+def test_remove_many_ignores_tasks_that_are_not_there():
+    order = KineticTaskOrder(lambda current_time: TaskPrioritization(current_time, SCORING_PYTHON))
+    tasks = random_tasks(random.Random(2), 50, NOW)
+    order.rebuild(tasks, NOW)
+    missing = Task("Not in the order", to_epoch(NOW) + 600, PRIORITY_LEVELS["Low"], 0)
+
+    assert order.remove_many([tasks[0], missing, tasks[0]]) == 1
+    assert len(order) == 49
+
+
+def test_crossing_time_is_never_after_the_crossing():
+    rng = random.Random(3)
+    now = to_epoch_seconds(NOW)
+    for _ in range(200):
+        ahead, behind = random_tasks(rng, 2, NOW)
+        if score_at(ahead, now) < score_at(behind, now):
+            ahead, behind = behind, ahead
+        moment = crossing_time(ahead, behind, now)
+        # Until the certificate runs out, the front task stays ahead
+        for fraction in (0.25, 0.5, 0.99):
+            checked = now + (min(moment, min(ahead.deadline, behind.deadline)) - now) * fraction
+            assert score_at(ahead, checked) >= score_at(behind, checked) - 1e-9
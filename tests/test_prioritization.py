@@ -0,0 +1,49 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from components.prioritization import SCORING_NUMPY, SCORING_PYTHON, TaskPrioritization
+from components.task import PRIORITY_LEVELS, Task, to_epoch
+
+pytest.importorskip("numpy")
+
+NOW = datetime(2030, 1, 1, 9, 0)
+
+
+def random_tasks(count, seed=0):
+    """Tasks with few distinct deadlines, priorities and durations, so that many scores tie."""
+    rng = random.Random(seed)
+    priorities = list(PRIORITY_LEVELS.values())
+    return [Task(f"Task {number}", to_epoch(NOW + timedelta(hours=rng.choice([-2, 1, 5, 48]))),
+                 rng.choice(priorities), rng.choice([0, 30, 90]))
+            for number in range(count)]
+
+
+def ordered_names(mode, tasks, top_k=None):
+    return [task.name for task in TaskPrioritization(NOW, mode).get_ordered_tasks(tasks, top_k)]
+
+
+@pytest.mark.parametrize("count", [1, 10, 300, 2000])
+def test_numpy_and_python_scores_match(count):
+    tasks = random_tasks(count)
+    assert TaskPrioritization(NOW, SCORING_NUMPY).score_tasks(tasks) == \
+        pytest.approx(TaskPrioritization(NOW, SCORING_PYTHON).score_tasks(tasks), rel=1e-12)
+
+
+@pytest.mark.parametrize("count", [1, 10, 300, 2000])
+@pytest.mark.parametrize("top_k", [None, 1, 7, 100])
+def test_numpy_and_python_orders_match(count, top_k):
+    tasks = random_tasks(count, seed=count)
+    assert ordered_names(SCORING_NUMPY, tasks, top_k) == ordered_names(SCORING_PYTHON, tasks, top_k)
+
+
+@pytest.mark.parametrize("top_k", [None, 1, 3, 9])
+def test_ties_keep_list_order(top_k):
+    # Every task has the same score, so both paths must return the list order
+    tasks = [Task(f"Task {number}", to_epoch(NOW + timedelta(hours=5)), PRIORITY_LEVELS["Medium"], 30)
+             for number in range(10)]
+    random.Random(1).shuffle(tasks)
+    expected = [task.name for task in tasks][:top_k]
+    assert ordered_names(SCORING_NUMPY, tasks, top_k) == expected
+    assert ordered_names(SCORING_PYTHON, tasks, top_k) == expected
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from components.recurrence import (
+    RULE_EVERY_N_DAYS, RULE_WEEKDAYS, RecurringTask, RecurrenceSchedule, format_recurring_task,
+    parse_recurring_task, read_recurring_tasks
+)
+from components.task import PRIORITY_LEVELS, Task, to_epoch
+
+FRIDAY = datetime(2030, 1, 4, 9, 0)
+
+
+def test_recurring_task_line_round_trips():
+    recurring = RecurringTask(Task("Stand-up", to_epoch(FRIDAY), PRIORITY_LEVELS["High"], 15), RULE_EVERY_N_DAYS, 3)
+
+    assert parse_recurring_task(format_recurring_task(recurring)) == recurring
+
+
+def test_weekday_occurrences_skip_the_weekend():
+    recurring = RecurringTask(Task("Stand-up", to_epoch(FRIDAY), PRIORITY_LEVELS["High"], 15), RULE_WEEKDAYS)
+    schedule = RecurrenceSchedule(horizon=timedelta(days=4))
+
+    occurrences = schedule.add_rule(recurring, to_epoch(FRIDAY) - 60)
+
+    assert [task.deadline for task in occurrences] == [to_epoch(FRIDAY), to_epoch(FRIDAY + timedelta(days=3))]
+
+
+def test_unreadable_recurring_lines_are_skipped(tmp_path):
+    recurring = RecurringTask(Task("Stand-up", to_epoch(FRIDAY), PRIORITY_LEVELS["High"], 15), RULE_WEEKDAYS)
+    path = tmp_path / "recurring_tasks.txt"
+    path.write_text(f"{format_recurring_task(recurring)}\nhalf a line\n", encoding="utf-8")
+    unreadable = []
+
+    assert read_recurring_tasks(str(path), lambda line, error: unreadable.append(line)) == [recurring]
+    assert unreadable == ["half a line\n"]
@@ -0,0 +1,78 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from components.recurrence import repeat_task
+from components.sqlite_store import SCHEMA_VERSION, SqliteTaskStore
+from components.task import Task
+
+# The version 1 schema, which kept the task fields as text
+SCHEMA_V1 = """
+CREATE TABLE tasks (id INTEGER PRIMARY KEY, name TEXT NOT NULL, deadline TEXT NOT NULL,
+                    priority TEXT NOT NULL, time_needed TEXT NOT NULL);
+CREATE TABLE passed_tasks (id INTEGER PRIMARY KEY, name TEXT NOT NULL, deadline TEXT NOT NULL,
+                           priority TEXT NOT NULL, time_needed TEXT NOT NULL);
+CREATE TABLE recurring_tasks (id INTEGER PRIMARY KEY, name TEXT NOT NULL, deadline TEXT NOT NULL,
+                              priority TEXT NOT NULL, time_needed TEXT NOT NULL, repeats TEXT NOT NULL);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+INSERT INTO meta (key, value) VALUES ('text_logs_imported', '1');
+PRAGMA user_version = 1;
+"""
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    """Return a function opening a SqliteTaskStore on the same database each time; every store is closed afterwards."""
+    stores = []
+
+    def open_store():
+        store = SqliteTaskStore(str(tmp_path / "tasks.db"), str(tmp_path / "task_log.txt"),
+                                str(tmp_path / "task_journal.txt"))
+        stores.append(store)
+        return store
+
+    open_store.db_path = str(tmp_path / "tasks.db")
+    yield open_store
+    for store in stores:
+        store.close()
+
+
+def write_v1_database(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA_V1)
+    with connection:
+        connection.executemany("INSERT INTO tasks (name, deadline, priority, time_needed) VALUES (?, ?, ?, ?)", [
+            ("Write report", "2030-01-02T09:00:00", "High", "01:30"),
+            ("Call back", "2030-01-01T17:45:00", "Low", "00:05"),
+            ("Write report", "2030-01-02T09:00:00", "High", "01:30"),
+        ])
+        connection.execute("INSERT INTO passed_tasks (name, deadline, priority, time_needed) VALUES (?, ?, ?, ?)",
+                           ("Old task", "2029-12-31T08:00:00", "Medium", "00:45"))
+        connection.execute(
+            "INSERT INTO recurring_tasks (name, deadline, priority, time_needed, repeats) VALUES (?, ?, ?, ?, ?)",
+            ("Stand-up", "2030-01-01T10:00:00", "Medium", "00:15", "every 2 days"))
+    connection.close()
+
+
+def test_version_1_database_is_upgraded(open_store):
+    write_v1_database(open_store.db_path)
+    store = open_store()
+
+    report = Task.create("Write report", datetime(2030, 1, 2, 9, 0), "High", "01:30")
+    assert store.load_tasks() == [report, Task.create("Call back", datetime(2030, 1, 1, 17, 45), "Low", "00:05"),
+                                  report]
+    assert store.load_recurring_tasks() == [
+        repeat_task(Task.create("Stand-up", datetime(2030, 1, 1, 10, 0), "Medium", "00:15"), "every 2 days")]
+    assert "Old task" in store.load_passed_tasks_text()
+    assert store.connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert [row[1] for row in store.connection.execute("PRAGMA table_info(tasks)")] == \
+        ["id", "name", "deadline", "priority", "minutes"]
+
+    # Indexed queries work on the converted integer columns
+    assert store.tasks_due_before(datetime(2030, 1, 2, 9, 0)) == [
+        Task.create("Call back", datetime(2030, 1, 1, 17, 45), "Low", "00:05")]
+    store.close()
+
+    # Opening the upgraded database again leaves it as it is
+    assert len(open_store().load_tasks()) == 3
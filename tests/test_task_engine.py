@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from components.passed_archive import PassedTaskArchive
+from components.task import PRIORITY_LEVELS, Task, to_epoch
+from components.task_engine import FILTER_BY_DUE_DATE, FILTER_BY_IMPORTANCE, FILTER_TO_DO_ORDER, TaskEngine
+from components.task_store import JournalTaskStore
+
+NOW = datetime(2030, 1, 1, 9, 0)
+
+
+def task_due_in(hours, name="Task", priority="Medium"):
+    return Task(f"{name} {hours}", to_epoch(NOW + timedelta(hours=hours)), PRIORITY_LEVELS[priority], 30)
+
+
+@pytest.fixture
+def open_engine(tmp_path):
+    """Return a function opening a TaskEngine on the same files each time, with a clock set through `clock[0]`."""
+    clock = [NOW]
+    engines = []
+
+    def open_engine():
+        store = JournalTaskStore(str(tmp_path / "task_log.txt"), str(tmp_path / "task_journal.txt"),
+                                 PassedTaskArchive(str(tmp_path / "passed"), legacy_path=None))
+        engine = TaskEngine(store, clock=lambda: clock[0])
+        engine.load_tasks()
+        engines.append(engine)
+        return engine
+
+    open_engine.clock = clock
+    yield open_engine
+    for engine in engines:
+        engine.close()
+
+
+def test_added_tasks_are_in_every_order(open_engine):
+    engine = open_engine()
+    low = task_due_in(1, "Low", "Low")
+    high = task_due_in(5, "High", "High")
+    engine.add_task(low)
+    engine.add_tasks([high, task_due_in(3)])
+
+    assert len(engine) == 3
+    assert engine.ordered_tasks(FILTER_BY_DUE_DATE) == [low, task_due_in(3), high]
+    assert engine.ordered_tasks(FILTER_BY_IMPORTANCE)[0] == high
+    assert sorted(engine.ordered_tasks(FILTER_TO_DO_ORDER), key=str) == sorted([low, high, task_due_in(3)], key=str)
+    assert list(engine.query(name_prefix="hi")) == [high]
+
+
+def test_tasks_survive_a_reload(open_engine):
+    engine = open_engine()
+    tasks = [task_due_in(hours) for hours in range(1, 6)]
+    engine.add_tasks(tasks)
+    engine.add_task(task_due_in(9))
+    engine.close()
+
+    assert open_engine().ordered_tasks(FILTER_BY_DUE_DATE) == tasks + [task_due_in(9)]
+
+
+def test_passed_tasks_are_removed_and_archived(open_engine):
+    engine = open_engine()
+    engine.add_tasks([task_due_in(1), task_due_in(2), task_due_in(5)])
+
+    open_engine.clock[0] = NOW + timedelta(hours=2)
+    assert sorted(engine.refresh_tasks(), key=str) == sorted([task_due_in(1), task_due_in(2)], key=str)
+    assert engine.ordered_tasks(FILTER_BY_DUE_DATE) == [task_due_in(5)]
+    assert engine.refresh_tasks() == []
+    engine.close()
+
+    reopened = open_engine()
+    assert reopened.ordered_tasks(FILTER_BY_DUE_DATE) == [task_due_in(5)]
+    passed_text = reopened.store.load_passed_tasks_text()
+    assert "Task 1" in passed_text and "Task 2" in passed_text and "Task 5" not in passed_text
+
+
+@pytest.mark.parametrize("count", [3, 40])  # Rebuilt with few tasks, inserted one by one with many
+def test_changes_from_another_writer_are_merged(open_engine, count):
+    engine = open_engine()
+    tasks = [task_due_in(hours) for hours in range(1, count + 1)]
+    engine.add_tasks(tasks)
+    other = open_engine()
+
+    other.add_task(task_due_in(count + 0.5, "Other"))
+    other.store.remove_tasks([task_due_in(2)])
+
+    assert engine.poll_store_changes()
+    assert engine.ordered_tasks(FILTER_BY_DUE_DATE) == \
+        [task_due_in(1)] + tasks[2:] + [task_due_in(count + 0.5, "Other")]
+    assert not engine.poll_store_changes()
+
+    # The merged task expires like any other, and the removed one no longer does
+    open_engine.clock[0] = NOW + timedelta(hours=count + 1)
+    expired = engine.refresh_tasks()
+    assert task_due_in(count + 0.5, "Other") in expired and task_due_in(2) not in expired
@@ -0,0 +1,84 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from components.prioritization import TaskPrioritization
+from components.task import PRIORITY_LEVELS, Task, to_epoch
+from components.task_index import SortedTaskIndex, TaskOrders, TaskRange, due_date_key
+
+DEADLINE = to_epoch(datetime(2030, 1, 2, 9, 0))
+NAMES = ["Alpha", "alpine", "Beta", "bet", "Gamma", "gam", "Delta"]
+
+
+def random_tasks(count, seed=0):
+    rng = random.Random(seed)
+    priorities = list(PRIORITY_LEVELS.values())
+    return [Task(f"{rng.choice(NAMES)} {number}", DEADLINE + rng.randrange(48) * 3600, rng.choice(priorities),
+                 rng.choice([0, 30, 90]))
+            for number in range(count)]
+
+
+def test_task_range_is_a_view_of_a_slice():
+    tasks = list("abcdefg")
+    view = TaskRange(tasks, 2, 5)
+    assert len(view) == 3
+    assert list(view) == ["c", "d", "e"]
+    assert view[0] == "c" and view[-1] == "e"
+    assert view[1:] == ["d", "e"]
+    with pytest.raises(IndexError):
+        view[3]
+    assert len(TaskRange(tasks, 5, 2)) == 0
+
+
+def test_insert_keeps_the_order_and_equal_keys_in_insertion_order():
+    index = SortedTaskIndex(due_date_key)
+    first = Task("First", DEADLINE, PRIORITY_LEVELS["Low"], 10)
+    second = Task("Second", DEADLINE, PRIORITY_LEVELS["High"], 10)
+    earlier = Task("Earlier", DEADLINE - 60, PRIORITY_LEVELS["Low"], 10)
+    assert index.insert(first) == 0
+    assert index.insert(second) == 1
+    assert index.insert(earlier) == 0
+    assert index.tasks == [earlier, first, second]
+
+
+def test_remove_takes_one_occurrence_at_a_time():
+    task = Task("Twice", DEADLINE, PRIORITY_LEVELS["Low"], 10)
+    other = Task("Other", DEADLINE, PRIORITY_LEVELS["Low"], 10)
+    index = SortedTaskIndex(due_date_key, [task, other, task])
+
+    assert index.remove(task) is not None
+    assert sorted(index.tasks, key=str) == sorted([other, task], key=str)
+    assert index.remove_many([task, task, other]) == [task, other]
+    assert len(index) == 0
+    assert index.remove(task) is None
+
+
+def test_key_range_bounds_are_inclusive_then_exclusive():
+    tasks = [Task(f"Task {hour}", DEADLINE + hour * 3600, PRIORITY_LEVELS["Low"], 10) for hour in range(10)]
+    index = SortedTaskIndex(due_date_key, tasks[::-1])
+    assert list(index.key_range(DEADLINE + 2 * 3600, DEADLINE + 5 * 3600)) == tasks[2:5]
+    assert len(index.key_range(DEADLINE + 20 * 3600, DEADLINE + 30 * 3600)) == 0
+
+
+@pytest.mark.parametrize("name_prefix", ["", "al", "BET", "x"])
+@pytest.mark.parametrize("due", [(None, None), (6, None), (None, 30), (6, 30)])
+@pytest.mark.parametrize("priority", [None, PRIORITY_LEVELS["High"]])
+def test_query_matches_a_full_scan(name_prefix, due, priority):
+    tasks = random_tasks(300)
+    orders = TaskOrders(TaskPrioritization)
+    orders.rebuild(tasks[:200], datetime(2030, 1, 1))
+    for task in tasks[200:]:
+        orders.add(task)
+    orders.remove_many(tasks[::7])
+    remaining = [task for number, task in enumerate(tasks) if number % 7]
+
+    due_from = None if due[0] is None else DEADLINE + due[0] * 3600
+    due_to = None if due[1] is None else DEADLINE + due[1] * 3600
+    expected = [task for task in remaining
+                if task.name.casefold().startswith(name_prefix.casefold())
+                and (due_from is None or task.deadline >= due_from)
+                and (due_to is None or task.deadline < due_to)
+                and (priority is None or task.priority == priority)]
+
+    assert sorted(orders.query(name_prefix, due_from, due_to, priority), key=str) == sorted(expected, key=str)
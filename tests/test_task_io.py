@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from components.task import PRIORITY_LEVELS, Task, format_task, parse_task, to_epoch
+from components.task_io import (
+    export_tasks, ics_component_to_task, parse_deadline, read_tasks, record_to_task
+)
+
+NOW = datetime(2030, 1, 1, 9, 0)
+
+
+def sample_tasks():
+    deadline = to_epoch(NOW + timedelta(days=2))
+    return [
+        Task("Write report", deadline, PRIORITY_LEVELS["High"], 90),
+        Task("Commas, quotes \" and; semicolons", deadline + 3600, PRIORITY_LEVELS["Medium"], 0),
+        Task("Ünïcode name that is long enough to be folded in an iCalendar file, " * 2, deadline + 60, PRIORITY_LEVELS["Low"], 5),
+    ]
+
+
+@pytest.mark.parametrize("extension", [".csv", ".jsonl", ".ics"])
+def test_export_then_import_round_trips(tmp_path, extension):
+    tasks = sample_tasks()
+    path = tmp_path / f"tasks{extension}"
+    assert export_tasks(tasks, str(path)) == len(tasks)
+
+    imported, report = read_tasks(str(path), current_time=NOW)
+
+    assert report.rejected == 0
+    assert [(task.name.strip(), task.deadline, task.priority, task.minutes) for task in imported] == \
+        [(task.name.strip(), task.deadline, task.priority, task.minutes) for task in tasks]
+
+
+def test_import_reports_bad_rows_and_keeps_the_rest(tmp_path):
+    path = tmp_path / "tasks.csv"
+    path.write_text(
+        "name,deadline,priority,time_needed\n"
+        "Good,2030-01-02 10:00,High,01:00\n"
+        ",2030-01-02 10:00,High,01:00\n"
+        "No date,,Low,00:10\n"
+        "Bad priority,2030-01-02 10:00,Urgent,00:10\n"
+        "Passed,2029-12-31 10:00,Low,00:10\n"
+        "\"Two\nlines\",2030-01-02 10:00,Low,00:10\n",
+        encoding="utf-8"
+    )
+
+    tasks, report = read_tasks(str(path), current_time=NOW)
+
+    assert [task.name for task in tasks] == ["Good"]
+    assert report.imported == 1
+    assert report.rejected == 5
+    assert [number for number, _ in report.errors] == [2, 3, 4, 5, 6]
+
+
+@pytest.mark.parametrize("name", ["two\nlines", "carriage\rreturn", "tab\tin name", "\x00", "  "])
+def test_record_to_task_rejects_names_that_do_not_fit_one_line(name):
+    with pytest.raises(ValueError):
+        record_to_task({"name": name, "deadline": "2030-01-02 10:00"})
+
+
+def test_ics_summary_with_escaped_newline_is_rejected():
+    component = {"component": "VTODO", "SUMMARY": ("", "two\\nlines"), "DUE": ("", "20300102T100000")}
+    with pytest.raises(ValueError):
+        ics_component_to_task(component)
+
+
+def test_format_task_keeps_a_control_character_name_on_one_line():
+    task = Task("two\nlines\r", to_epoch(NOW), PRIORITY_LEVELS["Low"], 0)
+
+    line = format_task(task)
+
+    assert "\n" not in line and "\r" not in line
+    assert parse_task(line).deadline == task.deadline
+
+
+def test_parse_deadline_converts_offsets_to_local_time():
+    moment = datetime(2030, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+    assert parse_deadline("2030-06-01T12:00:00+00:00") == moment.astimezone().replace(tzinfo=None)
+    assert parse_deadline("2030-06-01 12:00") == datetime(2030, 6, 1, 12, 0)
+    assert parse_deadline("06/01/30 12:00") == datetime(2030, 6, 1, 12, 0)
@@ -0,0 +1,72 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from components.task_server import TaskServer, UserCache
+
+
+async def request(port, method, path, body=None):
+    """Send one request on a new connection and return (status, decoded JSON body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n"
+                 .encode("latin-1") + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+def new_task(name):
+    deadline = datetime.now() + timedelta(days=1)
+    return {"name": name, "deadline": deadline.isoformat(sep=" ", timespec="minutes"), "priority": "High"}
+
+
+def run_server(tmp_path, scenario, capacity=4):
+    """Run `scenario(server, port)` against a server keeping its users under `tmp_path`, then close it."""
+    async def main():
+        server = TaskServer(UserCache(str(tmp_path), shards=2, capacity=capacity))
+        port = await server.start("127.0.0.1", 0)
+        try:
+            return await scenario(server, port)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_added_tasks_are_listed_and_kept_across_evictions(tmp_path):
+    async def scenario(server, port):
+        statuses = await asyncio.gather(*[
+            request(port, "POST", f"/users/user{number % 3}/tasks", new_task(f"Task {number}")) for number in range(30)
+        ])
+        assert {status for status, _ in statuses} == {201}
+        return [await request(port, "GET", f"/users/user{user}/tasks?limit=100") for user in range(3)]
+
+    # One loaded user at a time, so every other request evicts one and reloads another
+    for status, body in run_server(tmp_path, scenario, capacity=1):
+        assert status == 200 and body["total"] == 10
+
+
+def test_bad_names_are_rejected(tmp_path):
+    async def scenario(server, port):
+        return await request(port, "POST", "/users/alice/tasks", new_task("two\nlines"))
+
+    status, body = run_server(tmp_path, scenario)
+    assert status == 400
+    assert "line breaks" in body["error"]
+
+
+def test_a_write_that_fails_is_answered_with_500(tmp_path):
+    def fail(tasks):
+        raise OSError("disk full")
+
+    async def scenario(server, port):
+        assert (await request(port, "POST", "/users/alice/tasks", new_task("Saved")))[0] == 201
+        session = await server.cache.get("alice")
+        session.store.inner.add_tasks = fail
+        return await request(port, "POST", "/users/alice/tasks", new_task("Not saved"))
+
+    # The server still closes, even though the failed write cannot be flushed
+    status, body = run_server(tmp_path, scenario)
+    assert status == 500
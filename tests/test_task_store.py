@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import pytest
+
+from components.passed_archive import PassedTaskArchive
+from components.task import PRIORITY_LEVELS, Task, to_epoch
+from components.task_store import JournalTaskStore
+
+DEADLINE = to_epoch(datetime(2030, 1, 2, 9, 0))
+
+
+def make_task(number, name="Task"):
+    return Task(f"{name} {number}", DEADLINE + number * 60, PRIORITY_LEVELS["Medium"], number % 120)
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    """Return a function opening a JournalTaskStore on the same files each time; every store is closed afterwards."""
+    stores = []
+
+    def open_store(compact_threshold=1000):
+        store = JournalTaskStore(str(tmp_path / "task_log.txt"), str(tmp_path / "task_journal.txt"),
+                                 PassedTaskArchive(str(tmp_path / "passed"), legacy_path=None), compact_threshold)
+        stores.append(store)
+        return store
+
+    yield open_store
+    for store in stores:
+        store.close()
+
+
+def test_adds_and_removes_survive_a_reload(open_store):
+    store = open_store()
+    tasks = [make_task(number) for number in range(20)]
+    store.add_tasks(tasks)
+    store.add_task(tasks[0])  # A duplicate is kept as a second task
+    store.remove_tasks(tasks[5:10])
+    store.close()
+
+    assert sorted(open_store().load_tasks(), key=str) == sorted(tasks[:5] + tasks[10:] + [tasks[0]], key=str)
+
+
+def test_save_and_compaction_keep_every_task(open_store):
+    store = open_store(compact_threshold=10)
+    store.save_tasks([make_task(number) for number in range(5)])
+    store.add_tasks([make_task(number) for number in range(5, 30)])
+    store.compact(background=False)
+    store.remove_tasks([make_task(0)])
+    store.close()
+
+    assert sorted(open_store().load_tasks(), key=str) == sorted((make_task(number) for number in range(1, 30)), key=str)
+
+
+def test_unreadable_lines_are_skipped(open_store, tmp_path):
+    store = open_store()
+    store.add_tasks([make_task(1), make_task(2)])
+    store.close()
+    with open(tmp_path / "task_journal.txt", "a", encoding="utf-8") as file:
+        file.write("10 + half of a record\n")
+        file.write("no sequence number\n")
+        file.write("11 + Task 3 - Deadline: 01/02/30 09:03:00, Priority: Urgent, Time Needed: 00:03\n")
+        file.write("12 + Task 4 - Deadline: 01/02/30 09:04:00, Priority: Low, Time Needed: 00:04\n")
+        file.write("13 + cut short by a crash")
+    with open(tmp_path / "task_log.txt", "w", encoding="utf-8") as file:
+        file.write("# snapshot seq=0\nnot a task either\n")
+
+    reopened = open_store()
+    tasks = reopened.load_tasks()
+
+    assert sorted(tasks, key=str) == sorted([make_task(1), make_task(2), Task("Task 4", DEADLINE + 240, 1, 4)], key=str)
+    assert reopened.unreadable_count == 4
+
+
+def test_another_writer_s_changes_are_polled(open_store):
+    first, second = open_store(), open_store()
+    first.add_tasks([make_task(1), make_task(2)])
+    assert sorted(second.load_tasks(), key=str) == [make_task(1), make_task(2)]
+
+    first.add_tasks([make_task(3)])
+    first.remove_tasks([make_task(1)])
+    changes = second.poll_changes()
+
+    assert changes.added == [make_task(3)]
+    assert changes.removed == [make_task(1)]
+    assert not second.poll_changes()
+
+
+def test_two_stores_compacting_in_one_process_lose_nothing(open_store):
+    first, second = open_store(compact_threshold=5), open_store(compact_threshold=5)
+    first.load_tasks()
+    second.load_tasks()
+    for number in range(40):
+        (first if number % 2 else second).add_tasks([make_task(number)])
+        if number % 3 == 0:
+            first.compact(background=False)
+            second.compact(background=False)
+    first.close()
+    second.close()
+
+    assert sorted(open_store().load_tasks(), key=str) == sorted((make_task(number) for number in range(40)), key=str)
+
+
+def test_passed_tasks_are_archived_newest_first(open_store):
+    store = open_store()
+    store.archive_passed_tasks([make_task(1), make_task(2)])
+
+    reader = store.open_passed_tasks_reader()
+    try:
+        lines = list(reader)
+    finally:
+        reader.close()
+
+    assert len(lines) == 2
+    assert lines[0].startswith("Task 2") and lines[1].startswith("Task 1")